@@ -0,0 +1,179 @@
+"""
+Score a whole table of transactions with the saved Isolation Forest, without loading it.
+
+The table is cut into splits (byte ranges of the CSV file, files of the Parquet dataset, see
+storage.py) that worker processes read and score one at a time, so memory holds one split per
+worker whatever the size of the table. Every worker maps the compiled forest saved by
+model_training.py into memory once and scores its rows with one vectorized call per split.
+Scores are written to the TransactionScores table (Transaction_ID, Model_score, Is_anomaly) of
+the same storage: Parquet workers write their own files, CSV scores are returned to the parent
+process and appended as their splits complete. At most SPLITS_IN_FLIGHT_PER_WORKER splits per
+worker are submitted at once, so the parent never holds the scores of more splits than that.
+
+Models fitted on columns of Transactions score the Transactions table. Models fitted on the
+behavioural features of features.py score the TransactionFeatures table, which must be built
+first (python features.py): the features of a transaction depend on the other transactions of
+its subscriber, account and agent, which other splits hold, and building them holds the whole
+tables in memory.
+
+Usage:
+    python batch_scoring.py [--format parquet] [--data-dir .] [--workers 8]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_TABLE_COLUMNS, FEATURES_TABLE
+from model_store import DEFAULT_MODEL_DIR, load_metadata, load_models
+from storage import DEFAULT_SPLIT_BYTES, open_storage
+
+
+SCORES_TABLE = "TransactionScores"
+SPLITS_IN_FLIGHT_PER_WORKER = 2
+
+_worker_storage = None
+_worker_model = None
+_worker_features = None
+
+
+def _init_scoring_worker(data_format, directory, model_dir):
+    global _worker_storage, _worker_model, _worker_features
+    _worker_storage = open_storage(data_format, directory)
+    models, metadata = load_models(model_dir, names=["compiled_isolation_forest"])
+    _worker_model = models["compiled_isolation_forest"]
+    _worker_features = metadata["features"]
+
+
+def score_frame(df, model, features):
+    """
+    Score transactions.
+
+    Returns:
+        pd.DataFrame: Transaction_ID, Model_score (decision function, negative for anomalies)
+        and Is_anomaly (1 for anomalies) of every transaction.
+    """
+    scores = model.decision_function(df[features].to_numpy(dtype=np.float64))
+    return pd.DataFrame({
+        "Transaction_ID": df["Transaction_ID"].to_numpy(),
+        "Model_score": scores,
+        "Is_anomaly": (scores < 0).astype(np.int8)
+    })
+
+
+def _score_split(table_name, split_index, split):
+    """
+    Score one split in a worker process.
+
+    Parquet scores are written by the worker as their own part file, CSV scores are returned for
+    the parent to append.
+    """
+    df = _worker_storage.read_split(table_name, split, columns=["Transaction_ID"] + _worker_features)
+    scores = score_frame(df, _worker_model, _worker_features)
+    anomalies = int(scores["Is_anomaly"].sum())
+    if _worker_storage.format != "csv":
+        _worker_storage.write(SCORES_TABLE, scores, append=True, part=split_index)
+        return len(scores), anomalies, None
+    return len(scores), anomalies, scores
+
+
+def features_table(storage, features, table_name=None):
+    """
+    Return the table holding the features of a model for every transaction, checking its columns.
+
+    Args:
+        storage (CSVStorage | ParquetStorage): Storage of the tables.
+        features (list): Features of the model.
+        table_name (str): Table to score. Defaults to Transactions for models fitted on its
+            columns, to TransactionFeatures for the others.
+
+    Raises:
+        FileNotFoundError: If the table does not exist.
+        ValueError: If the table lacks Transaction_ID or one of the features.
+    """
+    if table_name is None:
+        if all(feature in FEATURE_TABLE_COLUMNS["Transactions"] for feature in features):
+            table_name = "Transactions"
+        else:
+            table_name = FEATURES_TABLE
+    if not storage.exists(table_name):
+        raise FileNotFoundError(f"Table '{table_name}' not found. The {FEATURES_TABLE} table of models fitted on "
+                                f"the behavioural features is built by python features.py.")
+    missing = [column for column in ["Transaction_ID"] + list(features) if column not in storage.columns(table_name)]
+    if missing:
+        raise ValueError(f"Table '{table_name}' lacks the columns {missing} of the model. Models fitted on the "
+                         f"behavioural features score the {FEATURES_TABLE} table (python features.py).")
+    return table_name
+
+
+def score_table(storage, table_name=None, model_dir=DEFAULT_MODEL_DIR, workers=None,
+                split_bytes=DEFAULT_SPLIT_BYTES):
+    """
+    Score every row of a table into the TransactionScores table, replacing its previous scores.
+
+    Args:
+        storage (CSVStorage | ParquetStorage): Storage of the table.
+        table_name (str): Table of transactions to score, chosen from the model's features by
+            default (see features_table).
+        model_dir (str): Directory of the models saved by model_training.py.
+        workers (int): Worker processes, defaults to the number of CPUs.
+        split_bytes (int): Approximate size of the CSV splits read at once.
+
+    Returns:
+        tuple: (rows scored, anomalies found).
+    """
+    table_name = features_table(storage, load_metadata(model_dir)["features"], table_name)
+    workers = workers or os.cpu_count() or 1
+    splits = storage.splits(table_name, split_bytes) if storage.format == "csv" else storage.splits(table_name)
+    storage.clear(SCORES_TABLE)
+
+    start_time = time.time()
+    rows = anomalies = 0
+
+    def collect(futures):
+        nonlocal rows, anomalies
+        for future in futures:
+            split_rows, split_anomalies, scores = future.result()
+            if scores is not None:
+                storage.write(SCORES_TABLE, scores, append=True)
+            rows += split_rows
+            anomalies += split_anomalies
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_scoring_worker,
+                             initargs=(storage.format, storage.directory, model_dir)) as executor:
+        pending = set()
+        for i, split in enumerate(splits):
+            if len(pending) >= SPLITS_IN_FLIGHT_PER_WORKER * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(executor.submit(_score_split, table_name, i, split))
+        collect(wait(pending)[0])
+
+    elapsed = time.time() - start_time
+    print(f"Scored {rows} rows of {table_name} in {len(splits)} splits with {workers} workers in {elapsed:.2f} s "
+          f"({rows / max(elapsed, 1e-9):,.0f} rows/s), {anomalies} anomalies")
+    return rows, anomalies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a table of transactions with the saved Isolation Forest.")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Storage format of the tables")
+    parser.add_argument("--data-dir", default=".", help="Directory of the tables")
+    parser.add_argument("--table", default=None,
+                        help="Table of transactions to score (default: Transactions, or TransactionFeatures for models "
+                             "fitted on the behavioural features)")
+    parser.add_argument("--model", default=DEFAULT_MODEL_DIR, help="Directory of the models saved by model_training.py")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: number of CPUs)")
+    parser.add_argument("--split-mb", type=int, default=DEFAULT_SPLIT_BYTES // (1024 * 1024),
+                        help="Size of the CSV splits read at once, in MB")
+    args = parser.parse_args(argv)
+
+    storage = open_storage(args.format, args.data_dir)
+    score_table(storage, args.table, args.model, args.workers, args.split_mb * 1024 * 1024)
+
+
+if __name__ == "__main__":
+    main()
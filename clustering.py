@@ -0,0 +1,246 @@
+"""
+Density-based clustering of transactions that scales to millions of rows.
+
+sklearn's DBSCAN looks up the eps-neighbourhood of every point and keeps all of them in memory
+at once. With the standardized transaction features, eps=0.5 covers about a tenth of the data,
+so its memory grows with the square of the number of rows. GridDBSCAN finds the same clusters
+without ever materializing a neighbourhood:
+
+1. Points are binned into a grid of cells of diagonal eps, so the points of a cell are all
+   neighbours of each other and every point of a cell holding at least min_samples points is a
+   core point. The neighbours of the remaining points are counted in chunks with a KD-tree,
+   whose count_only queries add up whole tree nodes lying inside the radius.
+2. The core points of a cell belong to the same cluster. Two cells are joined when a core point
+   of one lies within eps of a core point of the other, which is only tested for cells close
+   enough to hold such points (found with a KD-tree over the cell centres) and not joined yet.
+3. Every other point joins the cluster of its nearest core point if it lies within eps of it,
+   and is noise otherwise. predict() assigns new points with the same rule, without refitting.
+
+Core points and clusters are exactly those of DBSCAN, numbered the same way (in the order of
+their first core point). A border point within eps of core points of two clusters joins the
+cluster of the nearest one, where DBSCAN gives it to whichever cluster reached it first.
+"""
+import numpy as np
+from sklearn.base import BaseEstimator, ClusterMixin
+from sklearn.neighbors import KDTree
+from sklearn.utils.validation import check_array, check_is_fitted
+
+
+DEFAULT_CHUNK_SIZE = 100000
+BRUTE_FORCE_PAIRS = 250000  # Largest number of point pairs of two cells compared directly
+
+
+def grid_cells(cells):
+    """
+    Number the distinct rows of an integer matrix of cell coordinates.
+
+    Returns:
+        tuple: (cell number of every row, index of the first row of every cell, number of rows
+        of every cell).
+    """
+    spans = cells.max(axis=0) + 1
+    if np.prod(spans.astype(np.float64)) < 2 ** 62:
+        # Mixed-radix key: one integer per cell, much faster to sort than rows
+        keys = np.ravel_multi_index(tuple(cells.T), tuple(spans))
+        _, first, inverse, counts = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+    else:
+        _, first, inverse, counts = np.unique(cells, axis=0, return_index=True, return_inverse=True, return_counts=True)
+    return inverse.ravel(), first, counts
+
+
+def k_distance_eps(X, min_samples=5, quantile=0.95, max_rows=100000, random_state=0):
+    """
+    Choose the eps of DBSCAN from the distance of every point to its min_samples-th nearest
+    neighbour (the point itself included), the k-distance of Ester et al.
+
+    A point is a core point exactly when its k-distance is at most eps, so with eps the
+    `quantile` quantile of the k-distances that fraction of the points are core points and at
+    most the rest are noise, whatever the number and scale of the features.
+
+    Args:
+        X (array-like): Points the clustering is fitted on.
+        min_samples (int): min_samples of the clustering.
+        quantile (float): Fraction of the points that are to be core points.
+        max_rows (int): Most points the k-distances are computed on, a uniform sample of X.
+            Points are sparser in a sample, so its eps is somewhat larger than that of X.
+        random_state (int): Seed of the sample.
+
+    Returns:
+        float: eps, positive.
+    """
+    X = check_array(X, dtype=np.float64)
+    if len(X) > max_rows:
+        X = X[np.random.default_rng(random_state).choice(len(X), max_rows, replace=False)]
+    distances, _ = KDTree(X).query(X, k=min(min_samples, len(X)))
+    k_distances = distances[:, -1]
+    eps = float(np.quantile(k_distances, quantile))
+    if eps > 0:
+        return eps
+    # Most points are duplicates of min_samples others
+    positive = k_distances[k_distances > 0]
+    return float(positive.min()) if len(positive) else 1.0
+
+
+def box_distance(points, low, high):
+    """Return the distance of every point to an axis-aligned box."""
+    gap = np.maximum(np.maximum(low - points, points - high), 0)
+    return np.sqrt((gap ** 2).sum(axis=1))
+
+
+class GridDBSCAN(ClusterMixin, BaseEstimator):
+    """
+    DBSCAN with bounded memory and out-of-sample assignment, for low-dimensional data.
+
+    Args:
+        eps (float): Largest distance between two points for them to be neighbours.
+        min_samples (int): Neighbours (the point included) a point needs to be a core point.
+        leaf_size (int): Leaf size of the KD-trees.
+        chunk_size (int): Points queried at once, which bounds the memory of the queries.
+
+    Attributes:
+        labels_ (np.ndarray): Cluster of every fitted point, -1 for noise.
+        core_sample_indices_ (np.ndarray): Indices of the core points.
+        components_ (np.ndarray): Core points, used to assign new points.
+        core_labels_ (np.ndarray): Cluster of every core point.
+    """
+
+    def __init__(self, eps=0.5, min_samples=5, leaf_size=40, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.eps = eps
+        self.min_samples = min_samples
+        self.leaf_size = leaf_size
+        self.chunk_size = chunk_size
+
+    def fit(self, X, y=None):
+        X = check_array(X, dtype=np.float64)
+        self.n_features_in_ = X.shape[1]
+        # A hair under eps / sqrt(d), so that rounding never puts two points further apart than
+        # eps in the same cell
+        side = self.eps / np.sqrt(X.shape[1]) * (1 - 1e-9)
+        origin = X.min(axis=0)
+        cells = np.floor((X - origin) / side).astype(np.int64)
+        cell_of_point, cell_first, cell_sizes = grid_cells(cells)
+
+        core = self._core_points(X, cell_sizes[cell_of_point] >= self.min_samples)
+        core_indices = np.flatnonzero(core)
+
+        # Core points grouped by cell
+        core_cells = cell_of_point[core_indices]
+        order = np.argsort(core_cells, kind="stable")
+        grouped = core_indices[order]
+        core_cell_ids, starts = np.unique(core_cells[order], return_index=True)
+        ends = np.append(starts[1:], len(grouped))
+        low = origin + cells[cell_first[core_cell_ids]] * side
+        roots = self._join_cells(X, grouped, starts, ends, low, low + side)
+
+        # Clusters numbered by their first core point, as DBSCAN does
+        point_roots = np.empty(len(grouped), dtype=np.int64)
+        for cell, (start, end) in enumerate(zip(starts, ends)):
+            point_roots[start:end] = roots[cell]
+        first_point = np.full(len(core_cell_ids), len(X), dtype=np.int64)
+        np.minimum.at(first_point, point_roots, grouped)
+        used = np.flatnonzero(first_point < len(X))
+        cluster_of_root = np.full(len(core_cell_ids), -1, dtype=np.int64)
+        cluster_of_root[used[np.argsort(first_point[used], kind="stable")]] = np.arange(len(used))
+
+        labels = np.full(len(X), -1, dtype=np.int64)
+        labels[grouped] = cluster_of_root[point_roots]
+        self.core_sample_indices_ = core_indices
+        self.components_ = X[core_indices]
+        self.core_labels_ = labels[core_indices]
+        self.core_tree_ = KDTree(self.components_, leaf_size=self.leaf_size) if len(core_indices) else None
+
+        border = np.flatnonzero(~core)
+        labels[border] = self._assign(X[border])
+        self.labels_ = labels
+        return self
+
+    def _core_points(self, X, core):
+        """Count the neighbours of the points not known to be core points yet."""
+        undecided = np.flatnonzero(~core)
+        if len(undecided):
+            tree = KDTree(X, leaf_size=self.leaf_size)
+            for start in range(0, len(undecided), self.chunk_size):
+                chunk = undecided[start:start + self.chunk_size]
+                core[chunk] = tree.query_radius(X[chunk], self.eps, count_only=True) >= self.min_samples
+        return core
+
+    def _join_cells(self, X, grouped, starts, ends, low, high):
+        """
+        Join the cells holding core points within eps of each other.
+
+        Returns:
+            np.ndarray: Representative cell of the cluster of every cell.
+        """
+        parent = list(range(len(starts)))
+
+        def find(cell):
+            while parent[cell] != cell:
+                parent[cell] = parent[parent[cell]]
+                cell = parent[cell]
+            return cell
+
+        if len(starts) > 1:
+            centres = (low + high) / 2
+            # Points of two cells can be within eps when their centres are within eps plus a diagonal
+            centre_tree = KDTree(centres, leaf_size=self.leaf_size)
+            for chunk_start in range(0, len(starts), self.chunk_size):
+                chunk = range(chunk_start, min(chunk_start + self.chunk_size, len(starts)))
+                neighbours = centre_tree.query_radius(centres[chunk.start:chunk.stop], 2 * self.eps)
+                for a, candidates in zip(chunk, neighbours):
+                    for b in candidates[candidates > a]:
+                        root_a, root_b = find(a), find(b)
+                        if root_a != root_b and self._cells_touch(
+                                X[grouped[starts[a]:ends[a]]], X[grouped[starts[b]:ends[b]]],
+                                low[a], high[a], low[b], high[b]):
+                            parent[root_b] = root_a
+        return np.array([find(cell) for cell in range(len(starts))], dtype=np.int64)
+
+    def _cells_touch(self, points_a, points_b, low_a, high_a, low_b, high_b):
+        """Return whether a point of one cell lies within eps of a point of the other."""
+        # Only the points facing the other cell can be close enough
+        distance_a = box_distance(points_a, low_b, high_b)
+        points_a, distance_a = points_a[distance_a <= self.eps], distance_a[distance_a <= self.eps]
+        if not len(points_a):
+            return False
+        distance_b = box_distance(points_b, low_a, high_a)
+        points_b, distance_b = points_b[distance_b <= self.eps], distance_b[distance_b <= self.eps]
+        if not len(points_b):
+            return False
+        if len(points_a) * len(points_b) <= BRUTE_FORCE_PAIRS:
+            return self._within_eps(points_a, points_b)
+
+        # Neighbouring cells of dense regions almost always touch: try the points closest to
+        # the other cell first
+        closest = int(np.sqrt(BRUTE_FORCE_PAIRS))
+        if self._within_eps(points_a[np.argpartition(distance_a, min(closest, len(points_a)) - 1)[:closest]],
+                            points_b[np.argpartition(distance_b, min(closest, len(points_b)) - 1)[:closest]]):
+            return True
+        if len(points_a) < len(points_b):
+            points_a, points_b = points_b, points_a
+        distances, _ = KDTree(points_a, leaf_size=self.leaf_size).query(points_b, k=1)
+        return bool(distances.min() <= self.eps)
+
+    def _within_eps(self, points_a, points_b):
+        """Compare all the pairs of points of two small sets."""
+        distances = ((points_a[:, None, :] - points_b[None, :, :]) ** 2).sum(axis=2)
+        return bool(distances.min() <= self.eps ** 2)
+
+    def predict(self, X):
+        """
+        Assign points to the cluster of their nearest core point, or to noise (-1) if no core
+        point lies within eps of them.
+        """
+        check_is_fitted(self, "core_labels_")
+        return self._assign(check_array(X, dtype=np.float64))
+
+    def _assign(self, X):
+        """predict() on an already validated array."""
+        labels = np.full(len(X), -1, dtype=np.int64)
+        if self.core_tree_ is None:
+            return labels
+        for start in range(0, len(X), self.chunk_size):
+            distances, nearest = self.core_tree_.query(X[start:start + self.chunk_size], k=1)
+            labels[start:start + len(nearest)] = np.where(
+                distances[:, 0] <= self.eps, self.core_labels_[nearest[:, 0]], -1
+            )
+        return labels
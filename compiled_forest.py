@@ -0,0 +1,145 @@
+"""
+Low-latency scoring with a fitted scikit-learn IsolationForest.
+
+IsolationForest.decision_function costs about 10 ms per call whatever the batch size, spent
+on input validation and dispatching the trees one by one, which rules it out for scoring live
+transactions. CompiledIsolationForest copies the nodes of all the trees into flat NumPy arrays
+once and walks every tree for every row together, one level per step, so a small batch is
+scored in tens of microseconds with the same results as the estimator.
+"""
+import numpy as np
+
+
+DEFAULT_BLOCK_ROWS = 1024
+
+
+def average_path_length(n_samples):
+    """
+    Average path length of an unsuccessful search in a binary search tree of n_samples nodes,
+    the normalization of isolation depths used by IsolationForest.
+    """
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    lengths = np.zeros_like(n_samples)
+    lengths[n_samples == 2] = 1.0
+    large = n_samples > 2
+    lengths[large] = (
+        2.0 * (np.log(n_samples[large] - 1.0) + np.euler_gamma)
+        - 2.0 * (n_samples[large] - 1.0) / n_samples[large]
+    )
+    return lengths
+
+
+def breadth_first_order(children_left, children_right):
+    """Return the nodes of a tree in breadth-first order, every right child after its left sibling."""
+    order = [0]
+    for node in order:
+        if children_left[node] != -1:
+            order.extend((children_left[node], children_right[node]))
+    return np.array(order, dtype=np.int64)
+
+
+def float32_floor(values):
+    """
+    Round float64 values down to float32, so that for any float32 x, x <= value holds exactly
+    when x <= float32_floor(value) does.
+    """
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def node_depths(children_left, children_right, max_depth):
+    """Return the depth of every node of a tree, the root being at depth 0."""
+    depths = np.zeros(len(children_left), dtype=np.float64)
+    internal = np.flatnonzero(children_left != -1)
+    # Every pass sets the depth of one more level of children from their parents'
+    for _ in range(max_depth):
+        depths[children_left[internal]] = depths[internal] + 1
+        depths[children_right[internal]] = depths[internal] + 1
+    return depths
+
+
+class CompiledIsolationForest:
+    """
+    Flat, vectorized copy of a fitted IsolationForest, optionally preceded by a StandardScaler.
+
+    Nodes are numbered breadth first, so the right child of a node always follows the left one
+    and a row moves to left[node] + (x > threshold). Leaves point to themselves, so every row
+    can be moved down all the trees for max_depth steps without checking which ones reached a
+    leaf. Thresholds are rounded down to float32, which gives the comparisons of the float32
+    rows with the float64 thresholds the same results in half the memory traffic. Rows are
+    scored in blocks of block_rows, whose node arrays stay in the CPU caches.
+
+    Args:
+        forest (IsolationForest): Fitted forest.
+        scaler (StandardScaler): Fitted scaler the forest's inputs were transformed with, applied
+            to the rows before scoring. None if the forest takes raw features.
+        block_rows (int): Rows scored at once.
+    """
+
+    def __init__(self, forest, scaler=None, block_rows=DEFAULT_BLOCK_ROWS):
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees[:-1]])
+
+        left, feature, threshold, leaf_value = [], [], [], []
+        for tree, offset, features in zip(trees, offsets, forest.estimators_features_):
+            order = breadth_first_order(tree.children_left, tree.children_right)
+            renumbered = np.empty(tree.node_count, dtype=np.int64)
+            renumbered[order] = np.arange(tree.node_count)
+            children = tree.children_left[order]
+            is_leaf = children == -1
+            left.append(np.where(is_leaf, np.arange(tree.node_count), renumbered[children]) + offset)
+            feature.append(np.asarray(features)[np.where(is_leaf, 0, tree.feature[order])])
+            threshold.append(np.where(is_leaf, np.inf, float32_floor(tree.threshold[order])))
+            leaf_value.append((
+                node_depths(tree.children_left, tree.children_right, tree.max_depth)
+                + average_path_length(tree.n_node_samples)
+            )[order])
+
+        self.left = np.concatenate(left).astype(np.intp)
+        self.feature = np.concatenate(feature).astype(np.intp)
+        self.threshold = np.concatenate(threshold).astype(np.float32)
+        self.leaf_value = np.concatenate(leaf_value)
+        self.roots = offsets.astype(np.intp)
+        self.max_depth = max(tree.max_depth for tree in trees)
+        self.normalizer = len(trees) * average_path_length([forest.max_samples_])[0]
+        self.offset = forest.offset_
+        self.n_features = forest.n_features_in_
+        self.block_rows = block_rows
+        self.mean = None if scaler is None or scaler.mean_ is None else np.asarray(scaler.mean_)
+        self.scale = None if scaler is None or scaler.scale_ is None else np.asarray(scaler.scale_)
+
+    def transform(self, X):
+        """Scale raw rows as the scaler would, and cast them to float32 like the trees do."""
+        X = np.asarray(X, dtype=np.float64).reshape(-1, self.n_features)
+        if self.mean is not None:
+            X = X - self.mean
+        if self.scale is not None:
+            X = X / self.scale
+        return X.astype(np.float32)
+
+    def score_samples(self, X):
+        """Return IsolationForest.score_samples of (scaled) rows: the lower, the more abnormal."""
+        X = self.transform(X)
+        if self.normalizer == 0:
+            return -np.ones(len(X))
+        depths = np.empty(len(X))
+        for start in range(0, len(X), self.block_rows):
+            block = X[start:start + self.block_rows]
+            values = block.ravel()
+            row_starts = (np.arange(len(block)) * self.n_features)[:, None]
+            nodes = np.broadcast_to(self.roots, (len(block), len(self.roots)))
+            for _ in range(self.max_depth):
+                go_right = ~(np.take(values, row_starts + np.take(self.feature, nodes)) <= np.take(self.threshold, nodes))
+                nodes = np.take(self.left, nodes) + go_right
+            depths[start:start + len(block)] = np.take(self.leaf_value, nodes).sum(axis=1)
+        return -(2.0 ** (-depths / self.normalizer))
+
+    def decision_function(self, X):
+        """Return IsolationForest.decision_function of (scaled) rows: negative for anomalies."""
+        return self.score_samples(X) - self.offset
+
+    def predict(self, X):
+        """Return 1 for anomalies and 0 for normal rows."""
+        return (self.decision_function(X) < 0).astype(int)
@@ -0,0 +1,295 @@
+"""
+Bounded in-process caches of dimension rows (Accounts, Subscribers, Agents), looked up by key.
+
+Enriching a transaction needs a few attributes of its account, subscriber and agent. Reading
+accounts.csv or querying MySQL for every transaction costs milliseconds. DimensionCache keeps
+the rows in a dict in least recently used order (collections.OrderedDict), so looking up a hot
+key is one hash lookup and one move to the end of the order, well under a microsecond.
+
+- The cache is bounded by an estimate of the memory of its entries (sys.getsizeof of the keys,
+  rows and values), not by a number of rows: wide rows or long strings take their real share.
+  The least recently used rows are evicted beyond max_bytes.
+- Rows are served for ttl seconds after being loaded, then fetched again, so that changes of
+  the dimension tables are picked up.
+- Misses are fetched by the cache's loader, with one call for all the misses of a batch of keys.
+  mysql_loader fetches them from MySQL with SELECT ... WHERE key IN (...). Keys the loader does
+  not find are cached as absent for ttl seconds too, so that an unknown key costs one query per
+  ttl rather than one per lookup.
+- preload fills the cache from a DataFrame, a stored table (CSV/Parquet) or a MySQL table, until
+  max_bytes.
+- stats() reports the hits (of which lookups of keys cached as absent), misses, hit rate,
+  evictions, expirations and size of the cache.
+
+Usage:
+    python dimension_cache.py [--format parquet] [--data-dir .] [--max-mb 64]
+"""
+import argparse
+import sys
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from storage import open_storage
+
+
+DIMENSION_KEYS = {"Accounts": "Account_ID", "Subscribers": "Subscriber_ID", "Agents": "Agent_ID",
+                  "Time_Dimension": "Time_ID"}
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+ENTRY_OVERHEAD = 150  # Bytes of the dict slot, order links and entry tuple of a row
+MYSQL_IN_KEYS = 1000  # Keys per SELECT ... WHERE key IN (...)
+MYSQL_FETCH_ROWS = 10000
+
+
+def entry_bytes(key, row):
+    """Estimate the memory of a cached row."""
+    return ENTRY_OVERHEAD + sys.getsizeof(key) + sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+
+
+class DimensionCache:
+    """
+    LRU cache of the rows of a dimension table, by primary key.
+
+    Args:
+        columns (list): Attributes of the rows, in the order of the tuples returned by get().
+        max_bytes (int): Bound of the estimated memory of the cached rows.
+        ttl (float): Seconds a row is served after being loaded, None for no expiry.
+        loader (callable): Called with a list of keys missing from the cache, returns a dict of
+            key -> row (tuple of the columns) for those that exist. The others are cached as
+            absent. Without it, only preloaded or put rows are found.
+    """
+
+    def __init__(self, columns, max_bytes=DEFAULT_MAX_BYTES, ttl=None, loader=None):
+        self.columns = list(columns)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.loader = loader
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.absent_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()  # Key -> (row or None for absent keys, expiry time or None, bytes)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Return the row (tuple of the columns) of a key, loading it on a miss, or `default` if
+        the key does not exist.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if entry[0] is None:
+                self.absent_hits += 1
+                return default
+            return entry[0]
+        return self._load([key]).get(key, default)
+
+    def get_many(self, keys):
+        """Return the rows of keys, in order, None for keys that do not exist. Misses are loaded at once."""
+        entries, now = self._entries, time.monotonic()
+        rows, missing = [], []
+        for key in keys:
+            entry = entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > now):
+                entries.move_to_end(key)
+                rows.append(entry[0])
+                if entry[0] is None:
+                    self.absent_hits += 1
+            else:
+                rows.append(None)
+                missing.append(key)
+        self.hits += len(rows) - len(missing)
+        if missing:
+            unique = list(dict.fromkeys(missing))
+            self.misses += len(missing) - len(unique)
+            loaded = self._load(unique)
+            rows = [loaded.get(key) if row is None else row for key, row in zip(keys, rows)]
+        return rows
+
+    def lookup(self, keys):
+        """Return the rows of keys as a DataFrame of the columns, in order, with missing values for unknown keys."""
+        empty = (None,) * len(self.columns)
+        rows = self.get_many(keys)
+        return pd.DataFrame.from_records([empty if row is None else row for row in rows], columns=self.columns)
+
+    def _load(self, keys):
+        """Count the misses of keys, drop their expired rows and load them."""
+        self.misses += len(keys)
+        for key in keys:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.nbytes -= entry[2]
+                self.expirations += 1
+        if self.loader is None:
+            return {}
+        loaded = self.loader(keys)
+        for key in keys:
+            # Keys not found are cached as absent, so that they are not fetched at every lookup
+            self._store(key, tuple(loaded[key]) if key in loaded else None)
+        return loaded
+
+    def put(self, key, row):
+        """Cache the row of a key, evicting the least recently used rows beyond max_bytes."""
+        self._store(key, tuple(row))
+
+    def _store(self, key, row):
+        """Cache the row of a key, None for a key that does not exist."""
+        size = entry_bytes(key, () if row is None else row)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= old[2]
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (row, None if self.ttl is None else time.monotonic() + self.ttl, size)
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self.nbytes -= evicted
+            self.evictions += 1
+
+    def invalidate(self, key=None):
+        """Forget the row of a key, or all the rows."""
+        if key is None:
+            self._entries.clear()
+            self.nbytes = 0
+        else:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.nbytes -= entry[2]
+
+    def preload(self, rows):
+        """
+        Cache rows until the cache is full, without evicting any.
+
+        Args:
+            rows (iterable): (key, value of each column) tuples, e.g. the itertuples of a
+                DataFrame of the key and the columns.
+
+        Returns:
+            int: Rows cached.
+        """
+        loaded = 0
+        for key, *row in rows:
+            if self.nbytes + entry_bytes(key, row) > self.max_bytes:
+                break
+            self.put(key, row)
+            loaded += 1
+        return loaded
+
+    def preload_frame(self, frame, key):
+        """Cache the rows of a DataFrame holding the key and the columns, until the cache is full."""
+        return self.preload(frame[[key] + self.columns].itertuples(index=False, name=None))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "absent_hits": self.absent_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "rows": len(self._entries),
+            "absent_rows": sum(1 for row, _, _ in self._entries.values() if row is None),
+            "bytes": self.nbytes
+        }
+
+
+def from_storage(storage, table_name, columns, key=None, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Create a cache of a stored dimension table, preloaded with its first rows up to max_bytes.
+
+    Only the key and the columns are read: Parquet files never read the other columns. Stored
+    tables are not searched on a miss, so rows beyond max_bytes are not found and the rows do
+    not expire.
+    """
+    key = key or DIMENSION_KEYS[table_name]
+    cache = DimensionCache(columns, max_bytes)
+    frame = storage.read(table_name, columns=[key] + list(columns)).drop_duplicates(key)
+    cache.preload_frame(frame.astype(object).where(frame.notna(), None), key)
+    return cache
+
+
+def mysql_loader(connection, table_name, columns, key=None):
+    """
+    Return a loader fetching the rows of missing keys from a MySQL table, MYSQL_IN_KEYS at a time.
+
+    Args:
+        connection: Open connection to the fraud_detection database (see mysql_loader.connect).
+        table_name (str): Dimension table.
+        columns (list): Columns of the rows.
+        key (str): Primary key column, DIMENSION_KEYS of the table by default.
+    """
+    key = key or DIMENSION_KEYS[table_name]
+    select = ", ".join(f"`{column}`" for column in [key] + list(columns))
+
+    def load(keys):
+        rows = {}
+        cursor = connection.cursor()
+        try:
+            for start in range(0, len(keys), MYSQL_IN_KEYS):
+                chunk = keys[start:start + MYSQL_IN_KEYS]
+                cursor.execute(
+                    f"SELECT {select} FROM `{table_name}` WHERE `{key}` IN ({', '.join(['%s'] * len(chunk))})",
+                    chunk
+                )
+                rows.update((row[0], row[1:]) for row in cursor.fetchall())
+        finally:
+            cursor.close()
+        return rows
+
+    return load
+
+
+def from_mysql(connection, table_name, columns, key=None, max_bytes=DEFAULT_MAX_BYTES, ttl=None, preload=True):
+    """
+    Create a cache of a MySQL dimension table, loading misses from it, optionally preloaded
+    with its first rows up to max_bytes.
+    """
+    key = key or DIMENSION_KEYS[table_name]
+    cache = DimensionCache(columns, max_bytes, ttl, loader=mysql_loader(connection, table_name, columns, key))
+    if preload:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(f"SELECT {', '.join(f'`{column}`' for column in [key] + list(columns))} FROM `{table_name}`")
+            while rows := cursor.fetchmany(MYSQL_FETCH_ROWS):
+                if cache.preload(rows) < len(rows):
+                    break
+        finally:
+            cursor.close()
+    return cache
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure dimension cache lookups on the Transactions table.")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Storage format of the tables")
+    parser.add_argument("--data-dir", default=".", help="Directory of the tables")
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_BYTES / 1024 / 1024,
+                        help="Bound of the memory of each cache, in MB")
+    args = parser.parse_args(argv)
+
+    storage = open_storage(args.format, args.data_dir)
+    transactions = storage.read("Transactions", columns=["Account_ID", "Subscriber_ID", "Agent_ID"])
+    for table_name, columns in (("Accounts", ["Account_type", "Account_status"]),
+                                ("Subscribers", ["Subscriber_type"]),
+                                ("Agents", ["Region"])):
+        start_time = time.perf_counter()
+        cache = from_storage(storage, table_name, columns, max_bytes=int(args.max_mb * 1024 * 1024))
+        preloaded = time.perf_counter() - start_time
+        keys = transactions[DIMENSION_KEYS[table_name]].dropna().tolist()
+        start_time = time.perf_counter()
+        for key in keys:
+            cache.get(key)
+        elapsed = time.perf_counter() - start_time
+        print(f"{table_name}: preloaded {len(cache)} rows ({cache.nbytes / 1e6:.1f} MB) in {preloaded:.2f} s, "
+              f"{len(keys)} lookups at {elapsed / max(len(keys), 1) * 1e9:.0f} ns each, {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Run the canonical fraud queries against the fraud_detection database with EXPLAIN and report
+the index and partitions each of them uses.
+
+Query parameters are taken from a sample transaction of the database, so the plans are those
+of real lookups. Exits with status 1 if any query scans a whole table: an access of type ALL
+in EXPLAIN, a "Table scan on <table>" step in the EXPLAIN ANALYZE tree.
+
+Usage:
+    python explain_fraud_queries.py [--analyze]
+"""
+import argparse
+import re
+import sys
+from datetime import timedelta
+
+from mysql.connector import Error
+
+from mysql_loader import connect
+
+
+# Full scan of a table in the EXPLAIN ANALYZE tree (scans of <temporary> tables left out)
+TABLE_SCAN = re.compile(r"Table scan on (\w+)")
+
+# (name, query, names of the sample values it takes)
+CANONICAL_FRAUD_QUERIES = [
+    (
+        "Subscriber history",
+        "SELECT * FROM Transactions WHERE Subscriber_ID = %s AND Time >= %s ORDER BY Time DESC",
+        ["Subscriber_ID", "window_start"]
+    ),
+    (
+        "Account velocity",
+        "SELECT COUNT(*), SUM(Transaction_amount) FROM Transactions "
+        "WHERE Account_ID = %s AND Time BETWEEN %s AND %s",
+        ["Account_ID", "window_start", "window_end"]
+    ),
+    (
+        "Agent activity",
+        "SELECT COUNT(*), AVG(Anomaly_score) FROM Transactions WHERE Agent_ID = %s AND Time BETWEEN %s AND %s",
+        ["Agent_ID", "window_start", "window_end"]
+    ),
+    (
+        "Outgoing transfers of an account",
+        "SELECT Destination_account, Transaction_amount, Time FROM Transactions "
+        "WHERE Source_account = %s AND Time >= %s",
+        ["Source_account", "window_start"]
+    ),
+    (
+        "Incoming transfers of an account",
+        "SELECT Source_account, Transaction_amount, Time FROM Transactions "
+        "WHERE Destination_account = %s AND Time >= %s",
+        ["Destination_account", "window_start"]
+    ),
+    (
+        "Regional anomalies",
+        "SELECT Transaction_ID, Anomaly_score FROM Transactions "
+        "WHERE Region = %s AND Time BETWEEN %s AND %s AND Anomaly_score > 0.8",
+        ["Region", "window_start", "window_end"]
+    ),
+    (
+        "Highest anomaly scores",
+        "SELECT Transaction_ID, Account_ID, Anomaly_score FROM Transactions "
+        "WHERE Anomaly_score > 0.95 ORDER BY Anomaly_score DESC LIMIT 100",
+        []
+    ),
+    (
+        "Subscriber calls",
+        "SELECT * FROM CallLogs WHERE Subscriber_ID = %s AND Date_Time BETWEEN %s AND %s",
+        ["Subscriber_ID", "window_start", "window_end"]
+    ),
+    (
+        "Subscriber traffic",
+        "SELECT * FROM ISPTraffic WHERE Subscriber_ID = %s AND Time BETWEEN %s AND %s",
+        ["Subscriber_ID", "window_start", "window_end"]
+    ),
+    (
+        "Account support and audit trail",
+        "SELECT s.Log_ID, s.Issue_Type, a.Action, a.Action_Date FROM SupportLogs s "
+        "JOIN AuditLogs a ON a.Account_ID = s.Account_ID WHERE s.Account_ID = %s",
+        ["Account_ID"]
+    )
+]
+
+
+def sample_values(cursor, window_days=30):
+    """Pick the lookup values of the queries from one transaction, with a time window ending at it."""
+    cursor.execute(
+        "SELECT Subscriber_ID, Account_ID, Agent_ID, Source_account, Destination_account, Region, Time "
+        "FROM Transactions WHERE Time IS NOT NULL ORDER BY Time DESC LIMIT 1"
+    )
+    row = cursor.fetchone()
+    if row is None:
+        raise ValueError("Transactions is empty, load the tables first")
+    values = dict(zip(cursor.column_names, row))
+    values["window_end"] = values["Time"]
+    values["window_start"] = values["Time"] - timedelta(days=window_days)
+    return values
+
+
+def explain(cursor, query, params, analyze=False):
+    """Return the EXPLAIN rows of a query as dicts."""
+    cursor.execute(("EXPLAIN ANALYZE " if analyze else "EXPLAIN ") + query, params)
+    return [dict(zip(cursor.column_names, row)) for row in cursor.fetchall()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="EXPLAIN the canonical fraud queries and check their index usage.")
+    parser.add_argument("--analyze", action="store_true", help="Run EXPLAIN ANALYZE (executes the queries)")
+    args = parser.parse_args(argv)
+
+    full_scans = []
+    try:
+        connection = connect()
+        cursor = connection.cursor()
+        values = sample_values(cursor)
+        for name, query, value_names in CANONICAL_FRAUD_QUERIES:
+            params = tuple(values[value_name] for value_name in value_names)
+            print(f"\n{name}:\n  {query}")
+            for plan in explain(cursor, query, params, args.analyze):
+                if args.analyze:
+                    tree = str(next(iter(plan.values())))
+                    print("  " + "\n  ".join(tree.splitlines()))
+                    full_scans.extend((name, table) for table in TABLE_SCAN.findall(tree))
+                    continue
+                print(f"  table={plan.get('table')} partitions={plan.get('partitions')} type={plan.get('type')} "
+                      f"key={plan.get('key')} rows={plan.get('rows')} extra={plan.get('Extra')}")
+                if plan.get("type") == "ALL":
+                    full_scans.append((name, plan.get("table")))
+        cursor.close()
+        connection.close()
+    except Error as e:
+        print(f"Error: {e}")
+        return 1
+
+    if full_scans:
+        print("\nFull table scans:")
+        for name, table in full_scans:
+            print(f"  {name}: {table}")
+        return 1
+    print("\nAll queries use an index.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,388 @@
+"""
+Behavioural features of transactions, built from the tables related to them.
+
+Every transaction is described by its own values and by aggregates of the entities it involves:
+its subscriber (transactions, calls, ISP traffic, SIM cards, devices, messages and social media
+posts), its account and its agent. The entities of a kind are numbered once by hashing their
+keys. The rows of every related table are mapped to those numbers with one vectorized lookup
+(integrity.KeyIndex) and aggregated with np.bincount into the entity's profile
+(entity_profiles). transaction_features gathers the profiles back onto transactions by number:
+those of the whole table (build_features) or those arriving one batch at a time (streaming.py).
+No table is merged, and the features are float32, half the size of the float64 frames pandas
+would build.
+
+Social media posts have no subscriber key: they are attributed to the subscriber whose
+Subscriber_email is the post's Email.
+
+Transfers between accounts (Source_account -> Destination_account) and messages between
+subscribers (Sender_ID -> Receiver_ID) are analysed as graphs by graph_features.py: the
+transaction's source and destination accounts are described by their fan-in, fan-out, pass
+through of money, connected component and short cycles, its subscriber by its message contacts.
+
+Usage:
+    python features.py [--format parquet] [--data-dir .]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from graph_features import encode_edges, graph_profile
+from integrity import KeyIndex
+from storage import open_storage
+
+
+FEATURES_TABLE = "TransactionFeatures"
+SECONDS_PER_DAY = 86400
+
+# Columns read from each table, only those the features need
+FEATURE_TABLE_COLUMNS = {
+    "Transactions": ["Transaction_ID", "Transaction_amount", "Anomaly_score", "Transaction_status",
+                     "Subscriber_ID", "Account_ID", "Agent_ID", "Source_account", "Destination_account", "Time"],
+    "Subscribers": ["Subscriber_ID", "Subscriber_email"],
+    "CallLogs": ["Subscriber_ID", "Call_Status", "Duration"],
+    "ISPTraffic": ["Subscriber_ID", "Traffic_Status", "Data_Transferred"],
+    "SIMInfo": ["Subscriber_ID", "Activation_Date"],
+    "DeviceInfo": ["Subscriber_ID", "IMEI"],
+    "Messages": ["Sender_ID", "Receiver_ID"],
+    "SocialMediaLogs": ["Email", "Fraud_detection_score"]
+}
+
+FEATURE_COLUMNS = [
+    # The transaction
+    "Transaction_amount", "Anomaly_score", "Hour", "Failed",
+    # Transactions of its subscriber, account and agent
+    "Subscriber_transactions", "Subscriber_transactions_per_day", "Subscriber_log_seconds_since_previous",
+    "Amount_to_subscriber_mean",
+    "Account_transactions", "Account_destinations",
+    "Agent_transactions", "Agent_amount_mean",
+    # Activity of its subscriber in the other tables
+    "Calls", "Failed_call_ratio", "Call_duration_mean",
+    "Traffic_records", "Blocked_traffic_ratio", "Log_data_transferred",
+    "SIM_cards", "SIM_age_days",
+    "Devices", "Device_IMEIs",
+    "Messages_sent", "Messages_received",
+    "Social_posts", "Social_fraud_score_mean",
+    "Message_contacts", "Message_reciprocal_contacts", "Message_component_size",
+    # Transfer graph around its source and destination accounts
+    "Source_fan_in", "Source_fan_out", "Source_pass_through_ratio", "Source_component_size",
+    "Source_reciprocal_counterparties", "Source_three_cycles",
+    "Destination_fan_in", "Destination_fan_out", "Destination_pass_through_ratio", "Destination_component_size",
+    "Destination_reciprocal_counterparties", "Destination_three_cycles"
+]
+
+ENTITY_KEYS = ["Subscriber_ID", "Account_ID", "Agent_ID"]
+# Transfer graph features of accounts, prefixed with Source_/Destination_ in FEATURE_COLUMNS
+ACCOUNT_GRAPH_FEATURES = ["Fan_in", "Fan_out", "Pass_through_ratio", "Component_size",
+                          "Reciprocal_counterparties", "Three_cycles"]
+
+# Value of the time features of transactions with no earlier transaction or no SIM card
+NO_PREVIOUS_TRANSACTION_SECONDS = 30 * SECONDS_PER_DAY
+NO_SIM_AGE_DAYS = -1
+
+
+def load_feature_tables(storage):
+    """Read the columns of the tables the features are built from, skipping missing tables."""
+    tables = {}
+    for table_name, columns in FEATURE_TABLE_COLUMNS.items():
+        if storage.exists(table_name):
+            tables[table_name] = storage.read(table_name, columns=columns)
+        else:
+            print(f"Warning: Table '{table_name}' not found, its features will be 0.")
+    return tables
+
+
+def numeric(values):
+    """Numeric values of a column, values that are not numbers (e.g. dummy rows) becoming NaN."""
+    return pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+
+
+def seconds(values):
+    """ISO 8601 timestamps as float seconds, values that are not timestamps becoming NaN."""
+    times = pd.to_datetime(values, format="ISO8601", errors="coerce")
+    return np.where(times.isna(), np.nan, times.to_numpy(dtype="datetime64[s]").astype(np.float64))
+
+
+def count_by(codes, n_entities, weights=None):
+    """Count (or sum the weights of) the rows of every entity, ignoring rows of unknown entities (-1)."""
+    known = codes >= 0
+    return np.bincount(codes[known], weights=None if weights is None else weights[known], minlength=n_entities)
+
+
+def mean_by(codes, n_entities, values):
+    """Mean of the non-NaN values of every entity, 0 for entities without any."""
+    known = ~np.isnan(values)
+    counts = count_by(codes[known], n_entities)
+    sums = count_by(codes[known], n_entities, values[known])
+    return np.divide(sums, counts, out=np.zeros(n_entities), where=counts > 0)
+
+
+def ratio_by(codes, n_entities, flags):
+    """Share of the rows of every entity that are flagged, 0 for entities without rows."""
+    counts = count_by(codes, n_entities)
+    return np.divide(count_by(codes, n_entities, flags.astype(np.float64)), counts,
+                     out=np.zeros(n_entities), where=counts > 0)
+
+
+def distinct_by(codes, n_entities, values):
+    """Number of distinct non-null values of every entity."""
+    value_codes, distinct_values = pd.factorize(values)
+    known = (codes >= 0) & (value_codes >= 0)
+    # One integer per (entity, value) pair
+    pairs = np.sort(codes[known].astype(np.int64) * max(len(distinct_values), 1) + value_codes[known])
+    first = np.ones(len(pairs), dtype=bool)
+    first[1:] = pairs[1:] != pairs[:-1]
+    return count_by(pairs[first] // max(len(distinct_values), 1), n_entities)
+
+
+def max_by(codes, n_entities, values, empty=np.nan):
+    """Largest non-NaN value of every entity, `empty` for entities without any."""
+    known = (codes >= 0) & ~np.isnan(values)
+    result = np.full(n_entities, -np.inf)
+    np.maximum.at(result, codes[known], values[known])
+    result[np.isneginf(result)] = empty
+    return result
+
+
+def seconds_since_previous(codes, times):
+    """Seconds between every transaction and the previous one of its entity, NaN for the first."""
+    order = np.lexsort((times, codes))
+    sorted_codes, sorted_times = codes[order], times[order]
+    gaps = np.empty(len(order))
+    gaps[:1] = np.nan
+    gaps[1:] = np.where(sorted_codes[1:] == sorted_codes[:-1], np.diff(sorted_times), np.nan)
+    result = np.empty(len(order))
+    result[order] = gaps
+    result[codes < 0] = np.nan
+    return result
+
+
+def number_entities(transactions):
+    """
+    Number the entities of transactions: subscribers, accounts and agents by pd.factorize on
+    their key column, and the source and destination accounts of transfers together, as the
+    nodes of the transfer graph.
+
+    Returns:
+        dict: Key column -> (codes, keys).
+    """
+    entities = {key: pd.factorize(transactions[key]) for key in ENTITY_KEYS}
+    source_codes, destination_codes, accounts = encode_edges(transactions["Source_account"],
+                                                             transactions["Destination_account"])
+    entities["Source_account"] = (source_codes, accounts)
+    entities["Destination_account"] = (destination_codes, accounts)
+    return entities
+
+
+def entity_profiles(tables, entities=None):
+    """
+    Aggregate the transactions and related tables of every subscriber, account and agent.
+
+    Args:
+        tables (dict): Table name -> DataFrame, as for build_features.
+        entities (dict): Key column -> (codes, keys) of the transactions' entities, as returned
+            by number_entities. Computed when not given.
+
+    Returns:
+        dict: Key column (Subscriber_ID, Account_ID, Agent_ID, Source_account,
+        Destination_account) -> pd.DataFrame indexed by the entities' keys, holding the entity
+        columns of FEATURE_COLUMNS and, for subscribers, the Mean_amount, Last_transaction and
+        Last_activation (seconds) transaction_features needs.
+        Aggregates of missing tables are left out.
+    """
+    transactions = tables["Transactions"]
+    if entities is None:
+        entities = number_entities(transactions)
+    amounts = numeric(transactions["Transaction_amount"])
+    times = seconds(transactions["Time"])
+
+    subscriber_codes, subscriber_keys = entities["Subscriber_ID"]
+    n_subscribers = len(subscriber_keys)
+    first = -max_by(subscriber_codes, n_subscribers, -times)
+    last = max_by(subscriber_codes, n_subscribers, times)
+    transaction_counts = count_by(subscriber_codes, n_subscribers)
+    subscriber = {
+        "Subscriber_transactions": transaction_counts,
+        "Subscriber_transactions_per_day": np.nan_to_num(
+            transaction_counts / np.fmax((last - first) / SECONDS_PER_DAY, 1.0)
+        ),
+        "Mean_amount": mean_by(subscriber_codes, n_subscribers, amounts),
+        "Last_transaction": last
+    }
+
+    subscribers = KeyIndex(subscriber_keys)
+
+    def related(table_name, build):
+        """Per-subscriber aggregates of a related table."""
+        if table_name in tables:
+            df = tables[table_name]
+            subscriber.update(build(df, subscribers.positions(df["Subscriber_ID"])))
+
+    related("CallLogs", lambda df, codes: {
+        "Calls": count_by(codes, n_subscribers),
+        "Failed_call_ratio": ratio_by(codes, n_subscribers, (df["Call_Status"] == "Failed").to_numpy()),
+        "Call_duration_mean": mean_by(codes, n_subscribers, numeric(df["Duration"]))
+    })
+    related("ISPTraffic", lambda df, codes: {
+        "Traffic_records": count_by(codes, n_subscribers),
+        "Blocked_traffic_ratio": ratio_by(codes, n_subscribers, (df["Traffic_Status"] == "Blocked").to_numpy()),
+        "Log_data_transferred": np.log1p(count_by(codes, n_subscribers, np.nan_to_num(numeric(df["Data_Transferred"]))))
+    })
+    related("SIMInfo", lambda df, codes: {
+        "SIM_cards": count_by(codes, n_subscribers),
+        "Last_activation": max_by(codes, n_subscribers, seconds(df["Activation_Date"]))
+    })
+    related("DeviceInfo", lambda df, codes: {
+        "Devices": count_by(codes, n_subscribers),
+        "Device_IMEIs": distinct_by(codes, n_subscribers, df["IMEI"])
+    })
+    if "Messages" in tables:
+        messages = tables["Messages"]
+        for name, key in (("Messages_sent", "Sender_ID"), ("Messages_received", "Receiver_ID")):
+            subscriber[name] = count_by(subscribers.positions(messages[key]), n_subscribers)
+        sender_codes, receiver_codes, people = encode_edges(messages["Sender_ID"], messages["Receiver_ID"])
+        contacts = graph_profile(sender_codes, receiver_codes, people)
+        rows = subscribers.positions(people)
+        known = rows >= 0
+        for name, values in (
+            ("Message_contacts", contacts["Fan_out"] + contacts["Fan_in"] - contacts["Reciprocal_counterparties"]),
+            ("Message_reciprocal_contacts", contacts["Reciprocal_counterparties"]),
+            ("Message_component_size", contacts["Component_size"])
+        ):
+            subscriber[name] = np.zeros(n_subscribers)
+            subscriber[name][rows[known]] = values.to_numpy()[known]
+    if "SocialMediaLogs" in tables and "Subscribers" in tables:
+        # Posts -> subscriber by email, then subscriber -> transactions' subscriber numbering
+        emails = tables["Subscribers"].dropna(subset=["Subscriber_email"]).drop_duplicates("Subscriber_email")
+        posts = tables["SocialMediaLogs"]
+        email_rows = KeyIndex(emails["Subscriber_email"]).positions(posts["Email"])
+        codes = np.where(
+            email_rows >= 0, subscribers.positions(emails["Subscriber_ID"].to_numpy()[email_rows]), -1
+        )
+        subscriber["Social_posts"] = count_by(codes, n_subscribers)
+        subscriber["Social_fraud_score_mean"] = mean_by(codes, n_subscribers, numeric(posts["Fraud_detection_score"]))
+
+    account_codes, account_keys = entities["Account_ID"]
+    agent_codes, agent_keys = entities["Agent_ID"]
+    profiles = {
+        "Subscriber_ID": pd.DataFrame(subscriber, index=pd.Index(subscriber_keys, name="Subscriber_ID")),
+        "Account_ID": pd.DataFrame({
+            "Account_transactions": count_by(account_codes, len(account_keys)),
+            "Account_destinations": distinct_by(account_codes, len(account_keys), transactions["Destination_account"])
+        }, index=pd.Index(account_keys, name="Account_ID")),
+        "Agent_ID": pd.DataFrame({
+            "Agent_transactions": count_by(agent_codes, len(agent_keys)),
+            "Agent_amount_mean": mean_by(agent_codes, len(agent_keys), amounts)
+        }, index=pd.Index(agent_keys, name="Agent_ID"))
+    }
+    # One graph of the transfers, whose accounts are profiled as sources and as destinations
+    (source_codes, accounts), (destination_codes, _) = entities["Source_account"], entities["Destination_account"]
+    transfers = graph_profile(source_codes, destination_codes, accounts, amounts)[ACCOUNT_GRAPH_FEATURES]
+    for side in ("Source", "Destination"):
+        profiles[f"{side}_account"] = transfers.rename(
+            columns=lambda column: f"{side}_{column.lower()}"
+        ).rename_axis(f"{side}_account")
+    return profiles
+
+
+def transaction_features(transactions, profiles, positions=None, last_seen=None):
+    """
+    Build the features of transactions from the profiles of their entities.
+
+    Args:
+        transactions (pd.DataFrame): Transactions with the FEATURE_TABLE_COLUMNS of Transactions.
+        profiles (dict): Profiles of the entities, as returned by entity_profiles.
+        positions (dict): Key column -> row of every transaction's entity in its profile (-1 for
+            unknown entities). Looked up in the profiles' index when not given.
+        last_seen (dict): For transactions scored as they arrive: Subscriber_ID -> time (seconds)
+            of their latest transaction, read for the first transaction of a subscriber in the
+            batch (falling back to the profile's Last_transaction) and updated with the batch.
+            Without it, the time since the previous transaction is measured within the batch.
+
+    Returns:
+        pd.DataFrame: Transaction_ID and the FEATURE_COLUMNS (float32) of every transaction.
+    """
+    n = len(transactions)
+    amounts = numeric(transactions["Transaction_amount"])
+    times = seconds(transactions["Time"])
+    features = {
+        "Transaction_amount": amounts,
+        "Anomaly_score": numeric(transactions["Anomaly_score"]),
+        "Hour": np.nan_to_num(times % SECONDS_PER_DAY // 3600),
+        "Failed": (transactions["Transaction_status"] == "failed").to_numpy(dtype=np.float64)
+    }
+    for key, profile in profiles.items():
+        rows = positions[key] if positions is not None else profile.index.get_indexer(transactions[key])
+        values = profile.to_numpy(dtype=np.float64).take(rows, axis=0)
+        values[rows < 0] = np.nan
+        features.update(zip(profile.columns, values.T))
+
+    subscriber_ids = transactions["Subscriber_ID"]
+    batch_codes, batch_subscribers = pd.factorize(subscriber_ids)
+    since_previous = seconds_since_previous(batch_codes, times)
+    last_transaction = features.pop("Last_transaction", np.full(n, np.nan))
+    if last_seen is not None:
+        first = np.flatnonzero(np.isnan(since_previous) & (batch_codes >= 0))
+        previous = np.array([last_seen.get(subscriber, np.nan) for subscriber in subscriber_ids.to_numpy()[first]])
+        since_previous[first] = times[first] - np.where(np.isnan(previous), last_transaction[first], previous)
+        latest = max_by(batch_codes, len(batch_subscribers), times)
+        for subscriber, latest_time in zip(batch_subscribers.tolist(), latest.tolist()):
+            if not np.isnan(latest_time):
+                last_seen[subscriber] = max(latest_time, last_seen.get(subscriber, latest_time))
+    since_previous = np.nan_to_num(since_previous, nan=NO_PREVIOUS_TRANSACTION_SECONDS)
+    features["Subscriber_log_seconds_since_previous"] = np.log1p(np.maximum(since_previous, 0))
+
+    mean_amount = features.pop("Mean_amount", np.full(n, np.nan))
+    features["Amount_to_subscriber_mean"] = np.divide(amounts, mean_amount, out=np.zeros(n), where=mean_amount > 0)
+    features["SIM_age_days"] = np.nan_to_num(
+        (times - features.pop("Last_activation", np.nan)) / SECONDS_PER_DAY, nan=NO_SIM_AGE_DAYS
+    )
+
+    return pd.DataFrame({
+        "Transaction_ID": transactions["Transaction_ID"].to_numpy(),
+        **{column: np.nan_to_num(features.get(column, np.zeros(n))).astype(np.float32) for column in FEATURE_COLUMNS}
+    })
+
+
+def build_features(tables):
+    """
+    Build the features of every transaction.
+
+    Args:
+        tables (dict): Table name -> DataFrame with (at least) the FEATURE_TABLE_COLUMNS of the
+            table, as returned by load_feature_tables. Transactions is required, features of the
+            other tables are 0 when they are missing.
+
+    Returns:
+        pd.DataFrame: Transaction_ID and the FEATURE_COLUMNS (float32) of every transaction.
+    """
+    transactions = tables["Transactions"]
+    # Entities numbered in one hashing pass over their keys, which are also the rows of their
+    # profiles
+    entities = number_entities(transactions)
+    profiles = entity_profiles(tables, entities)
+    return transaction_features(transactions, profiles, {key: codes for key, (codes, _) in entities.items()})
+
+
+def feature_matrix(features):
+    """Return the FEATURE_COLUMNS of build_features' result as a C-contiguous float32 matrix."""
+    return np.ascontiguousarray(features[FEATURE_COLUMNS].to_numpy(dtype=np.float32))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the behavioural features of the transactions.")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Storage format of the tables")
+    parser.add_argument("--data-dir", default=".", help="Directory of the tables")
+    args = parser.parse_args(argv)
+
+    storage = open_storage(args.format, args.data_dir)
+    start_time = time.time()
+    features = build_features(load_feature_tables(storage))
+    storage.write(FEATURES_TABLE, features)
+    print(f"Built {len(FEATURE_COLUMNS)} features of {len(features)} transactions in {time.time() - start_time:.2f} s "
+          f"({feature_matrix(features).nbytes / 1e6:.1f} MB as float32), written to {FEATURES_TABLE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""
+Graph features of the accounts that transfer money to each other, for money mule detection.
+
+Money mules receive money from many accounts and pass it on (high fan-in and fan-out, money in
+close to money out), and mule rings send it around loops of a few accounts within groups of
+accounts that mostly deal with each other. Transactions (Source_account -> Destination_account)
+and Messages (Sender_ID -> Receiver_ID) are analysed as directed graphs:
+
+- The keys of the nodes are numbered in one hashing pass (pd.factorize), and the graph is held
+  as NumPy arrays of node numbers (int32 below 2**31 nodes). Repeated edges between two nodes
+  are merged into one edge holding their number and total amount, by sorting the (source,
+  destination) pairs as int64, and the adjacency is stored in compressed sparse row (CSR) form:
+  the destinations of node i are indices[indptr[i]:indptr[i + 1]], in increasing order.
+- Fan-out and fan-in are the number of distinct destinations and sources of every node.
+- Connected components (edges taken in both directions) are labelled by merging the labels of
+  the ends of the edges, a block of edges at a time, with no copy of the graph.
+- Two-node cycles (A -> B -> A) are the unordered pairs of nodes found twice among the edges,
+  counted by sorting them. The three-node cycles (A -> B -> C -> A) through a node are the
+  diagonal of A^3, computed with scipy.sparse (which comes with scikit-learn) as the row sums
+  of (A[rows] @ A) * A.T[rows] for blocks of rows holding CYCLE_BLOCK_PATHS two-edge paths, so
+  the memory of a block is bounded whatever the size of the graph. Nodes with more than
+  MAX_CYCLE_DEGREE counterparties (merchants, agents' float accounts) are left out of the
+  three-node cycles: their paths grow with the square of their degree, and they are not what
+  mule rings look like.
+
+The graph takes about 16 bytes per distinct edge (destination, number of transfers and total
+amount) and 8 per node. Building it and counting the cycles take a few times that at their
+peak: the features of 100M random transfers (--synthetic-edges) fit in about 5 GB.
+
+features.py adds the graph features of the source and destination accounts of every
+transaction, and of its subscriber among the senders and receivers of messages, to the
+features of the models.
+
+Usage:
+    python graph_features.py [--format parquet] [--data-dir .]
+    python graph_features.py --synthetic-edges 100000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_array
+
+from out_of_core import peak_rss_mb
+from storage import open_storage
+
+
+ACCOUNT_GRAPH_TABLE = "AccountGraphFeatures"
+GRAPH_FEATURE_COLUMNS = ["Transfers_out", "Transfers_in", "Fan_out", "Fan_in", "Log_amount_out", "Log_amount_in",
+                         "Pass_through_ratio", "Component_size", "Reciprocal_counterparties", "Three_cycles"]
+MAX_CYCLE_DEGREE = 1000  # Most counterparties (fan-in + fan-out) of a node searched for three-node cycles
+CYCLE_BLOCK_PATHS = 20_000_000  # Two-edge paths multiplied at a time when counting three-node cycles
+COMPONENT_BLOCK_EDGES = 10_000_000  # Edges merged at a time when labelling the connected components
+
+
+def encode_edges(sources, destinations):
+    """
+    Number the nodes of edges given by their keys.
+
+    Args:
+        sources (pd.Series): Key of the source of every edge.
+        destinations (pd.Series): Key of the destination of every edge.
+
+    Returns:
+        tuple: (source_codes, destination_codes, keys). The codes are the positions of the
+        nodes in keys (int32 below 2**31 nodes), -1 for missing keys.
+    """
+    codes, keys = pd.factorize(pd.concat([pd.Series(sources), pd.Series(destinations)], ignore_index=True))
+    codes = codes.astype(np.int32 if len(keys) < 2 ** 31 else np.int64)
+    return codes[:len(sources)], codes[len(sources):], keys
+
+
+class DirectedGraph:
+    """
+    Directed graph held in compressed sparse row form, repeated edges merged.
+
+    Args:
+        n_nodes (int): Number of nodes, numbered from 0.
+        indptr (np.ndarray): int64 array of n_nodes + 1 offsets of every node's edges in indices.
+        indices (np.ndarray): Destination of every edge, increasing within a node's edges.
+        counts (np.ndarray): Number of edges merged into every edge.
+        weights (np.ndarray): Total weight (amount) of the edges merged into every edge, or None.
+    """
+
+    def __init__(self, n_nodes, indptr, indices, counts, weights=None):
+        self.n_nodes = n_nodes
+        self.indptr = indptr
+        self.indices = indices
+        self.counts = counts
+        self.weights = weights
+
+    @classmethod
+    def from_edges(cls, sources, destinations, n_nodes, weights=None):
+        """
+        Build the graph of edges given by node numbers.
+
+        Edges with an unknown end (-1) and self-loops are left out.
+
+        Args:
+            sources (np.ndarray): Source node of every edge.
+            destinations (np.ndarray): Destination node of every edge.
+            n_nodes (int): Number of nodes.
+            weights (np.ndarray): Weight of every edge, NaN counting as 0, or None.
+        """
+        known = (sources >= 0) & (destinations >= 0) & (sources != destinations)
+        pairs = sources[known].astype(np.int64)
+        pairs *= n_nodes
+        pairs += destinations[known]
+        if weights is not None:
+            weights = np.nan_to_num(np.asarray(weights)[known], copy=False)[np.argsort(pairs)]
+        del known
+        pairs.sort()
+        first = np.ones(len(pairs), dtype=bool)
+        np.not_equal(pairs[1:], pairs[:-1], out=first[1:])
+        starts = np.flatnonzero(first)
+        del first
+        counts = np.diff(starts, append=len(pairs)).astype(np.int32)
+        if weights is not None:
+            weights = np.add.reduceat(weights, starts, dtype=np.float64) if len(starts) else weights.astype(np.float64)
+        pairs = pairs[starts]
+        del starts
+        indptr = np.searchsorted(pairs, np.arange(n_nodes + 1, dtype=np.int64) * n_nodes)
+        indices = (pairs % n_nodes).astype(np.int32 if n_nodes < 2 ** 31 else np.int64)
+        return cls(n_nodes, indptr, indices, counts, weights)
+
+    @property
+    def n_edges(self):
+        return len(self.indices)
+
+    def out_degree(self):
+        """Number of distinct destinations of every node (fan-out)."""
+        return np.diff(self.indptr)
+
+    def in_degree(self):
+        """Number of distinct sources of every node (fan-in)."""
+        return np.bincount(self.indices, minlength=self.n_nodes)
+
+    def edge_sources(self):
+        """Source of every edge."""
+        return np.repeat(np.arange(self.n_nodes, dtype=self.indices.dtype), self.out_degree())
+
+    def components(self, block_edges=COMPONENT_BLOCK_EDGES):
+        """
+        Label the connected components of the graph, edges taken in both directions.
+
+        Every component is labelled by its smallest node: the larger label of the ends of an edge
+        is pointed at the smaller one and the labels are followed to their end, block_edges edges
+        at a time, until the ends of all edges have the same label.
+
+        Returns:
+            tuple: (labels, sizes): component of every node and number of nodes of every component
+            (indexed by label).
+        """
+        labels = np.arange(self.n_nodes, dtype=self.indices.dtype)
+        sources = self.edge_sources()
+        merged = True
+        while merged:
+            merged = False
+            for start in range(0, self.n_edges, block_edges):
+                source_labels = labels[sources[start:start + block_edges]]
+                destination_labels = labels[self.indices[start:start + block_edges]]
+                differ = source_labels != destination_labels
+                if not differ.any():
+                    continue
+                merged = True
+                source_labels, destination_labels = source_labels[differ], destination_labels[differ]
+                labels[np.maximum(source_labels, destination_labels)] = np.minimum(source_labels, destination_labels)
+                while True:
+                    parents = labels[labels]
+                    if np.array_equal(parents, labels):
+                        break
+                    labels = parents
+        return labels, np.bincount(labels, minlength=self.n_nodes)
+
+    def reciprocal(self):
+        """Number of two-node cycles through every node: destinations that are also sources of it."""
+        sources = self.edge_sources()
+        # Both edges of a two-node cycle give the same unordered pair, which appears twice once sorted
+        pairs = np.minimum(sources, self.indices).astype(np.int64)
+        pairs *= self.n_nodes
+        np.maximum(sources, self.indices, out=sources)
+        pairs += sources
+        del sources
+        pairs.sort()
+        cycles = pairs[1:][pairs[1:] == pairs[:-1]]
+        del pairs
+        return (np.bincount(cycles // self.n_nodes, minlength=self.n_nodes)
+                + np.bincount(cycles % self.n_nodes, minlength=self.n_nodes))
+
+    def three_cycles(self, max_degree=MAX_CYCLE_DEGREE, block_paths=CYCLE_BLOCK_PATHS):
+        """
+        Number of three-node cycles (A -> B -> C -> A) through every node.
+
+        Nodes without both sources and destinations cannot be on a cycle and nodes with more than
+        max_degree counterparties are left out (their count is 0); the others are searched
+        blocks of rows holding about block_paths two-edge paths at a time.
+        """
+        out_degree, in_degree = self.out_degree(), self.in_degree()
+        searched = (out_degree > 0) & (in_degree > 0) & (out_degree + in_degree <= max_degree)
+        del out_degree, in_degree
+        sources = self.edge_sources()
+        keep = searched[sources] & searched[self.indices]
+        sources, destinations = sources[keep], self.indices[keep]
+        del keep
+        # int32 offsets when they fit, so that scipy keeps the int32 indices without copying them
+        indptr = np.zeros(self.n_nodes + 1, dtype=np.int32 if len(destinations) < 2 ** 31 else np.int64)
+        np.cumsum(np.bincount(sources, minlength=self.n_nodes), out=indptr[1:])
+        del sources
+        # Two-edge paths from every node, to cut blocks of rows every block_paths paths
+        paths = np.zeros(self.n_nodes, dtype=np.int64)
+        rows = np.flatnonzero(np.diff(indptr))
+        if len(rows):
+            paths[rows] = np.add.reduceat(np.diff(indptr)[destinations], indptr[rows], dtype=np.int64)
+        np.cumsum(paths, out=paths)
+        bounds = np.unique(np.concatenate([
+            [0], np.searchsorted(paths, np.arange(block_paths, paths[-1] if len(paths) else 0, block_paths)),
+            [self.n_nodes]
+        ]))
+        del paths, rows
+        # Paths between two searched nodes number at most max_degree: int16 counts when they fit
+        ones = np.ones(len(destinations), dtype=np.int16 if max_degree < 2 ** 15 else np.int32)
+        matrix = csr_array((ones, destinations, indptr), shape=(self.n_nodes, self.n_nodes))
+        del ones, destinations, indptr
+        transposed = matrix.T.tocsr()
+        result = np.zeros(self.n_nodes, dtype=np.int64)
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            block = matrix[start:stop]
+            if block.nnz:
+                result[start:stop] = ((block @ matrix) * transposed[start:stop]).sum(axis=1)
+        return result
+
+
+def node_features(graph):
+    """
+    Compute the graph features of every node.
+
+    Returns:
+        dict: Column of GRAPH_FEATURE_COLUMNS -> float32 array of the nodes' values.
+    """
+    # The cycles need the most memory: counted before the other features are held
+    features = {"Three_cycles": graph.three_cycles().astype(np.float32)}
+    features["Reciprocal_counterparties"] = graph.reciprocal().astype(np.float32)
+    labels, sizes = graph.components()
+    features["Component_size"] = sizes[labels].astype(np.float32)
+    del labels, sizes
+    sources = graph.edge_sources()
+    transfers_out = np.bincount(sources, weights=graph.counts, minlength=graph.n_nodes)
+    transfers_in = np.bincount(graph.indices, weights=graph.counts, minlength=graph.n_nodes)
+    if graph.weights is not None:
+        amount_out = np.bincount(sources, weights=graph.weights, minlength=graph.n_nodes)
+        amount_in = np.bincount(graph.indices, weights=graph.weights, minlength=graph.n_nodes)
+    else:
+        amount_out, amount_in = transfers_out, transfers_in
+    del sources
+    features["Transfers_out"] = transfers_out.astype(np.float32)
+    features["Transfers_in"] = transfers_in.astype(np.float32)
+    del transfers_out, transfers_in
+    features["Fan_out"] = graph.out_degree().astype(np.float32)
+    features["Fan_in"] = graph.in_degree().astype(np.float32)
+    features["Log_amount_out"] = np.log1p(np.maximum(amount_out, 0)).astype(np.float32)
+    features["Log_amount_in"] = np.log1p(np.maximum(amount_in, 0)).astype(np.float32)
+    # Share of the money received that is sent on (or the other way round): near 1 for mules
+    passed = np.minimum(amount_in, amount_out)
+    features["Pass_through_ratio"] = np.divide(passed, np.maximum(amount_in, amount_out), out=np.zeros(graph.n_nodes),
+                                               where=passed > 0).astype(np.float32)
+    return {column: features[column] for column in GRAPH_FEATURE_COLUMNS}
+
+
+def graph_profile(source_codes, destination_codes, keys, weights=None):
+    """
+    Compute the graph features of the nodes of edges numbered by encode_edges.
+
+    Args:
+        source_codes (np.ndarray): Source node of every edge.
+        destination_codes (np.ndarray): Destination node of every edge.
+        keys (array-like): Key of every node.
+        weights (np.ndarray): Weight (amount) of every edge, or None to weigh edges alike.
+
+    Returns:
+        pd.DataFrame: GRAPH_FEATURE_COLUMNS (float32) indexed by the nodes' keys.
+    """
+    graph = DirectedGraph.from_edges(source_codes, destination_codes, len(keys), weights)
+    return pd.DataFrame(node_features(graph), index=pd.Index(keys))
+
+
+def synthetic_edges(n_edges, n_nodes, seed=0):
+    """
+    Random edges with skewed degrees (a few busy nodes, many quiet ones), for benchmarks.
+
+    Returns:
+        tuple: (sources, destinations, amounts) of n_edges edges between n_nodes nodes.
+    """
+    rng = np.random.default_rng(seed)
+    relabel = rng.permutation(n_nodes).astype(np.int32)
+    sources = relabel[(n_nodes * rng.random(n_edges, dtype=np.float32) ** 2).astype(np.int64).clip(0, n_nodes - 1)]
+    destinations = relabel[(n_nodes * rng.random(n_edges, dtype=np.float32) ** 3).astype(np.int64).clip(0, n_nodes - 1)]
+    amounts = rng.exponential(500.0, n_edges).astype(np.float32)
+    return sources, destinations, amounts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the graph features of the accounts of the transactions.")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Storage format of the tables")
+    parser.add_argument("--data-dir", default=".", help="Directory of the tables")
+    parser.add_argument("--synthetic-edges", type=int, default=None,
+                        help="Benchmark on this many random edges instead of the tables")
+    parser.add_argument("--synthetic-nodes", type=int, default=None,
+                        help="Nodes of the random edges (a quarter of the edges by default)")
+    args = parser.parse_args(argv)
+
+    start_time = time.time()
+    if args.synthetic_edges:
+        n_nodes = args.synthetic_nodes or max(args.synthetic_edges // 4, 2)
+        sources, destinations, amounts = synthetic_edges(args.synthetic_edges, n_nodes)
+        print(f"Generated {len(sources):,} edges between {n_nodes:,} nodes in {time.time() - start_time:.2f} s")
+    else:
+        storage = open_storage(args.format, args.data_dir)
+        transactions = storage.read("Transactions", columns=["Source_account", "Destination_account",
+                                                             "Transaction_amount"])
+        sources, destinations, keys = encode_edges(transactions["Source_account"], transactions["Destination_account"])
+        amounts = pd.to_numeric(transactions["Transaction_amount"], errors="coerce").to_numpy(dtype=np.float64)
+        n_nodes = len(keys)
+        del transactions
+        print(f"Read {len(sources):,} transfers between {n_nodes:,} accounts in {time.time() - start_time:.2f} s")
+
+    start_time = time.time()
+    graph = DirectedGraph.from_edges(sources, destinations, n_nodes, amounts)
+    del sources, destinations, amounts
+    print(f"Built the CSR graph of {graph.n_edges:,} distinct edges in {time.time() - start_time:.2f} s")
+    start_time = time.time()
+    features = node_features(graph)
+    print(f"Computed the graph features of {n_nodes:,} nodes in {time.time() - start_time:.2f} s: "
+          f"largest component {int(features['Component_size'].max(initial=0)):,} nodes, "
+          f"{np.count_nonzero(features['Reciprocal_counterparties']):,} nodes on two-node cycles, "
+          f"{np.count_nonzero(features['Three_cycles']):,} on three-node cycles; "
+          f"peak memory {peak_rss_mb():,.0f} MB")
+
+    if not args.synthetic_edges:
+        features = pd.DataFrame(features, index=pd.Index(keys, name="Account")).reset_index()
+        storage.write(ACCOUNT_GRAPH_TABLE, features)
+        print(f"Wrote the graph features of {len(features):,} accounts to {ACCOUNT_GRAPH_TABLE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Referential integrity checks between the generated tables.
+
+Checking a relationship with foreign_df[foreign_key].isin(primary_df[primary_key]) builds a
+hash table of the primary keys every time, and the same primary table (Time_Dimension above
+all) is referenced by most relationships. KeyIndex hashes the keys of a primary table once, and
+IntegrityEngine keeps one KeyIndex per primary key column for all relationships, visiting every
+foreign table once to check all of its foreign key columns.
+"""
+import pandas as pd
+
+
+class KeyIndex:
+    """
+    Hash index of the distinct values of a primary key column.
+
+    Args:
+        keys (array-like): Values of the primary key column.
+    """
+
+    def __init__(self, keys):
+        self._index = pd.Index(pd.Series(keys).drop_duplicates())
+
+    def __len__(self):
+        return len(self._index)
+
+    def positions(self, values):
+        """Return the position of every value among the index's keys, -1 for values that are not keys."""
+        return self._index.get_indexer(values)
+
+    def contains(self, values):
+        """Return a boolean array telling which values are keys of the index."""
+        return self._index.get_indexer(values) != -1
+
+    def missing(self, values):
+        """Return a boolean array telling which values are not keys of the index."""
+        return self._index.get_indexer(values) == -1
+
+
+class IntegrityEngine:
+    """
+    Validate foreign keys against the primary keys of the tables they reference.
+
+    The key index of a primary table is built the first time a relationship needs it and reused
+    until invalidate() is called for that table, e.g. after rows were added to it.
+
+    Args:
+        datasets (dict): Table name -> DataFrame. Looked up at every check, so tables replaced
+            in the dict are seen (after invalidate()).
+        relationships (list): Dicts with primary_table, foreign_table, primary_key and
+            foreign_key entries.
+    """
+
+    def __init__(self, datasets, relationships):
+        self.datasets = datasets
+        self.relationships = relationships
+        self._indexes = {}
+
+    def key_index(self, table_name, key):
+        """Return the KeyIndex of a table's key column, building it on first use."""
+        if (table_name, key) not in self._indexes:
+            self._indexes[(table_name, key)] = KeyIndex(self.datasets[table_name][key])
+        return self._indexes[(table_name, key)]
+
+    def invalidate(self, table_name, key=None):
+        """Drop the cached index of a table's key column (all of its key columns by default)."""
+        for cached in list(self._indexes):
+            if cached[0] == table_name and key in (None, cached[1]):
+                del self._indexes[cached]
+
+    def loaded(self, rel):
+        """Return whether both tables of a relationship are loaded, warning about the missing one."""
+        for role in ("primary_table", "foreign_table"):
+            if rel[role] not in self.datasets:
+                print(f"Warning: {role.split('_')[0].capitalize()} table '{rel[role]}' not loaded. Skipping relationship.")
+                return False
+        return True
+
+    def invalid_mask(self, rel):
+        """Return the boolean mask of the foreign table's rows whose foreign key has no match."""
+        index = self.key_index(rel["primary_table"], rel["primary_key"])
+        return index.missing(self.datasets[rel["foreign_table"]][rel["foreign_key"]])
+
+    def by_foreign_table(self):
+        """Group the relationships of loaded tables by foreign table, keeping their order."""
+        groups = {}
+        for rel in self.relationships:
+            if self.loaded(rel):
+                groups.setdefault(rel["foreign_table"], []).append(rel)
+        return groups
+
+    def validate(self):
+        """
+        Check every relationship, one foreign table at a time.
+
+        Returns:
+            tuple: (report, masks). report is a DataFrame with one row per relationship giving
+            the number of rows checked, of violations and of distinct missing keys. masks maps
+            the index of each relationship in `relationships` to its invalid row mask.
+        """
+        rows = []
+        masks = {}
+        positions = {id(rel): i for i, rel in enumerate(self.relationships)}
+        for foreign_table, rels in self.by_foreign_table().items():
+            foreign_df = self.datasets[foreign_table]
+            for rel in rels:
+                mask = self.invalid_mask(rel)
+                masks[positions[id(rel)]] = mask
+                rows.append({
+                    "Foreign_Table": foreign_table,
+                    "Foreign_Key": rel["foreign_key"],
+                    "Primary_Table": rel["primary_table"],
+                    "Primary_Key": rel["primary_key"],
+                    "Rows": len(foreign_df),
+                    "Violations": int(mask.sum()),
+                    "Missing_Keys": foreign_df.loc[mask, rel["foreign_key"]].nunique()
+                })
+        return pd.DataFrame(rows), masks
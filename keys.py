@@ -0,0 +1,198 @@
+"""
+Key derivation and surrogate keys for the *_ID / *_Foreign_ID columns of the generated tables.
+
+A table's time foreign key is the SHA-256 of some of its columns joined with "_", datetimes
+being formatted as "%Y-%m-%d %H:%M:%S". derive_keys builds those strings column by column
+and hashes them in bulk instead of formatting and hashing one DataFrame row at a time.
+
+SurrogateKeyMap replaces those 64 character digests and the UUID identifiers with dense
+integers, keeping the natural key <-> surrogate key dictionary on disk.
+"""
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from synthetic_data import ascii_to_strings, hex_digits
+
+
+KEY_SEPARATOR = "_"
+KEY_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Natural_Key_Type of the keys of a saved SurrogateKeyMap dictionary
+NATURAL_KEY_INTEGER = "int"
+NATURAL_KEY_STRING = "str"
+
+
+def format_key_parts(frame, columns):
+    """
+    Format the key columns of a DataFrame as strings, column by column.
+
+    Args:
+        frame (pd.DataFrame): Table holding the key columns.
+        columns (list): Columns making up the key, in order.
+
+    Returns:
+        pd.Series: The key string of every row.
+    """
+    parts = []
+    for column in columns:
+        values = frame[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.dt.strftime(KEY_TIME_FORMAT)
+        parts.append(values.astype(str).reset_index(drop=True))
+    return parts[0].str.cat(parts[1:], sep=KEY_SEPARATOR)
+
+
+def _digest_keys(keys):
+    """Return the concatenated SHA-256 digests (32 bytes each) of a list of strings."""
+    sha256 = hashlib.sha256
+    return b"".join([sha256(key.encode("utf-8")).digest() for key in keys])
+
+
+def digest_keys(keys, workers=None, chunk_size=100000):
+    """
+    Hash key strings with SHA-256.
+
+    Args:
+        keys (list): Key strings.
+        workers (int): Hash chunks of `chunk_size` keys in this many processes. Hashing runs in
+            the calling process when None. Short keys do not release the GIL in hashlib, so a
+            process pool is used rather than threads.
+        chunk_size (int): Keys per chunk handed to a worker.
+
+    Returns:
+        np.ndarray: (n, 32) uint8 array holding the digest of every key.
+    """
+    keys = list(keys)
+    if workers and len(keys) > chunk_size:
+        chunks = [keys[i:i + chunk_size] for i in range(0, len(keys), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            buffer = b"".join(executor.map(_digest_keys, chunks))
+    else:
+        buffer = _digest_keys(keys)
+    return np.frombuffer(buffer, dtype=np.uint8).reshape(len(keys), 32)
+
+
+def derive_keys(frame, columns, compact=False, workers=None):
+    """
+    Derive the hashed foreign key of every row of a table.
+
+    Args:
+        frame (pd.DataFrame): Table holding the key columns.
+        columns (list): Columns making up the key, in order.
+        compact (bool): Return the first 8 bytes of each digest as a signed 64-bit integer
+            instead of the 64 character hex digest.
+        workers (int): Processes used for hashing, see digest_keys.
+
+    Returns:
+        np.ndarray: Hex digest strings, or int64 keys when `compact` is set.
+    """
+    digests = digest_keys(format_key_parts(frame, columns).tolist(), workers=workers)
+    if compact:
+        return compact_digests(digests)
+    return ascii_to_strings(hex_digits(digests))
+
+
+def compact_digests(digests):
+    """Turn (n, 32) SHA-256 digests into int64 keys made of their first 8 bytes (big-endian)."""
+    return np.ascontiguousarray(digests[:, :8]).view(">i8").ravel().astype(np.int64)
+
+
+class SurrogateKeyMap:
+    """
+    Dense integer surrogate keys for one key domain (e.g. every Time_ID and the foreign keys
+    referencing it), backed by a persisted natural key <-> surrogate key dictionary.
+
+    Surrogate keys are positions in the dictionary, starting at 0, so they stay stable as new
+    natural keys are appended and fit in an int32 until the domain exceeds 2**31 - 1 keys.
+
+    Args:
+        name (str): Name of the key domain, also the dictionary's file name.
+        natural_keys (array-like): Natural keys to start the dictionary with, in key order.
+    """
+
+    def __init__(self, name, natural_keys=()):
+        self.name = name
+        self._index = pd.Index(pd.unique(np.asarray(natural_keys, dtype=object)), dtype=object)
+
+    def __len__(self):
+        return len(self._index)
+
+    @property
+    def dtype(self):
+        """Smallest integer dtype able to hold every surrogate key of the domain."""
+        return np.int32 if len(self) < np.iinfo(np.int32).max else np.int64
+
+    def add(self, natural_keys):
+        """
+        Assign surrogate keys to the natural keys that do not have one yet.
+
+        Returns:
+            int: Number of natural keys added to the dictionary.
+        """
+        natural_keys = pd.unique(np.asarray(natural_keys, dtype=object))
+        new_keys = natural_keys[self._index.get_indexer(natural_keys) == -1]
+        if len(new_keys):
+            self._index = self._index.append(pd.Index(new_keys, dtype=object))
+        return len(new_keys)
+
+    def encode(self, natural_keys, add_missing=True):
+        """
+        Map natural keys to their surrogate keys.
+
+        Args:
+            natural_keys (array-like): Natural keys to encode.
+            add_missing (bool): Assign new surrogate keys to unknown natural keys. Unknown keys
+                are encoded as -1 otherwise.
+
+        Returns:
+            np.ndarray: Surrogate keys (int32 or int64, see dtype).
+        """
+        natural_keys = np.asarray(natural_keys, dtype=object)
+        if add_missing:
+            self.add(natural_keys)
+        return self._index.get_indexer(natural_keys).astype(self.dtype)
+
+    def decode(self, surrogate_keys):
+        """Map surrogate keys back to their natural keys."""
+        return self._index.take(np.asarray(surrogate_keys)).to_numpy()
+
+    def save(self, directory):
+        """
+        Write the dictionary to <directory>/<name>.csv.
+
+        CSV files hold text only, so the Natural_Key_Type column records which natural keys are
+        integers (e.g. the int64 keys of --compact-keys, next to "dummy_..." string keys) for
+        load() to restore them: a key read back as the string "42" would not match 42.
+        """
+        os.makedirs(directory, exist_ok=True)
+        natural_keys = self._index.to_numpy()
+        type_codes, types = pd.factorize(pd.Series(natural_keys, dtype=object).map(type))
+        integer_types = np.array([issubclass(t, (int, np.integer)) and not issubclass(t, (bool, np.bool_)) for t in types])
+        is_integer = integer_types[type_codes] if len(types) else np.zeros(len(natural_keys), dtype=bool)
+        pd.DataFrame({
+            "Surrogate_Key": np.arange(len(self), dtype=self.dtype),
+            "Natural_Key": natural_keys,
+            "Natural_Key_Type": np.where(is_integer, NATURAL_KEY_INTEGER, NATURAL_KEY_STRING)
+        }).to_csv(os.path.join(directory, f"{self.name}.csv"), index=False)
+
+    @classmethod
+    def load(cls, name, directory):
+        """
+        Load the dictionary saved by save(), or start an empty one if there is none yet.
+
+        Integer natural keys are restored as integers. Dictionaries saved without
+        Natural_Key_Type hold strings only.
+        """
+        path = os.path.join(directory, f"{name}.csv")
+        if not os.path.exists(path):
+            return cls(name)
+        dictionary = pd.read_csv(path, dtype={"Natural_Key": object, "Natural_Key_Type": object})
+        dictionary = dictionary.sort_values("Surrogate_Key")
+        natural_keys = dictionary["Natural_Key"].to_numpy(dtype=object, copy=True)
+        if "Natural_Key_Type" in dictionary:
+            integers = (dictionary["Natural_Key_Type"] == NATURAL_KEY_INTEGER).to_numpy()
+            natural_keys[integers] = natural_keys[integers].astype(np.int64).astype(object)
+        return cls(name, natural_keys)
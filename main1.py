@@ -2,11 +2,22 @@ import pandas as pd
 import mysql.connector
 from mysql.connector import Error
 from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
 import numpy as np
 import random
-from faker import Faker
-import hashlib
+import inspect
+import os
+import time
+import argparse
+import io
+import re
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from synthetic_data import SyntheticDataEngine, age_groups, add_months
+from keys import derive_keys, SurrogateKeyMap
+from storage import CSVStorage, open_storage, row_ends
+from integrity import IntegrityEngine, KeyIndex
+from mysql_loader import connect, create_pool, bulk_load, upsert_load, table_dependencies, load_in_dependency_order
 
 
 # Utility function to generate random dates with specified precision
@@ -55,395 +66,242 @@ def generate_random_dates(n, precision="millisecond", start_year=2000, end_year=
         raise ValueError("Invalid precision. Choose from 'millisecond', 'second', 'minute', 'hour', 'day', 'week', 'month', or 'year'.")
 
 
-# Initialize Faker
-faker = Faker()
+# Initialize the synthetic data engine. Every generator draws from this single seeded
+# engine unless another one is passed in, so the generated tables are reproducible.
+DEFAULT_SEED = 42
+default_engine = SyntheticDataEngine(seed=DEFAULT_SEED)
 
 # Function to generate random dates
-def generate_dates(n):
-    return [faker.date_time_between(start_date='-10y', end_date='now') for _ in range(n)]
+def generate_dates(n, engine=None):
+    engine = engine or default_engine
+    return engine.datetimes(n, years=10)
 
 # Generate Fact Table: Transactions
-def generate_transactions(n=1000):
+def generate_transactions(n=1000, engine=None, first_id=1):
+    engine = engine or default_engine
+    rng = engine.rng
+
     # Generate unique values for certain fields
     channels = ["mobile_app", "USSD", "agent"]
-    agent_ids = [faker.uuid4() for _ in range(100)]
-    account_ids = [faker.uuid4() for _ in range(100)]
-    
-    # Define regions and cities in Cameroon
-    regions = ["Central", "Littoral", "Northwest", "Southwest", "Far North", "North", "Adamaoua", "West", "East", "South"]
-    cities = {
-        "Central": ["Yaounde"],
-        "Littoral": ["Douala"],
-        "Northwest": ["Bamenda"],
-        "Southwest": ["Buea", "Limbe"],
-        "Far North": ["Maroua"],
-        "North": ["Garoua"],
-        "Adamaoua": ["Ngaoundere"],
-        "West": ["Bafoussam"],
-        "East": ["Bertoua"],
-        "South": ["Ebolowa"]
-    }
+    agent_ids = engine.uuid4(100)
+    account_ids = engine.uuid4(100)
+
+    # Select random regions in Cameroon and a city in each of them
+    regions, cities = engine.regions_and_cities(n)
 
     # Create the transactions dataframe
     transactions = pd.DataFrame({
-        "Transaction_ID": range(1, n + 1),
-        "Transaction_amount": np.random.uniform(10, 10000, n).round(2),
-        "Transaction_type": np.random.choice(["money_transfer", "bill_payment", "airtime_purchase", "other"], n),
-        "Channel": np.random.choice(channels, n),
-        "Source_account": [faker.uuid4() for _ in range(n)],
-        "Destination_account": [faker.uuid4() for _ in range(n)],
-        "Subscriber_ID": [faker.uuid4() for _ in range(n)],
-        "Transaction_status": np.random.choice(["successful", "failed"], n, p=[0.9, 0.1]),
-        "Anomaly_score": np.random.uniform(0, 1, n),
-        "Account_ID": np.random.choice(account_ids, n),
-        "Agent_ID": np.random.choice(agent_ids, n),
-        "Time": generate_dates(n),
-        "Region": np.random.choice(regions, n),  # Select random region
-        "City": [faker.random.choice(cities[region]) for region in np.random.choice(regions, n)]
+        "Transaction_ID": range(first_id, first_id + n),
+        "Transaction_amount": rng.uniform(10, 10000, n).round(2),
+        "Transaction_type": rng.choice(["money_transfer", "bill_payment", "airtime_purchase", "other"], n),
+        "Channel": rng.choice(channels, n),
+        "Source_account": engine.uuid4(n),
+        "Destination_account": engine.uuid4(n),
+        "Subscriber_ID": engine.uuid4(n),
+        "Transaction_status": rng.choice(["successful", "failed"], n, p=[0.9, 0.1]),
+        "Anomaly_score": rng.uniform(0, 1, n),
+        "Account_ID": engine.sample(account_ids, n),
+        "Agent_ID": engine.sample(agent_ids, n),
+        "Time": generate_dates(n, engine),
+        "Region": regions,
+        "City": cities
     })
 
     # Generate Time_Foreign_ID
-    transactions["Time_Foreign_ID"] = transactions.apply(
-    lambda row: hashlib.sha256(
-        f"{row['Transaction_ID']}_{row['Channel']}_{row['Subscriber_ID']}_{row['Account_ID']}_{row['Agent_ID']}_{row['Time'].strftime('%Y-%m-%d %H:%M:%S')}"
-        .encode('utf-8')
-    ).hexdigest(),
-    axis=1
-)
+    transactions["Time_Foreign_ID"] = derive_keys(transactions, ["Transaction_ID", "Channel", "Subscriber_ID", "Account_ID", "Agent_ID", "Time"], compact=engine.compact_keys)
 
     return transactions
 
 
 # Generate Dimension Table: Accounts
-def generate_accounts(n=100):
-    # Generate random ages between 10 and 100
-    ages = [random.randint(10, 100) for _ in range(n)]
-
-    # Define regions and cities in Cameroon
-    regions = ["Central", "Littoral", "Northwest", "Southwest", "Far North", "North", "Adamaoua", "West", "East", "South"]
-    cities = {
-        "Central": ["Yaounde"],
-        "Littoral": ["Douala"],
-        "Northwest": ["Bamenda"],
-        "Southwest": ["Buea", "Limbe"],
-        "Far North": ["Maroua"],
-        "North": ["Garoua"],
-        "Adamaoua": ["Ngaoundere"],
-        "West": ["Bafoussam"],
-        "East": ["Bertoua"],
-        "South": ["Ebolowa"]
-    }
+def generate_accounts(n=100, engine=None):
+    engine = engine or default_engine
+    rng = engine.rng
 
-    # Define age groups based on the age
-    age_groups = [
-        "Adolescent" if age <= 12 else
-        "Teenager" if 13 <= age <= 19 else
-        "Early-20s" if 20 <= age <= 23 else
-        "Mid-20s" if 24 <= age <= 26 else
-        "Late-20s" if 27 <= age <= 29 else
-        "Early-30s" if 30 <= age <= 33 else
-        "Mid-30s Adult" if 34 <= age <= 36 else
-        "Late-30s" if 37 <= age <= 39 else
-        "40s" if 40 <= age <= 49 else
-        "50s" if 50 <= age <= 59 else
-        "60s" if 60 <= age <= 69 else
-        "70s" if 70 <= age <= 79 else
-        "80s" if 80 <= age <= 89 else
-        "90s-100s"
-        for age in ages
-    ]
+    # Generate random ages between 10 and 100 and their age groups
+    ages = engine.ages(n)
+    regions, cities = engine.regions_and_cities(n)
 
     # Generate accounts DataFrame
     accounts = pd.DataFrame({
-        #"Account_ID": [faker.uuid4() for _ in range(n)],
-        "Account_ID": [faker.uuid4() for _ in range(n)],
-        "Account_number": [faker.random_number(digits=10, fix_len=True) for _ in range(n)],
-        "Account_type": np.random.choice(["individual", "business"], n),
-        "Account_status": np.random.choice(["active", "inactive", "blocked"], n),
-        "Creation_Time": generate_dates(n),
-        #"Creation_Time_Foreign_ID": [faker.uuid4() for _ in range(n)],  # Placeholder for foreign key
-        "Account_holder_name": [faker.name() for _ in range(n)],
-        "Account_holder_email": [faker.email() for _ in range(n)],
-        "Account_holder_address": [faker.address() for _ in range(n)],
-        "Site_Name": [faker.domain_name() for _ in range(n)],
-        "Associated_Network_name": np.random.choice(["MTN", "ORANGE", "CAMTEL"], n),
-        "Associated_NID_NUM": [faker.uuid4() for _ in range(n)],
-        "Account_user_gender": np.random.choice(["M", "F"], n),
+        "Account_ID": engine.uuid4(n),
+        "Account_number": engine.numbers(n, digits=10),
+        "Account_type": rng.choice(["individual", "business"], n),
+        "Account_status": rng.choice(["active", "inactive", "blocked"], n),
+        "Creation_Time": generate_dates(n, engine),
+        "Account_holder_name": engine.names(n),
+        "Account_holder_email": engine.emails(n),
+        "Account_holder_address": engine.addresses(n),
+        "Site_Name": engine.domain_names(n),
+        "Associated_Network_name": rng.choice(["MTN", "ORANGE", "CAMTEL"], n),
+        "Associated_NID_NUM": engine.uuid4(n),
+        "Account_user_gender": rng.choice(["M", "F"], n),
         "Account_user_age": ages,
-        "Account_user_age_group": age_groups,
-        "Region": np.random.choice(regions, n),  # Select random region
-        "City": [faker.random.choice(cities[region]) for region in np.random.choice(regions, n)]
+        "Account_user_age_group": age_groups(ages),
+        "Region": regions,
+        "City": cities
     })
 
-    accounts["Creation_Time_Foreign_ID"] = accounts.apply(
-    lambda row: hashlib.sha256(
-        f"{row['Site_Name']}_{row['Account_ID']}_{row['Account_type']}_{row['Account_number']}_{row['Creation_Time'].strftime('%Y-%m-%d %H:%M:%S')}"
-        .encode('utf-8')
-    ).hexdigest(),
-    axis=1
-)
+    accounts["Creation_Time_Foreign_ID"] = derive_keys(accounts, ["Site_Name", "Account_ID", "Account_type", "Account_number", "Creation_Time"], compact=engine.compact_keys)
 
     return accounts
 
 
 
 # Generate Dimension Table: Subscribers
-def generate_subscribers(n=100):
-    # Generate random ages between 10 and 100
-    ages = [random.randint(10, 100) for _ in range(n)]
-
-    regions = ["Central", "Littoral", "Northwest", "Southwest", "Far North", "North", "Adamaoua", "West", "East", "South"]
-    cities = {
-        "Central": ["Yaounde"],
-        "Littoral": ["Douala"],
-        "Northwest": ["Bamenda"],
-        "Southwest": ["Buea", "Limbe"],
-        "Far North": ["Maroua"],
-        "North": ["Garoua"],
-        "Adamaoua": ["Ngaoundere"],
-        "West": ["Bafoussam"],
-        "East": ["Bertoua"],
-        "South": ["Ebolowa"]
-    }
+def generate_subscribers(n=100, engine=None):
+    engine = engine or default_engine
+    rng = engine.rng
 
-    # Define age groups based on the age
-    age_groups = [
-        "Adolescent" if age <= 12 else
-        "Teenager" if 13 <= age <= 19 else
-        "Early-20s" if 20 <= age <= 23 else
-        "Mid-20s" if 24 <= age <= 26 else
-        "Late-20s" if 27 <= age <= 29 else
-        "Early-30s" if 30 <= age <= 33 else
-        "Mid-30s Adult" if 34 <= age <= 36 else
-        "Late-30s" if 37 <= age <= 39 else
-        "40s" if 40 <= age <= 49 else
-        "50s" if 50 <= age <= 59 else
-        "60s" if 60 <= age <= 69 else
-        "70s" if 70 <= age <= 79 else
-        "80s" if 80 <= age <= 89 else
-        "90s-100s"
-        for age in ages
-        ]
+    # Generate random ages between 10 and 100 and their age groups
+    ages = engine.ages(n)
+    regions, cities = engine.regions_and_cities(n)
 
     subscribers = pd.DataFrame({
-        "Subscriber_ID": [faker.uuid4() for _ in range(n)],
-        "Subscriber_name": [faker.name() for _ in range(n)],
-        "Subscriber_phone": [faker.phone_number() for _ in range(n)],
-        "Subscriber_email": [faker.email() for _ in range(n)],
-        "Subscriber_address": [faker.address() for _ in range(n)],
-        "Subscriber_type": np.random.choice(["individual", "business"], n),
-        "Subscriber_registration_date": generate_dates(n),
-        #"Subscriber_registration_date_ID": ,
-        "Subscriber_network_name": np.random.choice(["MTN", "ORANGE", "CAMTEL"], n),
-        "Subscriber_network_ID": [faker.uuid4() for _ in range(n)],
-        "Subscriber_expiry_date": generate_dates(n),
-        #"Subscriber_expiry_date_Foreign_ID": ,
-        "Associated_NID_NUM": [faker.uuid4() for _ in range(n)],
-        "Subscriber_user_gender": np.random.choice(["M", "F"], n),
+        "Subscriber_ID": engine.uuid4(n),
+        "Subscriber_name": engine.names(n),
+        "Subscriber_phone": engine.phone_numbers(n),
+        "Subscriber_email": engine.emails(n),
+        "Subscriber_address": engine.addresses(n),
+        "Subscriber_type": rng.choice(["individual", "business"], n),
+        "Subscriber_registration_date": generate_dates(n, engine),
+        "Subscriber_network_name": rng.choice(["MTN", "ORANGE", "CAMTEL"], n),
+        "Subscriber_network_ID": engine.uuid4(n),
+        "Subscriber_expiry_date": generate_dates(n, engine),
+        "Associated_NID_NUM": engine.uuid4(n),
+        "Subscriber_user_gender": rng.choice(["M", "F"], n),
         "Subscriber_user_age": ages,
-        "Subscriber_user_age_group": age_groups,
-        "Region": np.random.choice(regions, n),  # Select random region
-        "City": [faker.random.choice(cities[region]) for region in np.random.choice(regions, n)]
+        "Subscriber_user_age_group": age_groups(ages),
+        "Region": regions,
+        "City": cities
     })
 
-    subscribers["Subscriber_registration_date_ID"] = subscribers.apply(
-    lambda row: hashlib.sha256(
-        f"{row['Subscriber_ID']}_{row['Subscriber_type']}_{row['Subscriber_name']}_{row['Subscriber_registration_date'].strftime('%Y-%m-%d %H:%M:%S')}"
-        .encode('utf-8')
-    ).hexdigest(),
-    axis=1
-    )
+    subscribers["Subscriber_registration_date_ID"] = derive_keys(subscribers, ["Subscriber_ID", "Subscriber_type", "Subscriber_name", "Subscriber_registration_date"], compact=engine.compact_keys)
 
-    subscribers["Subscriber_expiry_date_Foreign_ID"] = subscribers.apply(
-    lambda row: hashlib.sha256(
-        f"{row['Subscriber_ID']}_{row['Subscriber_type']}_{row['Subscriber_name']}_{row['Subscriber_registration_date'].strftime('%Y-%m-%d %H:%M:%S')}_{row['Subscriber_expiry_date'].strftime('%Y-%m-%d %H:%M:%S')}"
-        .encode('utf-8')
-    ).hexdigest(),
-    axis=1
-    )
+    subscribers["Subscriber_expiry_date_Foreign_ID"] = derive_keys(subscribers, ["Subscriber_ID", "Subscriber_type", "Subscriber_name", "Subscriber_registration_date", "Subscriber_expiry_date"], compact=engine.compact_keys)
 
     return subscribers
 
 
 # Generate Dimension Table: Call Logs
-def generate_call_logs(n=500):
-
-     # Define regions and cities in Cameroon
-    regions = ["Central", "Littoral", "Northwest", "Southwest", "Far North", "North", "Adamaoua", "West", "East", "South"]
-    cities = {
-        "Central": ["Yaounde"],
-        "Littoral": ["Douala"],
-        "Northwest": ["Bamenda"],
-        "Southwest": ["Buea", "Limbe"],
-        "Far North": ["Maroua"],
-        "North": ["Garoua"],
-        "Adamaoua": ["Ngaoundere"],
-        "West": ["Bafoussam"],
-        "East": ["Bertoua"],
-        "South": ["Ebolowa"]
-    }
+def generate_call_logs(n=500, engine=None):
+    engine = engine or default_engine
+    rng = engine.rng
+
+    regions, cities = engine.regions_and_cities(n)
 
-    call_start_times = generate_dates(n)#generate_random_dates(n)
-    call_end_times = [
-        start_time + timedelta(seconds=random.randint(1, 3600)) for start_time in call_start_times
-    ]  # Call end times are always after start times
+    call_start_times = generate_dates(n, engine)
+    call_durations = rng.integers(1, 3601, n)
+    call_end_times = call_start_times + call_durations.astype("timedelta64[s]")  # Call end times are always after start times
 
     call_logs = pd.DataFrame({
-        "Call_ID": [faker.uuid4() for _ in range(n)],
-        "Call_Duration": np.random.randint(1, 3600, n),
-        "Receiver_Num": [faker.phone_number() for _ in range(n)],
-        "Sender_Num": [faker.phone_number() for _ in range(n)],
-        #"Date_Time_Foreign_ID" : ,
-        #"Date_Time" : ,  #calculated from call_start & call_end times
+        "Call_ID": engine.uuid4(n),
+        "Call_Duration": rng.integers(1, 3600, n),
+        "Receiver_Num": engine.phone_numbers(n),
+        "Sender_Num": engine.phone_numbers(n),
         "Call_Start_time": call_start_times, #in years/month/day/hours/minute/second/millisecond
         "Call_End_Time": call_end_times,
-        "Duration": [
-            (end_time - start_time).total_seconds() for start_time, end_time in zip(call_start_times, call_end_times)
-        ],
+        "Duration": call_durations.astype(float),
         "Date_Time": call_start_times,
-        "Subscriber_ID": [faker.uuid4() for _ in range(n)],
-        "Call_Status": np.random.choice(["Completed", "Failed"], n),
-        "Ongoing_Call_Status": np.random.choice([True, False], n),
-        "Call_Type": np.random.choice(["Outgoing", "Incoming", "Missed"], n),
-        "Platform_Name": np.random.choice(["WhatsApp", "Messenger", "Discord"], n),
-        "Region": np.random.choice(regions, n),  # Select random region
-        "City": [faker.random.choice(cities[region]) for region in np.random.choice(regions, n)]
+        "Subscriber_ID": engine.uuid4(n),
+        "Call_Status": rng.choice(["Completed", "Failed"], n),
+        "Ongoing_Call_Status": rng.choice([True, False], n),
+        "Call_Type": rng.choice(["Outgoing", "Incoming", "Missed"], n),
+        "Platform_Name": rng.choice(["WhatsApp", "Messenger", "Discord"], n),
+        "Region": regions,
+        "City": cities
     })
 
-    call_logs["Date_Time_Foreign_ID"] = call_logs.apply(
-    lambda row: hashlib.sha256(
-        f"{row['Call_ID']}_{row['Subscriber_ID']}_{row['Call_Type']}_{row['Receiver_Num']}_{row['Sender_Num']}_{row['Date_Time'].strftime('%Y-%m-%d %H:%M:%S')}"
-        .encode('utf-8')
-    ).hexdigest(),
-    axis=1
-    )
+    call_logs["Date_Time_Foreign_ID"] = derive_keys(call_logs, ["Call_ID", "Subscriber_ID", "Call_Type", "Receiver_Num", "Sender_Num", "Date_Time"], compact=engine.compact_keys)
 
     return call_logs
 
 
 
 # Generate Dimension Table: Messages
-def generate_messages(n=500):
-
-    # Define regions and cities in Cameroon
-    regions = ["Central", "Littoral", "Northwest", "Southwest", "Far North", "North", "Adamaoua", "West", "East", "South"]
-    cities = {
-        "Central": ["Yaounde"],
-        "Littoral": ["Douala"],
-        "Northwest": ["Bamenda"],
-        "Southwest": ["Buea", "Limbe"],
-        "Far North": ["Maroua"],
-        "North": ["Garoua"],
-        "Adamaoua": ["Ngaoundere"],
-        "West": ["Bafoussam"],
-        "East": ["Bertoua"],
-        "South": ["Ebolowa"]
-    }
+def generate_messages(n=500, engine=None):
+    engine = engine or default_engine
+    rng = engine.rng
+
+    regions, cities = engine.regions_and_cities(n)
 
     messages = pd.DataFrame({
-        "Message_ID": [faker.uuid4() for _ in range(n)],
-        "Sender_ID": [faker.uuid4() for _ in range(n)],
-        "Receiver_ID": [faker.uuid4() for _ in range(n)],
-        "Receiver_Num": [faker.phone_number() for _ in range(n)],
-        "Sender_Num": [faker.phone_number() for _ in range(n)],
-        "Message_Type": np.random.choice(["SMS", "MMS", "VoIP"], n),
-        "Time": generate_dates(n),
-        "Sender_Name": [faker.name() for _ in range(n)],
-        "Receiver_Name": [faker.name() for _ in range(n)],
-        "Message_Kind": np.random.choice(["Text", "Image", "Voice", "Video"], n),
-        "Content": [faker.text() for _ in range(n)], #This is the data whether in Image, voice, video compressed as text
-        "Region": np.random.choice(regions, n),  # Select random region
-        "City": [faker.random.choice(cities[region]) for region in np.random.choice(regions, n)]
+        "Message_ID": engine.uuid4(n),
+        "Sender_ID": engine.uuid4(n),
+        "Receiver_ID": engine.uuid4(n),
+        "Receiver_Num": engine.phone_numbers(n),
+        "Sender_Num": engine.phone_numbers(n),
+        "Message_Type": rng.choice(["SMS", "MMS", "VoIP"], n),
+        "Time": generate_dates(n, engine),
+        "Sender_Name": engine.names(n),
+        "Receiver_Name": engine.names(n),
+        "Message_Kind": rng.choice(["Text", "Image", "Voice", "Video"], n),
+        "Content": engine.texts(n), #This is the data whether in Image, voice, video compressed as text
+        "Region": regions,
+        "City": cities
     })
 
     # Generate Time_Foreign_ID
-    messages["Time_Foreign_ID"] = messages.apply(
-    lambda row: hashlib.sha256(
-        f"{row['Message_ID']}_{row['Sender_ID']}_{row['Receiver_ID']}_{row['Message_Type']}_{row['Message_Kind']}_{row['Time'].strftime('%Y-%m-%d %H:%M:%S')}"
-        .encode('utf-8')
-    ).hexdigest(),
-    axis=1
-    )
+    messages["Time_Foreign_ID"] = derive_keys(messages, ["Message_ID", "Sender_ID", "Receiver_ID", "Message_Type", "Message_Kind", "Time"], compact=engine.compact_keys)
 
     return messages
 
 
-def generate_cameroon_coordinates(n):
+def generate_cameroon_coordinates(n, engine=None):
     """
     Generate random latitude and longitude pairs within the bounds of Cameroon.
     Args:
     n (int): Number of coordinates to generate.
     Returns:
-    list: List of latitude, longitude strings.
+    np.ndarray: Array of latitude, longitude strings.
     """
-    return [
-        f"{random.uniform(2, 13):.6f}, {random.uniform(8, 16):.6f}" for _ in range(n)
-    ]
+    engine = engine or default_engine
+    return engine.coordinates(n, lat_range=(2, 13), lon_range=(8, 16))
 
 # Generate Dimension Table: ISP Traffic
-def generate_isp_traffic(n=500):
-
-    regions = ["Central", "Littoral", "Northwest", "Southwest", "Far North", "North", "Adamaoua", "West", "East", "South"]
-    cities = {
-        "Central": ["Yaounde"],
-        "Littoral": ["Douala"],
-        "Northwest": ["Bamenda"],
-        "Southwest": ["Buea", "Limbe"],
-        "Far North": ["Maroua"],
-        "North": ["Garoua"],
-        "Adamaoua": ["Ngaoundere"],
-        "West": ["Bafoussam"],
-        "East": ["Bertoua"],
-        "South": ["Ebolowa"]
-    }
+def generate_isp_traffic(n=500, engine=None):
+    engine = engine or default_engine
+    rng = engine.rng
+
+    regions, cities = engine.regions_and_cities(n)
 
     isp_traffic =  pd.DataFrame({
-        "Traffic_ID": [faker.uuid4() for _ in range(n)],
-        "Subscriber_ID": [faker.uuid4() for _ in range(n)],
-        "IP_Address": [faker.ipv4() for _ in range(n)],
-        "URL_visited": [faker.url() for _ in range(n)],
-        "Time": generate_dates(n),
-        "Protocol": np.random.choice(["HTTP", "HTTPS", "TOR_NODES"], n),
-        "Data_Transferred": np.random.randint(100, 1000000, n),
-        "Geo_Location": generate_cameroon_coordinates(n),
-        #"Geo_Location": [f"{faker.latitude()}, {faker.longitude()}" for _ in range(n)],
-        "Traffic_Status": np.random.choice(["Allowed", "Blocked"], n),
-        "Region": np.random.choice(regions, n),  # Select random region
-        "City": [faker.random.choice(cities[region]) for region in np.random.choice(regions, n)]
+        "Traffic_ID": engine.uuid4(n),
+        "Subscriber_ID": engine.uuid4(n),
+        "IP_Address": engine.ipv4(n),
+        "URL_visited": engine.urls(n),
+        "Time": generate_dates(n, engine),
+        "Protocol": rng.choice(["HTTP", "HTTPS", "TOR_NODES"], n),
+        "Data_Transferred": rng.integers(100, 1000000, n),
+        "Geo_Location": generate_cameroon_coordinates(n, engine),
+        "Traffic_Status": rng.choice(["Allowed", "Blocked"], n),
+        "Region": regions,
+        "City": cities
     })
 
     # Generate Time_Foreign_ID
-    isp_traffic["Time_Foreign_ID"] = isp_traffic.apply(
-    lambda row: hashlib.sha256(
-        f"{row['Traffic_ID']}_{row['Subscriber_ID']}_{row['IP_Address']}_{row['URL_visited']}_{row['Time'].strftime('%Y-%m-%d %H:%M:%S')}"
-        .encode('utf-8')
-    ).hexdigest(),
-    axis=1
-    )
+    isp_traffic["Time_Foreign_ID"] = derive_keys(isp_traffic, ["Traffic_ID", "Subscriber_ID", "IP_Address", "URL_visited", "Time"], compact=engine.compact_keys)
 
     return isp_traffic
 
 # Generate Crypto Ledgers, crypto transactions may still be traced by IP.
-def generate_crypto_ledgers(n=500):
+def generate_crypto_ledgers(n=500, engine=None):
+    engine = engine or default_engine
+    rng = engine.rng
+
     crypto_ldgs = pd.DataFrame({
-        "Transaction_ID": [faker.uuid4() for _ in range(n)],
-        "Wallet_Address": [faker.uuid4() for _ in range(n)],
-        "Public_Address_Sender": [faker.uuid4() for _ in range(n)],
-        "Sender_IP_Address_ToBlockChain": [faker.ipv4() for _ in range(n)],
-        "Timestamp": [faker.date_time_between(start_date='-5y', end_date='now') for _ in range(n)],
-        "Transaction_Amount": np.random.uniform(0.001, 50, n).round(8),
-        "Currency_Type": np.random.choice(["BTC", "ETH", "LTC", "USDT", "DOGE"], n),
-        "Status": np.random.choice(["Completed", "Failed"], n)
+        "Transaction_ID": engine.uuid4(n),
+        "Wallet_Address": engine.uuid4(n),
+        "Public_Address_Sender": engine.uuid4(n),
+        "Sender_IP_Address_ToBlockChain": engine.ipv4(n),
+        "Timestamp": engine.datetimes(n, years=5),
+        "Transaction_Amount": rng.uniform(0.001, 50, n).round(8),
+        "Currency_Type": rng.choice(["BTC", "ETH", "LTC", "USDT", "DOGE"], n),
+        "Status": rng.choice(["Completed", "Failed"], n)
     })
 
     # Generate Time_Foreign_ID
-    crypto_ldgs["TimeStamp_Foreign_ID"] = crypto_ldgs.apply(
-    lambda row: hashlib.sha256(
-        f"{row['Transaction_ID']}_{row['Wallet_Address']}_{row['Sender_IP_Address_ToBlockChain']}_{row['Currency_Type']}_{row['Timestamp'].strftime('%Y-%m-%d %H:%M:%S')}"
-        .encode('utf-8')
-    ).hexdigest(),
-    axis=1
-    )
+    crypto_ldgs["TimeStamp_Foreign_ID"] = derive_keys(crypto_ldgs, ["Transaction_ID", "Wallet_Address", "Sender_IP_Address_ToBlockChain", "Currency_Type", "Timestamp"], compact=engine.compact_keys)
 
     return crypto_ldgs
 
@@ -474,262 +332,178 @@ def generate_imei():
 
 
 # Generate SIM Info
-def generate_sim_info(n=500):
-    _start_times = generate_dates(n)
-    _end_times = [
-    start_time + relativedelta(months=random.randint(1, 12)) for start_time in _start_times
-     ]
-    
+def generate_sim_info(n=500, engine=None):
+    engine = engine or default_engine
+    rng = engine.rng
+
+    _start_times = generate_dates(n, engine)
+    _end_times = add_months(_start_times, rng.integers(1, 13, n))
+
     siminf = pd.DataFrame({
-        "SIM_ID": [faker.uuid4() for _ in range(n)],
-        "Subscriber_ID": [faker.uuid4() for _ in range(n)],
-        "IMEI": [generate_imei() for _ in range(n)],
-        "ICCID": [faker.uuid4() for _ in range(n)],
+        "SIM_ID": engine.uuid4(n),
+        "Subscriber_ID": engine.uuid4(n),
+        "IMEI": engine.imei(n),
+        "ICCID": engine.uuid4(n),
         "Activation_Date": _start_times,
         "Expiry_Date": _end_times,
-        "Subscriber_Name": [faker.name() for _ in range(n)]
+        "Subscriber_Name": engine.names(n)
     })
 
     # Generate Time_Foreign_ID
-    siminf["Activation_Date_Foreign_ID"] = siminf.apply(
-    lambda row: hashlib.sha256(
-        f"{row['SIM_ID']}_{row['Subscriber_ID']}_{row['IMEI']}_{row['ICCID']}_{row['Activation_Date'].strftime('%Y-%m-%d %H:%M:%S')}"
-        .encode('utf-8')
-    ).hexdigest(),
-    axis=1
-    )
+    siminf["Activation_Date_Foreign_ID"] = derive_keys(siminf, ["SIM_ID", "Subscriber_ID", "IMEI", "ICCID", "Activation_Date"], compact=engine.compact_keys)
 
-    siminf["Expiry_Date_Foreign_ID"] = siminf.apply(
-    lambda row: hashlib.sha256(
-        f"{row['SIM_ID']}_{row['Subscriber_ID']}_{row['IMEI']}_{row['ICCID']}_{row['Activation_Date'].strftime('%Y-%m-%d %H:%M:%S')}_{row['Expiry_Date'].strftime('%Y-%m-%d %H:%M:%S')}"
-        .encode('utf-8')
-    ).hexdigest(),
-    axis=1
-    )
+    siminf["Expiry_Date_Foreign_ID"] = derive_keys(siminf, ["SIM_ID", "Subscriber_ID", "IMEI", "ICCID", "Activation_Date", "Expiry_Date"], compact=engine.compact_keys)
 
     return siminf
 
 # Generate Device Info
-def generate_device_info(n=500):
+def generate_device_info(n=500, engine=None):
+    engine = engine or default_engine
+    rng = engine.rng
+
     return pd.DataFrame({
-        "Device_ID": [faker.uuid4() for _ in range(n)],
-        "Subscriber_ID": [faker.uuid4() for _ in range(n)],
-        "Device_Type": np.random.choice(["Smartphone", "Tablet", "Laptop"], n),
-        "Device_Brand_Name": np.random.choice(["iPhone16", "iPhone15", "iPhone14", "iPhone13", "iPhone12", "iPhone11", "iPhone16 ProMax", "iPhone15 ProMax", "iPhone14 ProMax", "iPhone13 ProMax", "iPhone12 ProMax", "iPhone11 ProMax", "Samsung Galaxy Pro", "Motorola", "Nokia"], n),
-        #"OS_Version": np.random.choice(["Android 11", "iOS 15", "iOS 16", "Windows 10", "macOS Ventura"], n),
-        "IMEI": [generate_imei() for _ in range(n)],
-        "Manufacturer": np.random.choice(["Apple", "Samsung", "Huawei", "Dell", "HP"], n),
-        "Model": [faker.bothify(text="Model-##??") for _ in range(n)],
-        "App_ID": [faker.uuid4() for _ in range(n)]
+        "Device_ID": engine.uuid4(n),
+        "Subscriber_ID": engine.uuid4(n),
+        "Device_Type": rng.choice(["Smartphone", "Tablet", "Laptop"], n),
+        "Device_Brand_Name": rng.choice(["iPhone16", "iPhone15", "iPhone14", "iPhone13", "iPhone12", "iPhone11", "iPhone16 ProMax", "iPhone15 ProMax", "iPhone14 ProMax", "iPhone13 ProMax", "iPhone12 ProMax", "iPhone11 ProMax", "Samsung Galaxy Pro", "Motorola", "Nokia"], n),
+        #"OS_Version": rng.choice(["Android 11", "iOS 15", "iOS 16", "Windows 10", "macOS Ventura"], n),
+        "IMEI": engine.imei(n),
+        "Manufacturer": rng.choice(["Apple", "Samsung", "Huawei", "Dell", "HP"], n),
+        "Model": engine.bothify(n, "Model-##??"),
+        "App_ID": engine.uuid4(n)
     })
 
 # Generate App Info
-def generate_app_info(n=500):
-    #call_start_times = generate_random_dates(n)
-    #call_end_times = [
-        #start_time + timedelta(seconds=random.randint(1, 3600)) for start_time in call_start_times
-    #]
-    _start_times = generate_dates(n) #generate_datautilsrandom_dates(n)
-    _end_times = [
-        start_time + timedelta(hours=random.randint(1, 24)) for start_time in _start_times
-    ] 
+def generate_app_info(n=500, engine=None):
+    engine = engine or default_engine
+    rng = engine.rng
+
+    _start_times = generate_dates(n, engine)
+    _usage_hours = rng.integers(1, 25, n)
+    _end_times = _start_times + _usage_hours.astype("timedelta64[h]")
     appinfo = pd.DataFrame({
-        "App_ID": [faker.uuid4() for _ in range(n)],
-        "App_Usage": np.random.randint(1, 100, n), #indicates app usage in relative to other apps as they were ON
-        #"Time_period": [faker.date_between(start_date='-10y', end_date='now') for _ in range(n)],
+        "App_ID": engine.uuid4(n),
+        "App_Usage": rng.integers(1, 100, n), #indicates app usage in relative to other apps as they were ON
         "Time_period_Start_time": _start_times, #in years/month/day/hours/minute/second/millisecond
         "Time_period_End_Time": _end_times,
-        "Duration_Usage_Period_Hours": [
-            ((end_time - start_time).total_seconds() / 3600) for start_time, end_time in zip(_start_times, _end_times)
-        ],
-        "Percentage_Use": np.random.randint(1, 100, n), #indicates battery usage
+        "Duration_Usage_Period_Hours": _usage_hours.astype(float),
+        "Percentage_Use": rng.integers(1, 100, n), #indicates battery usage
         "Date_Time": _start_times,
-        "Background_Traffic": np.random.randint(100, 5000, n),
-        "Internet_Traffic": np.random.randint(1000, 10000, n),
-        "Cache_Size": np.random.randint(10, 500, n),
-        "App_Data_Size": np.random.randint(100, 2000, n)
+        "Background_Traffic": rng.integers(100, 5000, n),
+        "Internet_Traffic": rng.integers(1000, 10000, n),
+        "Cache_Size": rng.integers(10, 500, n),
+        "App_Data_Size": rng.integers(100, 2000, n)
     })
 
-    appinfo["Date_Time_Foreign_ID"] = appinfo.apply(
-    lambda row: hashlib.sha256(
-        f"{row['App_ID']}_{row['App_Usage']}_{row['Percentage_Use']}_{row['Background_Traffic']}_{row['Internet_Traffic']}_{row['App_Data_Size']}_{row['Cache_Size']}_{row['Date_Time'].strftime('%Y-%m-%d %H:%M:%S')}"
-        .encode('utf-8')
-    ).hexdigest(),
-    axis=1
-    )
+    appinfo["Date_Time_Foreign_ID"] = derive_keys(appinfo, ["App_ID", "App_Usage", "Percentage_Use", "Background_Traffic", "Internet_Traffic", "App_Data_Size", "Cache_Size", "Date_Time"], compact=engine.compact_keys)
 
     return appinfo
 
 # Generate Social Media Logs
-def generate_social_media_logs(n=500):
-    ages = [random.randint(10, 100) for _ in range(n)]
-
-    # Define age groups based on the age
-    age_groups = [
-        "Adolescent" if age <= 12 else
-        "Teenager" if 13 <= age <= 19 else
-        "Early-20s" if 20 <= age <= 23 else
-        "Mid-20s" if 24 <= age <= 26 else
-        "Late-20s" if 27 <= age <= 29 else
-        "Early-30s" if 30 <= age <= 33 else
-        "Mid-30s Adult" if 34 <= age <= 36 else
-        "Late-30s" if 37 <= age <= 39 else
-        "40s" if 40 <= age <= 49 else
-        "50s" if 50 <= age <= 59 else
-        "60s" if 60 <= age <= 69 else
-        "70s" if 70 <= age <= 79 else
-        "80s" if 80 <= age <= 89 else
-        "90s-100s"
-        for age in ages
-        ]
-    
-    regions = ["Central", "Littoral", "Northwest", "Southwest", "Far North", "North", "Adamaoua", "West", "East", "South"]
-    cities = {
-        "Central": ["Yaounde"],
-        "Littoral": ["Douala"],
-        "Northwest": ["Bamenda"],
-        "Southwest": ["Buea", "Limbe"],
-        "Far North": ["Maroua"],
-        "North": ["Garoua"],
-        "Adamaoua": ["Ngaoundere"],
-        "West": ["Bafoussam"],
-        "East": ["Bertoua"],
-        "South": ["Ebolowa"]
-    }
+def generate_social_media_logs(n=500, engine=None):
+    engine = engine or default_engine
+    rng = engine.rng
+
+    # Generate random ages between 10 and 100 and their age groups
+    ages = engine.ages(n)
+    regions, cities = engine.regions_and_cities(n)
 
     sc_md = pd.DataFrame({
-        "PostType": np.random.choice(["Ad", "Event", "Survey"], n),
-        "Post_Content": [faker.text(max_nb_chars=200) for _ in range(n)],
-        "Associated_ISP_Network": np.random.choice(["MTN", "ORANGE", "CAMTEL"], n),
-        "Associated_SocialMedia_Name": np.random.choice(["Twitter", "Facebook", "LinkedIn"], n),
-        "UserRole": np.random.choice(["Commenter", "Poster"], n),
-        "Time": generate_dates(n),
-        "Email": [faker.email() for _ in range(n)],
-        "User_Name": [faker.user_name() for _ in range(n)],
-        "User_gender": np.random.choice(["M", "F"], n),
+        "PostType": rng.choice(["Ad", "Event", "Survey"], n),
+        "Post_Content": engine.texts(n, max_nb_chars=200),
+        "Associated_ISP_Network": rng.choice(["MTN", "ORANGE", "CAMTEL"], n),
+        "Associated_SocialMedia_Name": rng.choice(["Twitter", "Facebook", "LinkedIn"], n),
+        "UserRole": rng.choice(["Commenter", "Poster"], n),
+        "Time": generate_dates(n, engine),
+        "Email": engine.emails(n),
+        "User_Name": engine.user_names(n),
+        "User_gender": rng.choice(["M", "F"], n),
         "User_age": ages,
-        "User_age_group": age_groups,
-        "Content_Associated_Media": [faker.md5() for _ in range(n)],
-        "Comment_Info_On_Post": [faker.text(max_nb_chars=100) for _ in range(n)],
-        "User_Comment_On_Post": [faker.text(max_nb_chars=100) for _ in range(n)],
-        "Post_Id": [faker.uuid4() for _ in range(n)],
-        "AI_Content_Similarity_Score": np.random.uniform(0, 1, n).round(2),
-        "Fraud_detection_score": np.random.uniform(0, 1, n).round(2),
-        "Associated_Page": [faker.domain_name() for _ in range(n)],
-        "Associated_Group": [faker.word() for _ in range(n)],
-        "Likes": np.random.randint(0, 1000, n),
-        "Comments": np.random.randint(0, 500, n),
-        "Hate": np.random.randint(0, 100, n),
-        "Loves": np.random.randint(0, 300, n),
-        "Shares": np.random.randint(0, 200, n),
-        "Views": np.random.randint(100, 10000, n),
-        "Region": np.random.choice(regions, n),  # Select random region
-        "City": [faker.random.choice(cities[region]) for region in np.random.choice(regions, n)]
+        "User_age_group": age_groups(ages),
+        "Content_Associated_Media": engine.md5(n),
+        "Comment_Info_On_Post": engine.texts(n, max_nb_chars=100),
+        "User_Comment_On_Post": engine.texts(n, max_nb_chars=100),
+        "Post_Id": engine.uuid4(n),
+        "AI_Content_Similarity_Score": rng.uniform(0, 1, n).round(2),
+        "Fraud_detection_score": rng.uniform(0, 1, n).round(2),
+        "Associated_Page": engine.domain_names(n),
+        "Associated_Group": engine.words(n),
+        "Likes": rng.integers(0, 1000, n),
+        "Comments": rng.integers(0, 500, n),
+        "Hate": rng.integers(0, 100, n),
+        "Loves": rng.integers(0, 300, n),
+        "Shares": rng.integers(0, 200, n),
+        "Views": rng.integers(100, 10000, n),
+        "Region": regions,
+        "City": cities
     })
 
-    sc_md["Time_Foreign_ID"] = sc_md.apply(
-    lambda row: hashlib.sha256(
-        f"{row['Post_Id']}_{row['PostType']}_{row['Post_Content']}_{row['Associated_SocialMedia_Name']}_{row['UserRole']}_{row['Email']}_{row['Time'].strftime('%Y-%m-%d %H:%M:%S')}"
-        .encode('utf-8')
-    ).hexdigest(),
-    axis=1
-    )
+    sc_md["Time_Foreign_ID"] = derive_keys(sc_md, ["Post_Id", "PostType", "Post_Content", "Associated_SocialMedia_Name", "UserRole", "Email", "Time"], compact=engine.compact_keys)
 
     return sc_md
 
 
 # Time Dimension. This is a derived table. Its data will not be generated, but gotten from the other tables
 # through SQL queries
-def generate_time(n=365):
-    dates = [faker.date_between(start_date='-1y', end_date='now') for _ in range(n)]
-    local_seasons = ["Dry" if (d.month in [12, 1, 2, 6, 7, 8]) else "Rainy" for d in dates]
-    foreign_seasons = ["Summer" if (d.month in [6, 7, 8, 9]) else "Winter" if (d.month in [10, 11, 12]) else "Spring" if (d.month in [1, 2]) else "Autumn" for d in dates]
-    days_of_week = [d.strftime("%A") for d in dates]
+def generate_time(n=365, engine=None):
+    engine = engine or default_engine
+    dates = pd.DatetimeIndex(engine.datetimes(n, years=1)).normalize()
+    months = dates.month.to_numpy()
+    local_seasons = np.where(np.isin(months, [12, 1, 2, 6, 7, 8]), "Dry", "Rainy")
+    foreign_seasons = np.select(
+        [np.isin(months, [6, 7, 8, 9]), np.isin(months, [10, 11, 12]), np.isin(months, [1, 2])],
+        ["Summer", "Winter", "Spring"],
+        default="Autumn"
+    )
     return pd.DataFrame({
         "Time_ID": range(1, n + 1), #fact_table_dim_id + Date
-        "Date": dates,
-        "Month": [d.month for d in dates],
-        "Quarter": [(d.month - 1) // 3 + 1 for d in dates],
-        "Year": [d.year for d in dates],
+        "Date": dates.date,
+        "Month": months,
+        "Quarter": dates.quarter,
+        "Year": dates.year,
         "Local_Season": local_seasons,
         "Foreign_Season": foreign_seasons,
-        "Day_of_the_Week": days_of_week
+        "Day_of_the_Week": dates.day_name()
     })
 
 # Generate Agents Dimension
-def generate_agents(n=100):
-    regions = ["Central", "Littoral", "Northwest", "Southwest", "Far North", "North", "Adamaoua", "West", "East", "South"]
-    cities = {
-        "Central": ["Yaounde"],
-        "Littoral": ["Douala"],
-        "Northwest": ["Bamenda"],
-        "Southwest": ["Buea", "Limbe"],
-        "Far North": ["Maroua"],
-        "North": ["Garoua"],
-        "Adamaoua": ["Ngaoundere"],
-        "West": ["Bafoussam"],
-        "East": ["Bertoua"],
-        "South": ["Ebolowa"]
-    }
-    ages = [random.randint(10, 100) for _ in range(n)]
-
-    # Define age groups based on the age
-    age_groups = [
-        "Adolescent" if age <= 12 else
-        "Teenager" if 13 <= age <= 19 else
-        "Early-20s" if 20 <= age <= 23 else
-        "Mid-20s" if 24 <= age <= 26 else
-        "Late-20s" if 27 <= age <= 29 else
-        "Early-30s" if 30 <= age <= 33 else
-        "Mid-30s Adult" if 34 <= age <= 36 else
-        "Late-30s" if 37 <= age <= 39 else
-        "40s" if 40 <= age <= 49 else
-        "50s" if 50 <= age <= 59 else
-        "60s" if 60 <= age <= 69 else
-        "70s" if 70 <= age <= 79 else
-        "80s" if 80 <= age <= 89 else
-        "90s-100s"
-        for age in ages
-        ]
+def generate_agents(n=100, engine=None):
+    engine = engine or default_engine
+    rng = engine.rng
+
+    # Generate random ages between 10 and 100 and their age groups
+    ages = engine.ages(n)
+    regions, cities = engine.regions_and_cities(n)
 
     gen_agts = pd.DataFrame({
-        "Agent_ID": [faker.uuid4() for _ in range(n)],
-        "Name": [faker.name() for _ in range(n)],
-        "Gender": np.random.choice(["M", "F"], n),
+        "Agent_ID": engine.uuid4(n),
+        "Name": engine.names(n),
+        "Gender": rng.choice(["M", "F"], n),
         "Age": ages,
-        "Age_group": age_groups,
-        "Region": np.random.choice(regions, n),  # Select random region
-        "City": [faker.random.choice(cities[region]) for region in np.random.choice(regions, n)],
-        "Number": [faker.phone_number() for _ in range(n)],
-        "Creation_Date": generate_dates(n)#[faker.date_between(start_date='-5y', end_date='now') for _ in range(n)]
+        "Age_group": age_groups(ages),
+        "Region": regions,
+        "City": cities,
+        "Number": engine.phone_numbers(n),
+        "Creation_Date": generate_dates(n, engine)
     })
 
-    gen_agts["Creation_Time_Foreign_ID"] = gen_agts.apply(
-    lambda row: hashlib.sha256(
-        f"{row['Agent_ID']}_{row['Number']}_{row['Region']}_{row['Creation_Date'].strftime('%Y-%m-%d %H:%M:%S')}"
-        .encode('utf-8')
-    ).hexdigest(),
-    axis=1
-)
+    gen_agts["Creation_Time_Foreign_ID"] = derive_keys(gen_agts, ["Agent_ID", "Number", "Region", "Creation_Date"], compact=engine.compact_keys)
 
     return gen_agts
 
 # Generate Audit Logs Dimension
-def generate_audit_logs(n=500):
+def generate_audit_logs(n=500, engine=None):
+    engine = engine or default_engine
+    rng = engine.rng
+
     adt_lgs = pd.DataFrame({
-        "Audit_ID": [faker.uuid4() for _ in range(n)],
-        "Account_ID": [faker.uuid4() for _ in range(n)],
-        "Action": np.random.choice(["Update", "Delete", "Insert", "View"], n),
-        "Action_Date": [faker.date_time_between(start_date='-1y', end_date='now') for _ in range(n)]
+        "Audit_ID": engine.uuid4(n),
+        "Account_ID": engine.uuid4(n),
+        "Action": rng.choice(["Update", "Delete", "Insert", "View"], n),
+        "Action_Date": engine.datetimes(n, years=1)
     })
-    
-    adt_lgs["Creation_Time_Foreign_ID"] = adt_lgs.apply(
-    lambda row: hashlib.sha256(
-        f"{row['Audit_ID']}_{row['Account_ID']}_{row['Action']}_{row['Action_Date'].strftime('%Y-%m-%d %H:%M:%S')}"
-        .encode('utf-8')
-    ).hexdigest(),
-    axis=1
-    )
+
+    adt_lgs["Creation_Time_Foreign_ID"] = derive_keys(adt_lgs, ["Audit_ID", "Account_ID", "Action", "Action_Date"], compact=engine.compact_keys)
 
     return adt_lgs
 
@@ -744,180 +518,426 @@ def generate_audit_logs(n=500):
     #})
 
 # Generate Support Logs Dimension
-def generate_support_logs(n=500):
-
-    regions = ["Central", "Littoral", "Northwest", "Southwest", "Far North", "North", "Adamaoua", "West", "East", "South"]
-    cities = {
-        "Central": ["Yaounde"],
-        "Littoral": ["Douala"],
-        "Northwest": ["Bamenda"],
-        "Southwest": ["Buea", "Limbe"],
-        "Far North": ["Maroua"],
-        "North": ["Garoua"],
-        "Adamaoua": ["Ngaoundere"],
-        "West": ["Bafoussam"],
-        "East": ["Bertoua"],
-        "South": ["Ebolowa"]
-    }
+def generate_support_logs(n=500, engine=None):
+    engine = engine or default_engine
+    rng = engine.rng
 
-    _start_times = generate_dates(n) #generate_random_dates(n)
-    _end_times = [
-        start_time + timedelta(hours=random.randint(1, 24)) for start_time in _start_times
-    ] 
+    regions, cities = engine.regions_and_cities(n)
+
+    _start_times = generate_dates(n, engine)
+    _resolve_hours = rng.integers(1, 25, n)
+    _end_times = _start_times + _resolve_hours.astype("timedelta64[h]")
     gen_spp_lgs = pd.DataFrame({
-        "Log_ID": [faker.uuid4() for _ in range(n)],
-        "Account_ID": [faker.uuid4() for _ in range(n)],
-        "Agent_ID": [faker.uuid4() for _ in range(n)],
-        "Institute_ID": [faker.uuid4() for _ in range(n)],
-        "Institute_Name": np.random.choice(["MTN", "ORANGE", "Camtel", "UBA", "Ecobank"], n),
-        "Issue_Type": np.random.choice(["Network Issue", "Billing Issue", "Service Request"], n),
-        "Description": [faker.sentence(nb_words=10) for _ in range(n)],
+        "Log_ID": engine.uuid4(n),
+        "Account_ID": engine.uuid4(n),
+        "Agent_ID": engine.uuid4(n),
+        "Institute_ID": engine.uuid4(n),
+        "Institute_Name": rng.choice(["MTN", "ORANGE", "Camtel", "UBA", "Ecobank"], n),
+        "Issue_Type": rng.choice(["Network Issue", "Billing Issue", "Service Request"], n),
+        "Description": engine.sentences(n, nb_words=10),
         "Date_Issued": _start_times,
         "Date_Resolved": _end_times,
-        "Duration_to_Resolve": [((end_time - start_time).total_seconds() / 3600) for start_time, end_time in zip(_start_times, _end_times)],
-        "Region": np.random.choice(regions, n),  # Select random region
-        "City": [faker.random.choice(cities[region]) for region in np.random.choice(regions, n)]
+        "Duration_to_Resolve": _resolve_hours.astype(float),
+        "Region": regions,
+        "City": cities
     })
 
-    gen_spp_lgs["Foreign_Issued_Date_ID"] = gen_spp_lgs.apply(
-    lambda row: hashlib.sha256(
-        f"{row['Agent_ID']}_{row['Account_ID']}_{row['Institute_Name']}_{row['Issue_Type']}_{row['Date_Issued'].strftime('%Y-%m-%d %H:%M:%S')}"
-        .encode('utf-8')
-    ).hexdigest(),
-    axis=1
-    )
+    gen_spp_lgs["Foreign_Issued_Date_ID"] = derive_keys(gen_spp_lgs, ["Agent_ID", "Account_ID", "Institute_Name", "Issue_Type", "Date_Issued"], compact=engine.compact_keys)
 
-    gen_spp_lgs["Foreign_Resolved_Date_ID"] = gen_spp_lgs.apply(
-    lambda row: hashlib.sha256(
-        f"{row['Agent_ID']}_{row['Account_ID']}_{row['Institute_Name']}_{row['Issue_Type']}_{row['Date_Issued'].strftime('%Y-%m-%d %H:%M:%S')}_{row['Date_Resolved'].strftime('%Y-%m-%d %H:%M:%S')}"
-        .encode('utf-8')
-    ).hexdigest(),
-    axis=1
-    )
+    gen_spp_lgs["Foreign_Resolved_Date_ID"] = derive_keys(gen_spp_lgs, ["Agent_ID", "Account_ID", "Institute_Name", "Issue_Type", "Date_Issued", "Date_Resolved"], compact=engine.compact_keys)
 
     return gen_spp_lgs
 
+# Generators of every table written out by the pipeline
+TABLE_GENERATORS = {
+    "Transactions": generate_transactions,
+    "Accounts": generate_accounts,
+    "Subscribers": generate_subscribers,
+    #"Time": generate_time,
+    #"Channels": generate_channels,
+    "CallLogs": generate_call_logs,
+    "Messages": generate_messages,
+    "ISPTraffic": generate_isp_traffic,
+    "CryptoLedgers": generate_crypto_ledgers,
+    "SIMInfo": generate_sim_info,
+    "DeviceInfo": generate_device_info,
+    "AppInfo": generate_app_info,
+    "SocialMediaLogs": generate_social_media_logs,
+    "SupportLogs": generate_support_logs,
+    "AuditLogs": generate_audit_logs,
+    "Agents": generate_agents
+}
+
+# Tables whose primary key is a running row number, it has to continue across chunks
+SEQUENTIAL_ID_TABLES = {"Transactions"}
+
+DEFAULT_CHUNK_SIZE = 100000
+
+
+def default_table_rows(table_name):
+    """Return the number of rows a table's generator produces by default."""
+    return inspect.signature(TABLE_GENERATORS[table_name]).parameters["n"].default
+
+
+def shard_seed(seed, table_name, shard_index):
+    """
+    Derive the seed of one shard (chunk) of a table from the run seed.
+
+    The seed only depends on the run seed, the table and the shard's position, so a table comes
+    out the same whether its shards are generated serially or by any number of worker processes.
+    """
+    return np.random.SeedSequence(seed, spawn_key=(zlib.crc32(table_name.encode("utf-8")), shard_index))
+
+
+def table_shards(table_name, n_rows=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Return the (shard_index, first_row, size) of every shard of a table."""
+    n_rows = default_table_rows(table_name) if n_rows is None else n_rows
+    return [
+        (shard_index, start, min(chunk_size, n_rows - start))
+        for shard_index, start in enumerate(range(0, n_rows, chunk_size))
+    ]
+
+
+def generate_shard(table_name, shard_index, first_row, size, engine=None):
+    """
+    Generate a single shard of a table from its own derived random stream.
+
+    Args:
+        table_name (str): Name of the table in TABLE_GENERATORS.
+        shard_index (int): Position of the shard within the table.
+        first_row (int): Offset of the shard's first row within the table.
+        size (int): Number of rows in the shard.
+        engine (SyntheticDataEngine): Base engine providing the run seed and pools. Defaults to default_engine.
+
+    Returns:
+        pd.DataFrame: The generated rows.
+    """
+    engine = engine or default_engine
+    shard_engine = engine.spawn(shard_seed(engine.seed, table_name, shard_index))
+    generator = TABLE_GENERATORS[table_name]
+    if table_name in SEQUENTIAL_ID_TABLES:
+        return generator(size, shard_engine, first_id=first_row + 1)
+    return generator(size, shard_engine)
+
+
+def generate_table_chunks(table_name, n_rows=None, chunk_size=DEFAULT_CHUNK_SIZE, engine=None):
+    """
+    Generate a table in fixed-size chunks so that only one chunk is held in memory at a time.
+
+    Args:
+        table_name (str): Name of the table in TABLE_GENERATORS.
+        n_rows (int): Total number of rows. Defaults to the generator's default size.
+        chunk_size (int): Maximum number of rows per chunk.
+        engine (SyntheticDataEngine): Engine to draw the data from. Defaults to default_engine.
+
+    Yields:
+        pd.DataFrame: The next chunk of the table.
+    """
+    for shard_index, first_row, size in table_shards(table_name, n_rows, chunk_size):
+        yield generate_shard(table_name, shard_index, first_row, size, engine)
+
+
+def write_table_chunks(chunks, storage, table_name):
+    """
+    Write an iterable of DataFrame chunks to a table, appending chunk after chunk.
+
+    Args:
+        chunks (iterable): DataFrames sharing the same columns.
+        storage (CSVStorage or ParquetStorage): Storage the table is written to, replacing any previous version.
+        table_name (str): Name of the table.
+
+    Returns:
+        int: Number of rows written.
+    """
+    rows = 0
+    for i, chunk in enumerate(chunks):
+        storage.write(table_name, chunk, append=(i > 0), part=i)
+        rows += len(chunk)
+    return rows
+
 
-# Generate all tables
-tables = {
-    "Transactions": generate_transactions(),
-    "Accounts": generate_accounts(),
-    "Subscribers": generate_subscribers(),
-    #"Time": generate_time(),
-    #"Channels": generate_channels(),
-    "CallLogs": generate_call_logs(),
-    "Messages": generate_messages(),
-    "ISPTraffic": generate_isp_traffic(),
-    "CryptoLedgers": generate_crypto_ledgers(),
-    "SIMInfo": generate_sim_info(),
-    "DeviceInfo": generate_device_info(),
-    "AppInfo": generate_app_info(),
-    "SocialMediaLogs": generate_social_media_logs(),
-    "SupportLogs": generate_support_logs(),
-    "AuditLogs": generate_audit_logs(),
-    "Agents": generate_agents()
+def generate_tables(table_names=None, n_rows=None, chunk_size=DEFAULT_CHUNK_SIZE, engine=None, storage=None):
+    """
+    Generate tables chunk by chunk and stream them to storage with bounded memory.
+
+    Args:
+        table_names (list): Tables to generate. Defaults to every table in TABLE_GENERATORS.
+        n_rows (int): Rows per table. Defaults to each generator's default size.
+        chunk_size (int): Maximum number of rows held in memory per table.
+        engine (SyntheticDataEngine): Engine to draw the data from. Defaults to default_engine.
+        storage (CSVStorage or ParquetStorage): Where the tables are written. Defaults to CSV files
+            in the current directory.
+    """
+    storage = storage or CSVStorage()
+    for table_name in table_names or TABLE_GENERATORS:
+        start_time = time.perf_counter()
+        rows = write_table_chunks(generate_table_chunks(table_name, n_rows, chunk_size, engine), storage, table_name)
+        elapsed = time.perf_counter() - start_time
+        print(f"Saved {table_name} to {storage.path(table_name)} ({rows} rows in {elapsed:.2f}s, "
+              f"{rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+# Base engine and storage of a generation worker process, set up once by _init_generation_worker
+_worker_engine = None
+_worker_storage = None
+
+
+def _init_generation_worker(seed, reference_time, compact_keys, data_format, directory):
+    global _worker_engine, _worker_storage
+    _worker_engine = SyntheticDataEngine(seed=seed, reference_time=reference_time, compact_keys=compact_keys)
+    _worker_storage = open_storage(data_format, directory)
+
+
+def _generate_shard(table_name, shard_index, first_row, size):
+    """
+    Generate one shard in a worker process.
+
+    CSV shards are returned as CSV text (with a header for the first shard) for the parent to
+    append in order. Parquet shards are written by the worker as their own part file, nothing is
+    returned for them.
+    """
+    chunk = generate_shard(table_name, shard_index, first_row, size, _worker_engine)
+    if _worker_storage.format != "csv":
+        _worker_storage.write(table_name, chunk, append=True, part=shard_index)
+        return table_name, len(chunk), None
+    return table_name, len(chunk), chunk.to_csv(index=False, header=(shard_index == 0))
+
+
+def generate_tables_parallel(table_names=None, n_rows=None, chunk_size=DEFAULT_CHUNK_SIZE, engine=None,
+                             storage=None, workers=None):
+    """
+    Generate tables with a pool of worker processes and stream them to storage.
+
+    Every table is split into shards of `chunk_size` rows, each generated from a seed derived
+    from the engine's seed (see shard_seed), so the files are identical to the ones written by
+    generate_tables whatever the number of workers. Shards of all tables share one queue, which
+    lets small tables be generated concurrently with the shards of large ones. At most two shards
+    per worker are in flight, keeping memory bounded.
+
+    Args:
+        table_names (list): Tables to generate. Defaults to every table in TABLE_GENERATORS.
+        n_rows (int): Rows per table. Defaults to each generator's default size.
+        chunk_size (int): Rows per shard.
+        engine (SyntheticDataEngine): Engine providing the seed and reference time. Defaults to default_engine.
+        storage (CSVStorage or ParquetStorage): Where the tables are written. Defaults to CSV files
+            in the current directory.
+        workers (int): Number of worker processes. Defaults to the number of CPUs.
+    """
+    engine = engine or default_engine
+    storage = storage or CSVStorage()
+    workers = workers or os.cpu_count()
+    table_names = table_names or list(TABLE_GENERATORS)
+    os.makedirs(storage.directory, exist_ok=True)
+    for table_name in table_names:
+        storage.clear(table_name)
+
+    tasks = [
+        (table_name, shard_index, first_row, size)
+        for table_name in table_names
+        for shard_index, first_row, size in table_shards(table_name, n_rows, chunk_size)
+    ]
+    shards_left = {table_name: len(table_shards(table_name, n_rows, chunk_size)) for table_name in table_names}
+    rows_written = dict.fromkeys(table_names, 0)
+    files = {}
+
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_generation_worker,
+                             initargs=(engine.seed, engine.reference_time, engine.compact_keys,
+                                       storage.format, storage.directory)) as executor:
+        pending = deque()
+        task_iter = iter(tasks)
+        for task in task_iter:
+            pending.append(executor.submit(_generate_shard, *task))
+            if len(pending) >= 2 * workers:
+                break
+
+        # Results are consumed in submission order, so the shards of a table are written in order
+        while pending:
+            table_name, rows, csv_text = pending.popleft().result()
+            next_task = next(task_iter, None)
+            if next_task is not None:
+                pending.append(executor.submit(_generate_shard, *next_task))
+
+            if csv_text is not None:
+                if table_name not in files:
+                    files[table_name] = open(storage.path(table_name), "w", newline="")
+                files[table_name].write(csv_text)
+            rows_written[table_name] += rows
+            shards_left[table_name] -= 1
+
+            if shards_left[table_name] == 0:
+                if table_name in files:
+                    files.pop(table_name).close()
+                elapsed = time.perf_counter() - start_time
+                print(f"Saved {table_name} to {storage.path(table_name)} ({rows_written[table_name]} rows, "
+                      f"done after {elapsed:.2f}s)")
+
+    total_rows = sum(rows_written.values())
+    elapsed = time.perf_counter() - start_time
+    print(f"Generated {total_rows} rows with {workers} workers in {elapsed:.2f}s ({total_rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+# Datetime column of each table and the foreign key referencing its Time_Dimension entry
+TIME_DIMENSION_SOURCES = {
+    'transactions.csv': {
+        'datetime_col': 'Time',
+        'foreign_key_col': 'Time_Foreign_ID'
+    },
+    'accounts.csv': {
+        'datetime_col': 'Creation_Time',
+        'foreign_key_col': 'Creation_Time_Foreign_ID'
+    },
+    'subscribers.csv': {
+        'datetime_col': 'Subscriber_registration_date',
+        'foreign_key_col': 'Subscriber_expiry_date_Foreign_ID'
+    },
+    'calllogs.csv': {
+        'datetime_col': 'Date_Time',
+        'foreign_key_col': 'Date_Time_Foreign_ID'
+    },
+    'messages.csv': {
+        'datetime_col': 'Time',
+        'foreign_key_col': 'Time_Foreign_ID'
+    },
+    'isptraffic.csv': {
+        'datetime_col': 'Time',
+        'foreign_key_col': 'Time_Foreign_ID'
+    },
+    'cryptoledgers.csv': {
+        'datetime_col': 'Timestamp',
+        'foreign_key_col': 'TimeStamp_Foreign_ID'
+    },
+    'siminfo.csv': {
+        'datetime_col': 'Activation_Date',
+        'foreign_key_col': 'Expiry_Date_Foreign_ID'
+    },
+    'appinfo.csv': {
+        'datetime_col':  'Date_Time',
+        'foreign_key_col': 'Date_Time_Foreign_ID'
+    },
+    'socialmedialogs.csv': {
+        'datetime_col': 'Time',
+        'foreign_key_col': 'Time_Foreign_ID'
+    },
+    'agents.csv': {
+        'datetime_col': 'Creation_Date',
+        'foreign_key_col': 'Creation_Time_Foreign_ID'
+    },
+    'auditlogs.csv': {
+        'datetime_col': 'Action_Date',
+        'foreign_key_col': 'Creation_Time_Foreign_ID'
+    },
+    'supportlogs.csv': {
+        'datetime_col': 'Date_Issued',
+        'foreign_key_col': 'Foreign_Resolved_Date_ID'
+    }
 }
 
-# Save each table to CSV
-for table_name, df in tables.items():
-    file_name = f"{table_name.lower().replace(' ', '_')}.csv"
-    df.to_csv(file_name, index=False)
-    print(f"Saved {table_name} as {file_name}")
 
+# Format the generators write timestamps with, parsing with a known format avoids per-value inference
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_datetimes(values):
+    """Parse timestamps written as DATETIME_FORMAT, values that do not match (e.g. dummy rows) become NaT."""
+    return pd.to_datetime(values, format=DATETIME_FORMAT, errors='coerce')
+
+
+def read_datetime_source(filename, config, storage=None):
+    """
+    Read the datetime and foreign key columns of one table.
+
+    Only the needed columns are parsed, the foreign keys as strings and the timestamps with
+    DATETIME_FORMAT. Rows whose timestamp does not parse are dropped.
+
+    Args:
+        filename (str): CSV file of the table.
+        config (dict): Its entry in TIME_DIMENSION_SOURCES.
+        storage (ParquetStorage): Read the table from this storage rather than from the CSV file.
+            Its timestamps are stored as datetimes and are not parsed again.
+
+    Returns:
+        list: DataFrames with 'datetime' and 'foreign_key' columns, one per datetime column.
+    """
+    if 'datetime_col' in config:
+        column_pairs = [(config['datetime_col'], config['foreign_key_col'])]
+    else:
+        column_pairs = list(zip(config['datetime_cols'], config['foreign_key_cols']))
+
+    datetime_cols = {dt_col for dt_col, _ in column_pairs}
+    foreign_key_cols = {fk_col for _, fk_col in column_pairs}
+    if storage is not None and storage.format != 'csv':
+        df = storage.read(os.path.splitext(filename)[0], columns=sorted(datetime_cols | foreign_key_cols))
+    else:
+        df = pd.read_csv(
+            filename,
+            usecols=sorted(datetime_cols | foreign_key_cols),
+            dtype={col: str for col in datetime_cols | foreign_key_cols}
+        )
 
-def load_datetime_columns():
-    """Load all tables and extract datetime columns with their foreign keys"""
     datetime_data = []
-    
+    for dt_col, fk_col in column_pairs:
+        timestamps = df[dt_col]
+        temp_data = pd.DataFrame({
+            'datetime': timestamps if pd.api.types.is_datetime64_any_dtype(timestamps) else parse_datetimes(timestamps),
+            'foreign_key': df[fk_col].astype(str)
+        })
+        invalid = temp_data['datetime'].isna()
+        if invalid.any():
+            print(f"Warning: skipping {invalid.sum()} rows of {filename} with an invalid {dt_col}")
+            temp_data = temp_data[~invalid]
+        datetime_data.append(temp_data)
+    return datetime_data
+
+
+def load_datetime_columns(max_workers=None, storage=None):
+    """
+    Load all tables and extract datetime columns with their foreign keys.
+
+    The files are read concurrently by a thread pool, the CSV parser releasing the GIL while it
+    tokenizes, and the time spent on each file is reported.
+
+    Args:
+        max_workers (int): Number of reader threads. Defaults to one per file.
+        storage (ParquetStorage): Read the tables from this storage rather than from the CSV files.
+    """
+    datetime_data = []
+    sources = list(TIME_DIMENSION_SOURCES.items())
+
+    def timed_read(source):
+        filename, config = source
+        start_time = time.perf_counter()
+        return read_datetime_source(filename, config, storage), time.perf_counter() - start_time
+
     # Load each table and extract datetime columns with their foreign keys
-    tables_config = {
-        'transactions.csv': {
-            'datetime_col': 'Time',
-            'foreign_key_col': 'Time_Foreign_ID'
-        },
-        'accounts.csv': {
-            'datetime_col': 'Creation_Time',
-            'foreign_key_col': 'Creation_Time_Foreign_ID'
-        },
-        'subscribers.csv': {
-            'datetime_col': 'Subscriber_registration_date',
-            'foreign_key_col': 'Subscriber_expiry_date_Foreign_ID'
-        },
-        'calllogs.csv': {
-            'datetime_col': 'Date_Time',
-            'foreign_key_col': 'Date_Time_Foreign_ID'
-        },
-        'messages.csv': {
-            'datetime_col': 'Time',
-            'foreign_key_col': 'Time_Foreign_ID'
-        },
-        'isptraffic.csv': {
-            'datetime_col': 'Time',
-            'foreign_key_col': 'Time_Foreign_ID'
-        },
-        'cryptoledgers.csv': {
-            'datetime_col': 'Timestamp',
-            'foreign_key_col': 'TimeStamp_Foreign_ID'
-        },
-        'siminfo.csv': {
-            'datetime_col': 'Activation_Date',
-            'foreign_key_col': 'Expiry_Date_Foreign_ID'
-        },
-        'appinfo.csv': {
-            'datetime_col':  'Date_Time',
-            'foreign_key_col': 'Date_Time_Foreign_ID'
-        },
-        'socialmedialogs.csv': {
-            'datetime_col': 'Time',
-            'foreign_key_col': 'Time_Foreign_ID'
-        },
-        'agents.csv': {
-            'datetime_col': 'Creation_Date',
-            'foreign_key_col': 'Creation_Time_Foreign_ID'
-        },
-        'auditlogs.csv': {
-            'datetime_col': 'Action_Date',
-            'foreign_key_col': 'Creation_Time_Foreign_ID'
-        },
-        'supportlogs.csv': {
-            'datetime_col': 'Date_Issued',
-            'foreign_key_col': 'Foreign_Resolved_Date_ID'
-        }
-    }
-    
-    for filename, config in tables_config.items():
-        try:
-            df = pd.read_csv(filename)
-            
-            # Handle single datetime column
-            if 'datetime_col' in config:
-                datetime_col = config['datetime_col']
-                foreign_key_col = config['foreign_key_col']
-                
-                temp_data = pd.DataFrame({
-                    'datetime': pd.to_datetime(df[datetime_col]),
-                    'foreign_key': df[foreign_key_col]
-                })
-                datetime_data.append(temp_data)
-            
-            # Handle multiple datetime columns
-            elif 'datetime_cols' in config:
-                for dt_col, fk_col in zip(config['datetime_cols'], config['foreign_key_cols']):
-                    temp_data = pd.DataFrame({
-                        'datetime': pd.to_datetime(df[dt_col]),
-                        'foreign_key': df[fk_col]
-                    })
-                    datetime_data.append(temp_data)
-            
-        except FileNotFoundError:
-            print(f"Warning: {filename} not found")
-            continue
-        except Exception as e:
-            print(f"Error processing {filename}: {e}")
-            continue
+    with ThreadPoolExecutor(max_workers=max_workers or len(sources)) as executor:
+        futures = {executor.submit(timed_read, source): source[0] for source in sources}
+        for future in futures:
+            filename = futures[future]
+            try:
+                frames, elapsed = future.result()
+            except FileNotFoundError:
+                print(f"Warning: {filename} not found")
+                continue
+            except Exception as e:
+                print(f"Error processing {filename}: {e}")
+                continue
+            print(f"Loaded {sum(len(frame) for frame in frames)} datetime records from {filename} in {elapsed:.3f}s")
+            datetime_data.extend(frames)
     
     return pd.concat(datetime_data, ignore_index=True)
 
+# Lookup tables of the derived time dimension attributes, indexed by month (1-12), hour (0-23)
+# and day of the week (0 = Monday). Codes refer to positions in the matching category lists.
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+LOCAL_SEASONS = ["Dry", "Rainy"]
+LOCAL_SEASON_BY_MONTH = np.array([-1, 0, 0, 1, 1, 1, 0, 0, 0, 1, 1, 1, 0])
+FOREIGN_SEASONS = ["Spring", "Summer", "Autumn", "Winter"]
+FOREIGN_SEASON_BY_MONTH = np.array([-1, 0, 0, 2, 2, 2, 1, 1, 1, 1, 3, 3, 3])
+TIMES_OF_DAY = ["Night", "Morning", "Afternoon", "Evening"]
+TIME_OF_DAY_BY_HOUR = np.repeat([0, 1, 2, 3, 0], [6, 6, 5, 3, 4])
+
+
 def create_time_dimension(datetime_data):
     """Create time dimension table from consolidated datetime data"""
     # Get unique dates and their foreign keys
@@ -925,55 +945,49 @@ def create_time_dimension(datetime_data):
     
     # Sort by datetime
     datetime_data = datetime_data.sort_values('datetime')
+    timestamps = datetime_data['datetime'].dt
+    month = timestamps.month.to_numpy()
+    hour = timestamps.hour.to_numpy()
+    weekday = timestamps.dayofweek.to_numpy()
     
     # Create time dimension dataframe
     time_dim = pd.DataFrame({
         'Time_ID': datetime_data['foreign_key'],
-        'Date': datetime_data['datetime'].dt.date,
+        'Date': timestamps.normalize(),
         'DateTime': datetime_data['datetime'],
-        'Year': datetime_data['datetime'].dt.year,
-        'Month': datetime_data['datetime'].dt.month,
-        'Day': datetime_data['datetime'].dt.day,
-        'Hour': datetime_data['datetime'].dt.hour,
-        'Minute': datetime_data['datetime'].dt.minute,
-        'Second': datetime_data['datetime'].dt.second,
-        'Quarter': datetime_data['datetime'].dt.quarter,
-        'WeekDay': datetime_data['datetime'].dt.day_name(),
-        'WeekDayNum': datetime_data['datetime'].dt.dayofweek,
-        'WeekOfYear': datetime_data['datetime'].dt.isocalendar().week,
-        'DayOfYear': datetime_data['datetime'].dt.dayofyear,
-        'IsWeekend': datetime_data['datetime'].dt.dayofweek.isin([5, 6])
-    })
+        'Year': timestamps.year,
+        'Month': month,
+        'Day': timestamps.day,
+        'Hour': hour,
+        'Minute': timestamps.minute,
+        'Second': timestamps.second,
+        'Quarter': timestamps.quarter,
+        'WeekDay': pd.Categorical.from_codes(weekday, categories=WEEKDAYS),
+        'WeekDayNum': weekday,
+        'WeekOfYear': timestamps.isocalendar().week,
+        'DayOfYear': timestamps.dayofyear,
+        'IsWeekend': weekday >= 5
+    }, index=datetime_data.index)
     
     # Add seasons
-    time_dim['Local_Season'] = time_dim.apply(
-        lambda x: "Dry" if x['Month'] in [12, 1, 2, 6, 7, 8] else "Rainy", 
-        axis=1
-    )
-    
-    time_dim['Foreign_Season'] = time_dim.apply(
-        lambda x: "Summer" if x['Month'] in [6, 7, 8, 9]
-        else "Winter" if x['Month'] in [10, 11, 12]
-        else "Spring" if x['Month'] in [1, 2]
-        else "Autumn",
-        axis=1
-    )
+    time_dim['Local_Season'] = pd.Categorical.from_codes(LOCAL_SEASON_BY_MONTH[month], categories=LOCAL_SEASONS)
+    time_dim['Foreign_Season'] = pd.Categorical.from_codes(FOREIGN_SEASON_BY_MONTH[month], categories=FOREIGN_SEASONS)
     
     # Add time-of-day classification
-    time_dim['TimeOfDay'] = time_dim.apply(
-        lambda x: "Night" if 0 <= x['Hour'] < 6
-        else "Morning" if 6 <= x['Hour'] < 12
-        else "Afternoon" if 12 <= x['Hour'] < 17
-        else "Evening" if 17 <= x['Hour'] < 20
-        else "Night",
-        axis=1
-    )
+    time_dim['TimeOfDay'] = pd.Categorical.from_codes(TIME_OF_DAY_BY_HOUR[hour], categories=TIMES_OF_DAY)
     
     return time_dim
 
-def generate_sample_time_datasets():
+def generate_sample_time_datasets(incremental=False, storage=None):
+    columnar = storage is not None and storage.format != 'csv'
+    if incremental and columnar:
+        print("Warning: incremental time dimension updates need CSV sources, rebuilding it instead")
+    elif incremental:
+        return update_time_dimension()
+
     print("Loading datetime data from all tables...")
-    datetime_data = load_datetime_columns()
+    source_watermarks = current_source_watermarks()
+    datetime_data = load_datetime_columns(storage=storage if columnar else None)
     print(f"Found {len(datetime_data)} datetime records")
     
     print("\nCreating time dimension table...")
@@ -981,7 +995,11 @@ def generate_sample_time_datasets():
     print(f"Created time dimension with {len(time_dimension)} unique entries")
     
     print("\nSaving time dimension table...")
-    time_dimension.to_csv('time_dimension.csv', index=False)
+    if columnar:
+        storage.write('Time_Dimension', time_dimension)
+    else:
+        time_dimension.to_csv('time_dimension.csv', index=False)
+        save_time_watermarks(source_watermarks)
     
     # Print sample statistics
     print("\nTime dimension statistics:")
@@ -993,27 +1011,202 @@ def generate_sample_time_datasets():
     return time_dimension
 
 
-#generate_sample_time_datasets() #generate time dimensions from other tables
-
-
-# Load datasets from CSV files
-datasets = {
-    "Transactions": pd.read_csv("Transactions.csv"),
-    "Accounts": pd.read_csv("Accounts.csv"),
-    "Subscribers": pd.read_csv("Subscribers.csv"),
-    "CallLogs": pd.read_csv("CallLogs.csv"),
-    "ISPTraffic": pd.read_csv("ISPTraffic.csv"),
-    "SIMInfo": pd.read_csv("SIMInfo.csv"),
-    "Agents": pd.read_csv("Agents.csv"),
-    "SupportLogs": pd.read_csv("SupportLogs.csv"),
-    "AuditLogs": pd.read_csv("AuditLogs.csv"),
-    "SocialMediaLogs": pd.read_csv("SocialMediaLogs.csv"),
-    "CryptoLedgers": pd.read_csv("CryptoLedgers.csv"),
-    "Time_Dimension": pd.read_csv("Time_Dimension.csv"),
-    "AppInfo": pd.read_csv("AppInfo.csv"),
-    "Messages": pd.read_csv("Messages.csv")
+TIME_DIMENSION_FILE = 'time_dimension.csv'
+TIME_WATERMARK_FILE = 'time_dimension_watermarks.csv'
+FINGERPRINT_BYTES = 64 * 1024  # Bytes at the start of a source file and before its watermark hashed into its fingerprint
+
+
+def source_fingerprint(filename, offset):
+    """
+    Fingerprint of the part of a source file up to a watermark.
+
+    Rows are only ever appended to a source file between two incremental runs, which leaves
+    its first bytes and the bytes before the watermark unchanged. A file regenerated since (e.g.
+    with another seed) differs in either, and its watermark no longer points at a row boundary.
+
+    Returns:
+        str: CRC-32 of the first FINGERPRINT_BYTES of the file and of the FINGERPRINT_BYTES before
+        offset, as hex.
+    """
+    with open(filename, 'rb') as f:
+        head = f.read(min(FINGERPRINT_BYTES, offset))
+        f.seek(max(offset - FINGERPRINT_BYTES, 0))
+        tail = f.read(offset - f.tell())
+    return f"{zlib.crc32(tail, zlib.crc32(head)):08x}"
+
+
+def current_source_watermarks():
+    """Return the watermark (size in bytes, fingerprint) of every time dimension source file that exists."""
+    watermarks = {}
+    for filename in TIME_DIMENSION_SOURCES:
+        if os.path.exists(filename):
+            size = os.path.getsize(filename)
+            watermarks[filename] = (size, source_fingerprint(filename, size))
+    return watermarks
+
+
+def load_time_watermarks(watermark_file=TIME_WATERMARK_FILE):
+    """
+    Load the byte offset up to which each source file has been ingested into the time dimension,
+    with the fingerprint of the file up to that offset (None for watermarks saved without one).
+    """
+    if not os.path.exists(watermark_file):
+        return {}
+    watermarks = pd.read_csv(watermark_file, dtype={'Fingerprint': str})
+    fingerprints = watermarks['Fingerprint'] if 'Fingerprint' in watermarks else [None] * len(watermarks)
+    return {filename: (offset, fingerprint) for filename, offset, fingerprint
+            in zip(watermarks['File'], watermarks['Offset'], fingerprints)}
+
+
+def save_time_watermarks(watermarks, watermark_file=TIME_WATERMARK_FILE):
+    pd.DataFrame({
+        'File': list(watermarks),
+        'Offset': [offset for offset, _ in watermarks.values()],
+        'Fingerprint': [fingerprint for _, fingerprint in watermarks.values()]
+    }).to_csv(watermark_file, index=False)
+
+
+def source_rewritten(filename, watermark):
+    """Whether a source file was rewritten (rather than appended to) since its watermark was saved."""
+    offset, fingerprint = watermark
+    if not isinstance(fingerprint, str) or os.path.getsize(filename) < offset:
+        return True
+    return source_fingerprint(filename, offset) != fingerprint
+
+
+def read_appended_rows(filename, offset, usecols):
+    """
+    Read the complete CSV rows appended to a file after a byte offset.
+
+    Args:
+        filename (str): CSV file with a header line.
+        offset (int): Byte offset of the first row to read, a row boundary. Offsets inside the
+            header restart from the first row.
+        usecols (list): Columns to read.
+
+    Returns:
+        tuple: (DataFrame of the new rows, byte offset just after the last complete row read)
+    """
+    with open(filename, 'rb') as f:
+        header = f.readline()
+        offset = max(offset, len(header))
+        f.seek(offset)
+        data = f.read()
+
+    # Leave a partially written last row for the next run. Quoted values may hold line breaks,
+    # so the rows end at the line breaks outside quotes
+    ends, _ = row_ends(data)
+    columns = pd.read_csv(io.BytesIO(header), nrows=0).columns
+    if len(ends) == 0:
+        return pd.DataFrame({col: pd.Series(dtype=str) for col in usecols}), offset
+    end = int(ends[-1])
+    rows = pd.read_csv(io.BytesIO(data[:end]), header=None, names=columns, usecols=usecols, dtype=str)
+    return rows, offset + end
+
+
+def update_time_dimension(dimension_file=TIME_DIMENSION_FILE, watermark_file=TIME_WATERMARK_FILE):
+    """
+    Incrementally maintain the time dimension instead of rebuilding it.
+
+    Only the rows appended to each source file since its watermark (the byte offset reached by the
+    previous run) are read, and only timestamps whose Time_ID is not in the dimension yet are
+    appended to it. Falls back to a full rebuild when there is no dimension file yet, when a
+    source file was rewritten since its watermark (it shrank or its fingerprint changed, see
+    source_fingerprint) and when the appended rows cannot be parsed.
+
+    Args:
+        dimension_file (str): Time dimension CSV file.
+        watermark_file (str): CSV file holding the watermark of every source file.
+
+    Returns:
+        pd.DataFrame: The time dimension rows added by this run.
+    """
+    if not os.path.exists(dimension_file):
+        print(f"{dimension_file} not found, building the time dimension from scratch")
+        return generate_sample_time_datasets()
+
+    watermarks = load_time_watermarks(watermark_file)
+    datetime_data = []
+    for filename, config in TIME_DIMENSION_SOURCES.items():
+        datetime_col = config['datetime_col']
+        foreign_key_col = config['foreign_key_col']
+        if not os.path.exists(filename):
+            print(f"Warning: {filename} not found")
+            continue
+        if filename in watermarks and source_rewritten(filename, watermarks[filename]):
+            print(f"{filename} was rewritten since the last run, rebuilding the time dimension from scratch")
+            return generate_sample_time_datasets()
+        try:
+            new_rows, offset = read_appended_rows(
+                filename, watermarks.get(filename, (0, None))[0], [datetime_col, foreign_key_col]
+            )
+        except ValueError as e:  # pd.errors.ParserError included
+            print(f"Could not parse the rows appended to {filename} ({e}), rebuilding the time dimension from scratch")
+            return generate_sample_time_datasets()
+        watermarks[filename] = (offset, source_fingerprint(filename, offset))
+        new_rows = new_rows.assign(**{datetime_col: parse_datetimes(new_rows[datetime_col])})
+        new_rows = new_rows[new_rows[datetime_col].notna()]
+        print(f"{filename}: {len(new_rows)} new rows")
+        datetime_data.append(pd.DataFrame({
+            'datetime': new_rows[datetime_col],
+            'foreign_key': new_rows[foreign_key_col]
+        }))
+
+    if datetime_data:
+        datetime_data = pd.concat(datetime_data, ignore_index=True)
+    else:
+        datetime_data = pd.DataFrame({'datetime': pd.Series(dtype='datetime64[ns]'), 'foreign_key': pd.Series(dtype=object)})
+
+    # Keep only the timestamps that are not in the dimension yet
+    known_ids = pd.read_csv(dimension_file, usecols=['Time_ID'], dtype={'Time_ID': object})['Time_ID']
+    datetime_data = datetime_data[~datetime_data['foreign_key'].astype(str).isin(known_ids)]
+
+    time_dimension = create_time_dimension(datetime_data)
+    time_dimension.to_csv(dimension_file, mode='a', header=False, index=False)
+    save_time_watermarks(watermarks, watermark_file)
+    print(f"Appended {len(time_dimension)} new entries to {dimension_file}")
+
+    return time_dimension
+
+
+DATASET_TABLES = [
+    "Transactions", "Accounts", "Subscribers", "CallLogs", "ISPTraffic", "SIMInfo", "Agents",
+    "SupportLogs", "AuditLogs", "SocialMediaLogs", "CryptoLedgers", "Time_Dimension", "AppInfo",
+    "Messages"
     # Add additional datasets here...
-}
+]
+
+
+# Load datasets from storage (CSV files by default)
+def load_datasets(storage=None):
+    storage = storage or CSVStorage()
+    datasets = {}
+    for table_name in DATASET_TABLES:
+        if not storage.exists(table_name):
+            print(f"Warning: {storage.path(table_name)} not found")
+            continue
+        datasets[table_name] = storage.read(table_name)
+    return datasets
+
+
+def check_time_dimension_loaded(datasets, time_dimension):
+    """
+    Check that the datasets hold the time dimension built (or updated) by this run.
+
+    A time dimension loaded before it was rebuilt is the previous run's: the timestamps of the
+    tables just generated are missing from it, and enforce_foreign_key_integrity would stand in
+    dummy rows for all of them.
+
+    Raises:
+        RuntimeError: When entries of time_dimension are missing from datasets["Time_Dimension"].
+    """
+    if "Time_Dimension" not in datasets:
+        return
+    loaded_ids = pd.Index(datasets["Time_Dimension"]["Time_ID"].astype(str))
+    missing = (~time_dimension["Time_ID"].astype(str).isin(loaded_ids)).sum()
+    if missing:
+        raise RuntimeError(f"{missing} of the {len(time_dimension)} time dimension entries built by this run "
+                           f"are missing from the loaded Time_Dimension, which is stale")
 
 # Define relationships between tables
 relationships = [
@@ -1063,6 +1256,226 @@ primary_keys = {
     "CryptoLedgers": "Public_Address_Sender"
 }
 
+# Key domains replaced by dense integer surrogate keys with --surrogate-keys. Each domain is a
+# primary key, every foreign key referencing it in `relationships` shares its dictionary.
+SURROGATE_KEY_DOMAINS = {
+    ("Time_Dimension", "Time_ID"): "Time_ID",
+    ("Accounts", "Account_ID"): "Account_ID",
+    ("Subscribers", "Subscriber_ID"): "Subscriber_ID",
+    ("Agents", "Agent_ID"): "Agent_ID"
+}
+
+DEFAULT_SURROGATE_KEY_DIR = "surrogate_keys"
+
+
+def surrogate_key_columns(relationships):
+    """
+    List the columns holding the keys of each surrogate key domain.
+
+    Returns:
+        dict: Domain name -> list of (table, column), the primary key coming first.
+    """
+    columns = {domain: [key] for key, domain in SURROGATE_KEY_DOMAINS.items()}
+    for rel in relationships:
+        domain = SURROGATE_KEY_DOMAINS.get((rel["primary_table"], rel["primary_key"]))
+        if domain is not None:
+            columns[domain].append((rel["foreign_table"], rel["foreign_key"]))
+    return columns
+
+
+def apply_surrogate_keys(datasets, relationships, key_dir=DEFAULT_SURROGATE_KEY_DIR):
+    """
+    Replace the natural keys of every surrogate key domain by dense integer keys, in the primary
+    tables and in all the foreign tables referencing them.
+
+    Dictionaries already saved in `key_dir` are reused so that keys stay stable across runs,
+    new natural keys are appended to them and the updated dictionaries are saved back.
+
+    Args:
+        datasets (dict): Dictionary of tables (DataFrames), updated in place.
+        relationships (list): Relationships between the tables.
+        key_dir (str): Directory holding the persisted dictionaries.
+
+    Returns:
+        dict: Domain name -> SurrogateKeyMap.
+    """
+    key_maps = {}
+    for domain, columns in surrogate_key_columns(relationships).items():
+        key_map = SurrogateKeyMap.load(domain, key_dir)
+        for table_name, column in columns:
+            if table_name not in datasets or column not in datasets[table_name]:
+                continue
+            datasets[table_name][column] = key_map.encode(datasets[table_name][column])
+        key_map.save(key_dir)
+        key_maps[domain] = key_map
+        print(f"Surrogate keys for {domain}: {len(key_map)} keys ({np.dtype(key_map.dtype).name})")
+    return key_maps
+
+
+def use_integer_keys(table_definitions, relationships, key_dtypes=None):
+    """
+    Rewrite CREATE TABLE statements so that the columns of every surrogate key domain are
+    integers instead of VARCHARs.
+
+    Args:
+        table_definitions (dict): Table name -> CREATE TABLE statement.
+        relationships (list): Relationships between the tables.
+        key_dtypes (dict): Domain name -> dtype of its surrogate keys (SurrogateKeyMap.dtype).
+            Columns of int64 domains become BIGINT, the others INT.
+
+    Returns:
+        dict: The rewritten table definitions.
+    """
+    key_dtypes = key_dtypes or {}
+    integer_columns = {}
+    for domain, columns in surrogate_key_columns(relationships).items():
+        sql_type = "BIGINT" if np.dtype(key_dtypes.get(domain, np.int32)) == np.int64 else "INT"
+        for table_name, column in columns:
+            integer_columns.setdefault(table_name, {})[column] = sql_type
+
+    rewritten = {}
+    for name, create_query in table_definitions.items():
+        table_name = re.search(r"CREATE TABLE IF NOT EXISTS (\w+)", create_query).group(1)
+        for column, sql_type in integer_columns.get(table_name, {}).items():
+            create_query = re.sub(rf"\b{column} VARCHAR\(\d+\)", f"{column} {sql_type}", create_query)
+        rewritten[name] = create_query
+    return rewritten
+
+
+# Composite secondary indexes of the hot fraud lookups: an entity's activity over a time window,
+# regional activity over time and the highest anomaly scores. InnoDB reuses an index starting
+# with a foreign key column for that foreign key instead of creating its own.
+SECONDARY_INDEXES = {
+    "Transactions": [
+        ("idx_transactions_subscriber_time", ["Subscriber_ID", "Time"]),
+        ("idx_transactions_account_time", ["Account_ID", "Time"]),
+        ("idx_transactions_agent_time", ["Agent_ID", "Time"]),
+        ("idx_transactions_source_time", ["Source_account", "Time"]),
+        ("idx_transactions_destination_time", ["Destination_account", "Time"]),
+        ("idx_transactions_region_time", ["Region", "Time"]),
+        ("idx_transactions_score_time", ["Anomaly_score", "Time"])
+    ],
+    "CallLogs": [("idx_calllogs_subscriber_time", ["Subscriber_ID", "Date_Time"])],
+    "Messages": [
+        ("idx_messages_sender_time", ["Sender_ID", "Time"]),
+        ("idx_messages_receiver_time", ["Receiver_ID", "Time"])
+    ],
+    "ISPTraffic": [("idx_isptraffic_subscriber_time", ["Subscriber_ID", "Time"])],
+    "SocialMediaLogs": [("idx_socialmedialogs_email_time", ["Email", "Time"])],
+    "SupportLogs": [("idx_supportlogs_account_issued", ["Account_ID", "Date_Issued"])],
+    "AuditLogs": [("idx_auditlogs_account_date", ["Account_ID", "Action_Date"])],
+    "Accounts": [("idx_accounts_email", ["Account_holder_email"])],
+    "Subscribers": [("idx_subscribers_email", ["Subscriber_email"])]
+}
+
+# Large fact tables and the DATETIME column they are RANGE partitioned by, one partition per year
+PARTITIONED_TABLES = {
+    "Transactions": "Time",
+    "CallLogs": "Date_Time",
+    "Messages": "Time",
+    "ISPTraffic": "Time",
+    "SocialMediaLogs": "Time"
+}
+
+
+def add_secondary_indexes(table_definitions, indexes=SECONDARY_INDEXES):
+    """
+    Rewrite CREATE TABLE statements to declare secondary indexes.
+
+    Args:
+        table_definitions (dict): Table name -> CREATE TABLE statement.
+        indexes (dict): Table name -> list of (index name, columns).
+
+    Returns:
+        dict: The rewritten table definitions.
+    """
+    rewritten = {}
+    for name, create_query in table_definitions.items():
+        table_name = re.search(r"CREATE TABLE IF NOT EXISTS (\w+)", create_query).group(1)
+        if indexes.get(table_name):
+            body, closing = create_query.rsplit(")", 1)
+            declarations = "".join(
+                f",\n                    INDEX {index_name} ({', '.join(columns)})"
+                for index_name, columns in indexes[table_name]
+            )
+            create_query = f"{body.rstrip()}{declarations}\n                ){closing}"
+        rewritten[name] = create_query
+    return rewritten
+
+
+def partition_by_time(table_definitions, first_year, last_year, partitioned=PARTITIONED_TABLES):
+    """
+    Rewrite CREATE TABLE statements so that the large fact tables are RANGE partitioned by year.
+
+    MySQL requires the partitioning column in every unique key and does not support foreign
+    keys on partitioned InnoDB tables, so the timestamp column is added to the primary key
+    (and made NOT NULL) and the FOREIGN KEY clauses of those tables are dropped. Their
+    referential integrity is still enforced and checked by the pipeline before loading.
+
+    Args:
+        table_definitions (dict): Table name -> CREATE TABLE statement.
+        first_year (int): Year of the first partition, older rows also go to it.
+        last_year (int): Year of the last dated partition, a pmax partition takes later rows.
+        partitioned (dict): Table name -> DATETIME column it is partitioned by.
+
+    Returns:
+        dict: The rewritten table definitions.
+    """
+    partitions = ",\n".join(
+        [f"                    PARTITION p{year} VALUES LESS THAN ('{year + 1}-01-01')"
+         for year in range(first_year, last_year + 1)]
+        + ["                    PARTITION pmax VALUES LESS THAN (MAXVALUE)"]
+    )
+
+    rewritten = {}
+    for name, create_query in table_definitions.items():
+        table_name = re.search(r"CREATE TABLE IF NOT EXISTS (\w+)", create_query).group(1)
+        time_column = partitioned.get(table_name)
+        if time_column is not None:
+            primary_key = re.search(r"(\w+) \w+(?:\(\d+\))? PRIMARY KEY", create_query).group(1)
+            create_query = re.sub(rf"\b{primary_key} (\w+(?:\(\d+\))?) PRIMARY KEY", rf"{primary_key} \1 NOT NULL", create_query)
+            create_query = re.sub(rf"\b{time_column} DATETIME\b(?! NOT NULL)", f"{time_column} DATETIME NOT NULL", create_query)
+            create_query = re.sub(r",\s*FOREIGN KEY [^,]*?REFERENCES \w+\(\w+\)[^,)]*(?=[,)])", "", create_query)
+            body, closing = create_query.rsplit(")", 1)
+            create_query = (
+                f"{body.rstrip()},\n                    PRIMARY KEY ({primary_key}, {time_column})\n                )"
+                f"\n                PARTITION BY RANGE COLUMNS({time_column}) (\n{partitions}\n                ){closing}"
+            )
+        rewritten[name] = create_query
+    return rewritten
+
+def dummy_value(series, col):
+    """Return the placeholder value of a column in the dummy rows added to a table."""
+    if isinstance(series.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(series):
+        return None
+    if pd.api.types.is_string_dtype(series) or series.dtype == 'object':
+        return f"dummy_{col}"
+    if pd.api.types.is_numeric_dtype(series):
+        return 0
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return pd.Timestamp("1970-01-01 00:00:00")
+    return None  # Default for unrecognized types
+
+
+def dummy_rows(df, primary_key, keys):
+    """
+    Build the dummy rows standing in for missing primary keys of a table.
+
+    Args:
+        df (pd.DataFrame): Table the rows are added to.
+        primary_key (str): Key column the rows are identified by.
+        keys (array-like): Missing key values, one row per value.
+
+    Returns:
+        pd.DataFrame: Rows with the table's columns, the given keys and placeholder values.
+    """
+    keys = np.asarray(keys, dtype=object)
+    return pd.DataFrame({
+        col: keys if col == primary_key else dummy_value(df[col], col)
+        for col in df.columns
+    }, index=pd.RangeIndex(len(keys)))
+
+
 def add_dummy_primary_keys(datasets, primary_keys):
     """
     Adds a dummy primary key column to all DataFrames in the datasets dictionary.
@@ -1078,21 +1491,10 @@ def add_dummy_primary_keys(datasets, primary_keys):
             continue
 
         # Create a dummy entry for the primary key
-        dummy_entry = {}
-        for col in df.columns:
-            if col == primary_key:
-                dummy_entry[col] = f"dummy_{table_name}_ID"
-            elif df[col].dtype == 'object':
-                dummy_entry[col] = f"dummy_{col}"
-            elif df[col].dtype in ['int64', 'float64']:
-                dummy_entry[col] = 0
-            elif np.issubdtype(df[col].dtype, np.datetime64):
-                dummy_entry[col] = pd.Timestamp("1970-01-01 00:00:00")
-            else:
-                dummy_entry[col] = None  # Default for unrecognized types
+        dummy_entry = dummy_rows(df, primary_key, [f"dummy_{table_name}_ID"])
 
         # Append the dummy entry to the DataFrame
-        df = pd.concat([df, pd.DataFrame([dummy_entry])], ignore_index=True)
+        df = pd.concat([df, dummy_entry], ignore_index=True)
         print(f"Added dummy entry with primary key 'dummy_{table_name}_ID' to {table_name}")
 
         # Update the dataset with the modified DataFrame
@@ -1101,72 +1503,75 @@ def add_dummy_primary_keys(datasets, primary_keys):
     return datasets
  
 
-def enforce_foreign_key_integrity(datasets, relationships):
-    for rel in relationships:
-        primary_table = rel["primary_table"]
-        foreign_table = rel["foreign_table"]
-        primary_key = rel["primary_key"]
-        foreign_key = rel["foreign_key"]
-
-        if primary_table not in datasets:
-            print(f"Warning: Primary table '{primary_table}' not loaded. Skipping relationship.")
-            continue
-        if foreign_table not in datasets:
-            print(f"Warning: Foreign table '{foreign_table}' not loaded. Skipping relationship.")
-            continue
-
-        primary_df = datasets[primary_table]
-        foreign_df = datasets[foreign_table]
-
-        # Find missing foreign key entries
-        missing_foreign_keys = foreign_df[~foreign_df[foreign_key].isin(primary_df[primary_key])][foreign_key].unique()
-        
-        if missing_foreign_keys.size > 0:
-            print(f"Adding {len(missing_foreign_keys)} dummy entries to {primary_table} to enforce referential integrity for {foreign_key} in {foreign_table}.")
-            
-            # Generate dummy entries
-            dummy_rows = pd.DataFrame({primary_key: missing_foreign_keys})
-            for col in primary_df.columns:
-                if col != primary_key:
-                    if primary_df[col].dtype == 'object':
-                        dummy_rows[col] = f"dummy_{col}"
-                    elif primary_df[col].dtype in ['int64', 'float64']:
-                        dummy_rows[col] = 0
-                    elif np.issubdtype(primary_df[col].dtype, np.datetime64):
-                        dummy_rows[col] = pd.Timestamp("1970-01-01 00:00:00")
-
-            # Add dummy rows to the primary table
-            datasets[primary_table] = pd.concat([primary_df, dummy_rows], ignore_index=True)
-
-            # Update the foreign table to match dummy rows if applicable
-            # Update the foreign table to match dummy rows if applicable
-            invalid_mask = ~foreign_df[foreign_key].isin(primary_df[primary_key])
-            invalid_count = invalid_mask.sum()
-
-            # Generate enough dummy values to match the invalid entries
-            dummy_values = list(dummy_rows[primary_key])
-            while len(dummy_values) < invalid_count:
-                dummy_values.extend(dummy_rows[primary_key])  # Repeat dummy values if necessary
-            dummy_values = dummy_values[:invalid_count]
-
-            # Assign dummy values to invalid rows
-            foreign_df.loc[invalid_mask, foreign_key] = dummy_values
-
-#dummy_values
-add_dummy_primary_keys(datasets, primary_keys)
+def enforce_foreign_key_integrity(datasets, relationships, dry_run=False):
+    """
+    Add dummy rows to the primary tables for every foreign key value they are missing.
 
-generate_sample_time_datasets()
+    All relationships are checked first and the missing keys of each primary table are
+    collected across all of them, so every table is appended to once, in a single concat. A
+    dummy row is keyed by the missing value itself, so the foreign rows referencing it become
+    valid without being rewritten. The placeholder values of the dummy rows may reference keys
+    missing in turn (e.g. the Creation_Time_Foreign_ID of a dummy account), which the next
+    round adds, until every relationship holds.
 
-# Enforce referential integrity
-enforce_foreign_key_integrity(datasets, relationships)
+    Args:
+        datasets (dict): Table name -> DataFrame, updated in place.
+        relationships (list): Relationships to enforce.
+        dry_run (bool): Only report the dummy rows that would be added, leaving datasets unchanged.
 
-# Save updated datasets
-for table_name, df in datasets.items():
-    df.to_csv(f"{table_name}.csv", index=False)
+    Returns:
+        pd.DataFrame: One row per round and primary key column, with the number of dummy rows
+        added and of foreign rows they repair.
+    """
+    tables = dict(datasets) if dry_run else datasets
+    integrity = IntegrityEngine(tables, relationships)
+    report = []
+
+    for round_number in range(1, len(relationships) + 2):
+        _, masks = integrity.validate()
+
+        # Missing keys of every primary key column, and the foreign rows referencing them
+        missing = {}
+        for position, mask in masks.items():
+            if not mask.any():
+                continue
+            rel = relationships[position]
+            foreign_keys = tables[rel["foreign_table"]][rel["foreign_key"]].to_numpy()[mask]
+            entry = missing.setdefault((rel["primary_table"], rel["primary_key"]), {"keys": [], "rows": 0})
+            entry["keys"].append(foreign_keys)
+            entry["rows"] += len(foreign_keys)
+        if not missing:
+            break
+
+        additions = {}
+        for (primary_table, primary_key), entry in missing.items():
+            keys = pd.unique(np.concatenate(entry["keys"]))
+            additions.setdefault(primary_table, []).append(dummy_rows(tables[primary_table], primary_key, keys))
+            report.append({
+                "Round": round_number,
+                "Primary_Table": primary_table,
+                "Primary_Key": primary_key,
+                "Dummy_Rows": len(keys),
+                "Foreign_Rows": entry["rows"]
+            })
+            action = "Would add" if dry_run else "Adding"
+            print(f"{action} {len(keys)} dummy entries to {primary_table} to enforce referential integrity "
+                  f"for {entry['rows']} rows referencing {primary_key}.")
+
+        # Append all dummy rows of a table at once
+        for primary_table, frames in additions.items():
+            tables[primary_table] = pd.concat([tables[primary_table]] + frames, ignore_index=True)
+            integrity.invalidate(primary_table)
+
+    report = pd.DataFrame(report, columns=["Round", "Primary_Table", "Primary_Key", "Dummy_Rows", "Foreign_Rows"])
+    if dry_run:
+        print(f"Dry run: {report['Dummy_Rows'].sum()} dummy rows would be added, repairing "
+              f"{report['Foreign_Rows'].sum()} foreign key values")
+    return report
 
 
 # Check foreign key consistency
-def check_foreign_keys(primary_df, foreign_df, primary_key, foreign_key):
+def check_foreign_keys(primary_df, foreign_df, primary_key, foreign_key, key_index=None):
     """
     Checks if all entries in a foreign key column exist in the primary key column of another DataFrame.
 
@@ -1175,35 +1580,55 @@ def check_foreign_keys(primary_df, foreign_df, primary_key, foreign_key):
     foreign_df (pd.DataFrame): DataFrame containing the foreign key column.
     primary_key (str): Column name of the primary key.
     foreign_key (str): Column name of the foreign key.
+    key_index (KeyIndex): Index of the primary keys, built from primary_df when not given.
 
     Returns:
     pd.DataFrame: Rows from foreign_df where the foreign key doesn't exist in primary_df.
     """
-    invalid_entries = foreign_df[~foreign_df[foreign_key].isin(primary_df[primary_key])]
+    key_index = key_index or KeyIndex(primary_df[primary_key])
+    invalid_entries = foreign_df[key_index.missing(foreign_df[foreign_key])]
     return invalid_entries
 
 # Run checks for all relationships
-for rel in relationships:
-    primary_table = rel["primary_table"]
-    foreign_table = rel["foreign_table"]
-    primary_key = rel["primary_key"]
-    foreign_key = rel["foreign_key"]
+def check_all_foreign_keys(datasets, relationships):
+    """
+    Check every relationship and print its violations.
 
-    primary_df = datasets[primary_table]
-    foreign_df = datasets[foreign_table]
+    Returns:
+        pd.DataFrame: Rows checked, violations and distinct missing keys of every relationship.
+    """
+    report, masks = IntegrityEngine(datasets, relationships).validate()
+    for position, mask in sorted(masks.items()):
+        rel = relationships[position]
+        primary_table = rel["primary_table"]
+        foreign_table = rel["foreign_table"]
+        primary_key = rel["primary_key"]
+        foreign_key = rel["foreign_key"]
+
+        if mask.any():
+            print(f"Invalid {foreign_key} entries in {foreign_table} (referencing {primary_table}.{primary_key}):")
+            print(datasets[foreign_table][mask])
+            print("\n")
+        else:
+            print(f"All {foreign_key} entries in {foreign_table} are valid.\n")
+
+    if not report.empty:
+        print(f"{report['Violations'].sum()} foreign key violations in {len(report)} relationships")
+    return report
 
-    # Check for invalid foreign key entries
-    invalid_entries = check_foreign_keys(primary_df, foreign_df, primary_key, foreign_key)
-    
-    if not invalid_entries.empty:
-        print(f"Invalid {foreign_key} entries in {foreign_table} (referencing {primary_table}.{primary_key}):")
-        print(invalid_entries)
-        print("\n")
-    else:
-        print(f"All {foreign_key} entries in {foreign_table} are valid.\n")
 
+def create_database_and_tables(surrogate_keys=False, partition_facts=False, partition_years=None, key_dtypes=None):
+    """
+    Create the fraud_detection database and its tables, with the secondary indexes of SECONDARY_INDEXES.
 
-def create_database_and_tables():
+    Args:
+        surrogate_keys (bool): Declare the surrogate key columns as integers (see use_integer_keys).
+        partition_facts (bool): RANGE partition the tables of PARTITIONED_TABLES by year (see partition_by_time).
+        partition_years (tuple): First and last year of the partitions. Defaults to the ten years
+            of generated data up to next year.
+        key_dtypes (dict): Domain name -> dtype of its surrogate keys, see use_integer_keys.
+    """
+    connection = None
     try:
         # Connect to MySQL server
         connection = mysql.connector.connect(
@@ -1509,6 +1934,16 @@ def create_database_and_tables():
             # Add more table definitions as needed
         }
 
+        # Integer key columns when the natural keys were replaced by surrogate keys
+        if surrogate_keys:
+            table_definitions = use_integer_keys(table_definitions, relationships, key_dtypes)
+
+        table_definitions = add_secondary_indexes(table_definitions)
+        if partition_facts:
+            current_year = datetime.now().year
+            first_year, last_year = partition_years or (current_year - 10, current_year + 1)
+            table_definitions = partition_by_time(table_definitions, first_year, last_year)
+
         # Create tables
         for table_name, create_query in table_definitions.items():
             cursor.execute(create_query)
@@ -1519,98 +1954,199 @@ def create_database_and_tables():
     except Error as e:
         print(f"Error: {e}")
     finally:
-        if connection.is_connected():
+        if connection is not None and connection.is_connected():
             cursor.close()
             connection.close()
 
-# Call the function to create the database and tables
-create_database_and_tables()
+# Timestamp column tracking the rows already loaded into each MySQL table in incremental mode
+LOAD_WATERMARK_COLUMNS = {
+    os.path.splitext(filename)[0]: config['datetime_col']
+    for filename, config in TIME_DIMENSION_SOURCES.items()
+}
+LOAD_WATERMARK_COLUMNS['time_dimension'] = 'DateTime'
 
-def insert_data_to_mysql(table_name, dataframe):
+
+def insert_data_to_mysql(table_name, dataframe, method="auto", pool=None, incremental=False):
     """
-    Inserts data from a DataFrame into a specified MySQL table using batch processing.
+    Inserts data from a DataFrame into a specified MySQL table in bulk (see mysql_loader.bulk_load).
     Args:
         table_name (str): Name of the MySQL table.
         dataframe (pd.DataFrame): DataFrame containing the data to insert.
+        method (str): "load-data" (LOAD DATA LOCAL INFILE), "insert" (multi-row INSERTs) or
+            "auto" (LOAD DATA LOCAL INFILE, falling back to INSERTs when it is refused).
+        pool (MySQLConnectionPool): Pool to borrow the connection from (see mysql_loader.create_pool).
+            A new connection is opened when not given.
+        incremental (bool): Only merge the rows past the table's high-water mark, updating
+            existing primary keys (see mysql_loader.upsert_load), instead of inserting every row.
     """
+    connection = None
     try:
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='',
-            database='fraud_detection'
-        )
-        cursor = connection.cursor()
-        
-        # Try to increase max_allowed_packet size
-        try:
-            cursor.execute("SET GLOBAL max_allowed_packet=67108864")  # 64MB
-        except Error as config_error:
-            print(f"Warning: Could not set max_allowed_packet: {config_error}")
-        
-        # Generate placeholders for data insertion
-        placeholders = ", ".join(["%s"] * len(dataframe.columns))
-        columns = ", ".join(dataframe.columns)
-        
-        # Prepare the INSERT INTO statement
-        sql = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
-        
-        # Convert the DataFrame to a list of tuples
-        data = dataframe.where(pd.notnull(dataframe), None).values.tolist()
-        
-        # Insert data in smaller batches
-        batch_size = 500  # Reduced batch size
-        total_batches = (len(data) + batch_size - 1) // batch_size
-        
-        for i in range(0, len(data), batch_size):
-            batch = data[i:i + batch_size]
+        if pool is not None:
+            connection = pool.get_connection()
+        else:
+            connection = connect()
+            cursor = connection.cursor()
+
+            # Try to increase max_allowed_packet size
             try:
-                cursor.executemany(sql, batch)
-                connection.commit()
-                print(f"Inserted batch {(i//batch_size) + 1}/{total_batches} into {table_name} ({len(batch)} rows)")
-            except Error as batch_error:
-                print(f"Error inserting batch {(i//batch_size) + 1}: {batch_error}")
-                connection.rollback()
+                cursor.execute("SET GLOBAL max_allowed_packet=67108864")  # 64MB
+            except Error as config_error:
+                print(f"Warning: Could not set max_allowed_packet: {config_error}")
+            cursor.close()
+
+        if incremental:
+            upsert_load(connection, table_name, dataframe, LOAD_WATERMARK_COLUMNS.get(table_name), method)
+        else:
+            bulk_load(connection, table_name, dataframe, method)
 
     except Error as e:
         print(f"Error inserting data into {table_name}: {e}")
     finally:
-        if connection.is_connected():
-            cursor.close()
+        # Closing a pooled connection hands it back to the pool
+        if connection is not None and connection.is_connected():
             connection.close()
 
-def process_csv_files_in_same_directory():
+def process_csv_files_in_same_directory(storage=None, load_method="auto", workers=4, incremental=False):
     """
     Processes a predefined list of CSV files and inserts their data into MySQL tables.
+
+    Tables are loaded concurrently over a connection pool, each one once the tables its foreign
+    keys reference (see relationships) are loaded.
+
+    Args:
+        storage (CSVStorage or ParquetStorage): Where the tables are read from. Defaults to CSV
+            files in the current directory.
+        load_method (str): How rows are loaded, see insert_data_to_mysql.
+        workers (int): Tables read and loaded at the same time, and size of the connection pool.
+        incremental (bool): Only merge the new rows of every table, see insert_data_to_mysql.
     """
+    storage = storage or CSVStorage()
     files_to_read = [
         "time_dimension", "accounts", "subscribers", "transactions", 
         "calllogs", "messages", "isptraffic", "cryptoledgers", 
         "siminfo", "deviceinfo", "appinfo", "socialmedialogs", 
         "agents", "supportlogs", "auditlogs"
     ]
+
+    def process_file(file_name, pool):
+        try:
+            # Load the CSV file into a DataFrame
+            print(f"Reading file: {storage.path(file_name)}")
+            dataframe = storage.read(file_name)
+            print(f"Processing file: {file_name} with {len(dataframe)} rows")
+
+            # Insert data into the corresponding MySQL table
+            insert_data_to_mysql(file_name, dataframe, load_method, pool, incremental)
+            print(f"Completed processing {file_name}\n")
+
+        except FileNotFoundError:
+            print(f"File not found: {storage.path(file_name)}")
+        except pd.errors.EmptyDataError:
+            print(f"Empty file: {file_name}.csv")
+        except Exception as file_error:
+            print(f"Error processing file {file_name}: {file_error}")
     
     try:
-        for file_name in files_to_read:
-            try:
-                # Load the CSV file into a DataFrame
-                print(f"Reading file: {file_name}.csv")
-                dataframe = pd.read_csv(file_name + ".csv")
-                print(f"Processing file: {file_name} with {len(dataframe)} rows")
-                
-                # Insert data into the corresponding MySQL table
-                insert_data_to_mysql(file_name, dataframe)
-                print(f"Completed processing {file_name}\n")
-                
-            except FileNotFoundError:
-                print(f"File not found: {file_name}.csv")
-            except pd.errors.EmptyDataError:
-                print(f"Empty file: {file_name}.csv")
-            except Exception as file_error:
-                print(f"Error processing file {file_name}: {file_error}")
-                
+        pool = create_pool(workers)
+        load_in_dependency_order(
+            {file_name: (lambda file_name=file_name: process_file(file_name, pool)) for file_name in files_to_read},
+            table_dependencies(relationships, files_to_read),
+            workers
+        )
     except Exception as e:
         print(f"Error in main processing loop: {e}")
 
-# Process all CSV files in the same directory
-process_csv_files_in_same_directory()
\ No newline at end of file
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the synthetic fraud detection tables and load them into MySQL.")
+    parser.add_argument("--rows", type=int, default=None,
+                        help="Rows to generate per table (defaults to each generator's default size)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Maximum number of rows held in memory per table while generating")
+    parser.add_argument("--tables", nargs="+", choices=list(TABLE_GENERATORS), default=None,
+                        help="Tables to generate (defaults to all of them)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Seed of the synthetic data engine")
+    parser.add_argument("--compact-keys", action="store_true",
+                        help="Emit the hashed *_Foreign_ID columns as 64-bit integers instead of hex strings")
+    parser.add_argument("--output-dir", default=".", help="Directory the generated tables are written to")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                        help="Storage format of the tables (parquet keeps dtypes and partitions by Year/Region)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes generating table shards in parallel (0 = one per CPU)")
+    parser.add_argument("--surrogate-keys", action="store_true",
+                        help="Replace Time/Account/Subscriber/Agent keys by dense integer surrogate keys")
+    parser.add_argument("--key-dir", default=DEFAULT_SURROGATE_KEY_DIR,
+                        help="Directory of the persisted surrogate key dictionaries")
+    parser.add_argument("--incremental-time-dimension", action="store_true",
+                        help="Only add the timestamps of rows appended since the last run to the time dimension")
+    parser.add_argument("--load-method", choices=["auto", "load-data", "insert"], default="auto",
+                        help="Load MySQL with LOAD DATA LOCAL INFILE, multi-row INSERTs, or the former falling back to the latter")
+    parser.add_argument("--load-workers", type=int, default=4,
+                        help="Tables loaded into MySQL concurrently over a connection pool of this size (at most 32)")
+    parser.add_argument("--incremental-load", action="store_true",
+                        help="Only merge rows past each table's high-water mark into MySQL, updating existing keys")
+    parser.add_argument("--partition-facts", action="store_true",
+                        help="RANGE partition the large fact tables by year (drops their FOREIGN KEY constraints)")
+    parser.add_argument("--integrity-dry-run", action="store_true",
+                        help="Report the dummy rows referential integrity enforcement would add, then stop")
+    parser.add_argument("--generate-only", action="store_true",
+                        help="Stop after generating the tables (skip the time dimension, integrity checks and MySQL load)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Generate all tables, streaming them to storage chunk by chunk
+    engine = SyntheticDataEngine(seed=args.seed, compact_keys=args.compact_keys)
+    storage = open_storage(args.format, args.output_dir)
+    if args.workers == 1:
+        generate_tables(args.tables, args.rows, args.chunk_size, engine, storage)
+    else:
+        generate_tables_parallel(args.tables, args.rows, args.chunk_size, engine, storage, args.workers or None)
+    if args.generate_only:
+        return
+
+    # Build (or update) the time dimension from the tables just generated before loading the
+    # datasets, so that they hold the current dimension rather than the previous run's
+    time_dimension = generate_sample_time_datasets(args.incremental_time_dimension, storage)
+
+    datasets = load_datasets(storage)
+    check_time_dimension_loaded(datasets, time_dimension)
+    time_dimension_rows = len(datasets.get("Time_Dimension", ()))
+
+    #dummy_values
+    add_dummy_primary_keys(datasets, primary_keys)
+
+    # Enforce referential integrity
+    enforce_foreign_key_integrity(datasets, relationships, dry_run=args.integrity_dry_run)
+    if args.integrity_dry_run:
+        return
+
+    # Replace the natural keys by compact integer keys
+    key_maps = {}
+    if args.surrogate_keys:
+        key_maps = apply_surrogate_keys(datasets, relationships, args.key_dir)
+
+    # Save updated datasets. The time dimension CSV file belongs to generate_sample_time_datasets
+    # (incremental updates append to it), so only the dummy rows added to it are appended, unless
+    # its keys were all replaced by surrogate keys
+    for table_name, df in datasets.items():
+        if table_name == "Time_Dimension" and storage.format == "csv" and not args.surrogate_keys:
+            if len(df) > time_dimension_rows:
+                storage.write(table_name, df.iloc[time_dimension_rows:], append=True)
+            continue
+        storage.write(table_name, df)
+
+    check_all_foreign_keys(datasets, relationships)
+
+    # Create the database and tables
+    create_database_and_tables(surrogate_keys=args.surrogate_keys, partition_facts=args.partition_facts,
+                               key_dtypes={domain: key_map.dtype for domain, key_map in key_maps.items()})
+
+    # Process all CSV files in the same directory
+    process_csv_files_in_same_directory(storage, args.load_method, args.load_workers, args.incremental_load)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
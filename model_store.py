@@ -0,0 +1,131 @@
+"""
+Saved models of model_training.py.
+
+A model directory holds one <name>.joblib file per fitted estimator (scaler, pca, dbscan,
+isolation_forest) and a metadata.json describing them: the features they were fitted on, in
+order, a fingerprint of the training data, the versions of the libraries that fitted them and
+the format version of the directory. The joblib files are not compressed, so their arrays are
+memory-mapped on load instead of being read and copied, and a consumer loads only the models it
+needs (the scoring service never touches DBSCAN's core samples).
+"""
+import hashlib
+import json
+import os
+import platform
+import shutil
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+
+MODEL_FORMAT_VERSION = 4  # 2: clustering.GridDBSCAN, 3: breadth-first CompiledIsolationForest, 4: DBSCAN on the PCA projection
+DEFAULT_MODEL_DIR = os.path.join("models", "fraud_detection")
+METADATA_FILE = "metadata.json"
+
+
+def library_versions():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scikit-learn": sklearn.__version__,
+        "joblib": joblib.__version__
+    }
+
+
+def data_fingerprint(df):
+    """Return a hash of the values of a DataFrame, to tell whether models were fitted on it."""
+    return hashlib.sha1(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()
+
+
+def save_models(models, features, model_dir=DEFAULT_MODEL_DIR, **metadata):
+    """
+    Save fitted models and their metadata, replacing the directory's previous models.
+
+    Args:
+        models (dict): Name -> fitted estimator.
+        features (list): Names of the features the models were fitted on, in order.
+        model_dir (str): Directory to save to.
+        **metadata: Extra JSON-serializable entries of metadata.json (e.g. training_rows).
+
+    Returns:
+        dict: The metadata written.
+    """
+    # Written next to the directory first and swapped in at the end, so a reader never sees a
+    # mix of old and new models
+    staging_dir = model_dir.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    for name, model in models.items():
+        joblib.dump(model, os.path.join(staging_dir, f"{name}.joblib"))
+
+    metadata = {
+        "format_version": MODEL_FORMAT_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "features": list(features),
+        "models": {name: type(model).__name__ for name, model in models.items()},
+        "versions": library_versions(),
+        **metadata
+    }
+    with open(os.path.join(staging_dir, METADATA_FILE), "w") as f:
+        json.dump(metadata, f, indent=2)
+
+    shutil.rmtree(model_dir, ignore_errors=True)
+    os.replace(staging_dir, model_dir)
+    return metadata
+
+
+def load_metadata(model_dir=DEFAULT_MODEL_DIR):
+    """
+    Read the metadata of a model directory.
+
+    Raises:
+        FileNotFoundError: If the directory holds no saved models.
+        ValueError: If they were saved in another format version.
+    """
+    with open(os.path.join(model_dir, METADATA_FILE)) as f:
+        metadata = json.load(f)
+    if metadata.get("format_version") != MODEL_FORMAT_VERSION:
+        raise ValueError(
+            f"Models in '{model_dir}' have format version {metadata.get('format_version')}, "
+            f"expected {MODEL_FORMAT_VERSION}. Retrain them with model_training.py."
+        )
+    return metadata
+
+
+def load_models(model_dir=DEFAULT_MODEL_DIR, names=None, features=None, mmap_mode="r"):
+    """
+    Load saved models.
+
+    Args:
+        model_dir (str): Directory the models were saved to.
+        names (list): Models to load. Defaults to all of them.
+        features (list): Features the caller will pass the models, in order. Checked against
+            those the models were fitted on when given.
+        mmap_mode (str): Memory-map mode of the models' arrays, None to read them into memory.
+
+    Returns:
+        tuple: (dict of name -> model, metadata dict).
+
+    Raises:
+        ValueError: If the features differ from the saved ones.
+        KeyError: If one of the models was not saved.
+    """
+    metadata = load_metadata(model_dir)
+    if features is not None and list(features) != metadata["features"]:
+        raise ValueError(f"Models in '{model_dir}' were fitted on {metadata['features']}, not on {list(features)}")
+
+    saved_with = metadata["versions"].get("scikit-learn")
+    if saved_with != sklearn.__version__:
+        print(f"Warning: models in '{model_dir}' were saved with scikit-learn {saved_with}, "
+              f"running {sklearn.__version__}.")
+
+    names = list(metadata["models"]) if names is None else list(names)
+    for name in names:
+        if name not in metadata["models"]:
+            raise KeyError(f"No model '{name}' in '{model_dir}' (saved: {', '.join(metadata['models'])})")
+    models = {name: joblib.load(os.path.join(model_dir, f"{name}.joblib"), mmap_mode=mmap_mode) for name in names}
+    return models, metadata
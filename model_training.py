@@ -5,17 +5,85 @@ import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
-from sklearn.cluster import DBSCAN
 from sklearn.ensemble import IsolationForest
 from sklearn.decomposition import PCA
 
+from clustering import GridDBSCAN, k_distance_eps
+from compiled_forest import CompiledIsolationForest
+from features import FEATURE_COLUMNS, FEATURES_TABLE, build_features, load_feature_tables
+from model_store import DEFAULT_MODEL_DIR, data_fingerprint, load_models, save_models
+from out_of_core import DEFAULT_SAMPLE_ROWS, SETS, copy_to_csv, count_values, peak_rss_mb, stream_training_data
+from storage import open_storage
 
 
-# Load additional datasets
-social_media_logs = pd.read_csv('SocialMediaLogs.csv')
-accounts = pd.read_csv('Accounts.csv')
-subscribers = pd.read_csv('Subscribers.csv')
-transactions = pd.read_csv('Transactions.csv')
+# Storage the tables were generated to by main1.py ("csv" or "parquet")
+DATA_FORMAT = "csv"
+DATA_DIR = "."
+storage = open_storage(DATA_FORMAT, DATA_DIR)
+
+# Where the fitted models are saved (see model_store.py). With REUSE_SAVED_MODELS, models saved
+# by an earlier run on the same training data are loaded instead of being fitted again.
+MODEL_DIR = DEFAULT_MODEL_DIR
+REUSE_SAVED_MODELS = True
+
+# Rows each tree of the Isolation Forest is fitted on ("auto": min(256, rows), an int or a
+# fraction of the rows) and processes fitting the trees (-1: all cores). Score whole tables with
+# batch_scoring.py.
+ISOLATION_FOREST_MAX_SAMPLES = "auto"
+N_JOBS = -1
+
+# DBSCAN is fitted on the 2-D PCA projection of the scaled features (GridDBSCAN is made for low
+# dimensions) with eps chosen so that DBSCAN_CORE_QUANTILE of the training points are core points
+# (see clustering.k_distance_eps): a fixed eps that suits two features leaves every point of the
+# behavioural features isolated
+DBSCAN_MIN_SAMPLES = 5
+DBSCAN_CORE_QUANTILE = 0.95
+
+# Features the models are trained on: "behavioural" for the transaction and the aggregates of
+# its subscriber, account and agent over all the tables (see features.py, written to the
+# TransactionFeatures table for batch_scoring.py), "basic" for Transaction_amount and
+# Anomaly_score only
+FEATURE_SET = "behavioural"
+
+# Train out of core: read the training table one split at a time, fitting the scaler on all of
+# its training rows (partial_fit) and the other models on uniform samples of at most
+# OUT_OF_CORE_SAMPLE_ROWS rows of every set, so that memory stays bounded whatever the size of
+# the table (see out_of_core.py). The behavioural features are read from the TransactionFeatures
+# table, which must be built first (python features.py): building it holds the whole tables.
+OUT_OF_CORE = False
+OUT_OF_CORE_SAMPLE_ROWS = DEFAULT_SAMPLE_ROWS
+
+
+def fraud_label(df):
+    """
+    Label of the rows of a DataFrame: 1 = Fraud, 0 = Not Fraud.
+
+    Assumes a threshold on 'Anomaly_score' for demonstration purposes. Replace this with the
+    actual ground truth if available.
+    """
+    return (df['Anomaly_score'] > 0.8).astype(int).rename('fraud_label')
+
+
+def value_counts(table_name, columns):
+    """Rows of every combination of values of columns of a table, counted one split at a time out of core."""
+    if OUT_OF_CORE:
+        return count_values(storage, table_name, [columns])[tuple(columns)]
+    return storage.read(table_name, columns=columns).groupby(columns).size()
+
+
+if OUT_OF_CORE and FEATURE_SET == "behavioural" and not storage.exists(FEATURES_TABLE):
+    raise FileNotFoundError(f"Training out of core reads the behavioural features from the {FEATURES_TABLE} "
+                            f"table, build it first with python features.py")
+
+# Load the counts of the values plotted
+social_media_counts = value_counts('SocialMediaLogs', ['User_age', 'PostType'])
+account_counts = value_counts('Accounts', ['Account_user_age_group', 'Account_status'])
+subscriber_counts = value_counts('Subscribers', ['Subscriber_user_age', 'Subscriber_type'])
+if OUT_OF_CORE:
+    transaction_counts = count_values(storage, 'Transactions', ['Region', 'City'])
+else:
+    transactions = storage.read('Transactions', columns=['Region', 'City'])
+    transaction_counts = {column: transactions.groupby(column).size() for column in ['Region', 'City']}
 
 # Set the style for plots
 sns.set(style="whitegrid")
@@ -23,9 +91,10 @@ sns.set(style="whitegrid")
 # 1. **Social Media Activity vs. User Age**
 plt.figure(figsize=(10, 6))
 sns.histplot(
-    data=social_media_logs, 
+    data=social_media_counts.reset_index(name='Post Count'), 
     x='User_age', 
     hue='PostType', 
+    weights='Post Count', 
     multiple='stack', 
     bins=20, 
     palette='viridis'
@@ -40,9 +109,10 @@ plt.close()
 
 # 2. **Accounts by User Age**
 plt.figure(figsize=(10, 6))
-sns.countplot(
-    data=accounts, 
+sns.barplot(
+    data=account_counts.reset_index(name='Account Count'), 
     x='Account_user_age_group', 
+    y='Account Count', 
     hue='Account_status', 
     palette='Set2'
 )
@@ -58,9 +128,10 @@ plt.close()
 # 3. **Subscribers by User Age**
 plt.figure(figsize=(10, 6))
 sns.histplot(
-    data=subscribers, 
+    data=subscriber_counts.reset_index(name='Subscriber Count'), 
     x='Subscriber_user_age', 
     hue='Subscriber_type', 
+    weights='Subscriber Count', 
     multiple='stack', 
     bins=20, 
     palette='coolwarm'
@@ -74,7 +145,7 @@ plt.show()
 # 4. **Transactions Per Region**
 plt.figure(figsize=(10, 6))
 sns.barplot(
-    data=transactions.groupby('Region').size().reset_index(name='Transaction Count'),
+    data=transaction_counts['Region'].reset_index(name='Transaction Count'),
     x='Region', 
     y='Transaction Count', 
     palette='Blues_d'
@@ -90,7 +161,7 @@ plt.close()
 # 5. **Transactions Per City**
 plt.figure(figsize=(10, 6))
 sns.barplot(
-    data=transactions.groupby('City').size().reset_index(name='Transaction Count'),
+    data=transaction_counts['City'].reset_index(name='Transaction Count'),
     x='City', 
     y='Transaction Count', 
     palette='Oranges_d'
@@ -106,9 +177,10 @@ plt.close()
 # 1. **PostType vs. User Age (Social Media Logs)**
 plt.figure(figsize=(10, 6))
 sns.histplot(
-    data=social_media_logs, 
+    data=social_media_counts.reset_index(name='Post Count'), 
     x='User_age', 
     hue='PostType', 
+    weights='Post Count', 
     multiple='stack', 
     bins=20, 
     palette='viridis'
@@ -123,40 +195,84 @@ plt.savefig("PostType_vs_UserAge.png")
 plt.close()
 
 # Save processed social media data for further analysis
-social_media_logs.to_csv("SocialMediaLogs_Processed.csv", index=False)
+copy_to_csv(storage, 'SocialMediaLogs', "SocialMediaLogs_Processed.csv")
+
 
 
+if FEATURE_SET == "behavioural":
+    training_table = FEATURES_TABLE
+    feature_columns = FEATURE_COLUMNS
+else:
+    training_table = 'Transactions'
+    feature_columns = ['Transaction_amount', 'Anomaly_score']
 
-# Load data
-data = pd.read_csv('Transactions.csv')
+if OUT_OF_CORE:
+    # Stream the table: the scaler is fitted on all the training rows, the sets are samples
+    streamed_scaler, samples, _ = stream_training_data(
+        storage, training_table, feature_columns, fraud_label, OUT_OF_CORE_SAMPLE_ROWS
+    )
+    (X_train, y_train), (X_val, y_val), (X_test, y_test) = (samples[name] for name in SETS)
+else:
+    # Load data (only the columns used for training)
+    if FEATURE_SET == "behavioural":
+        data = build_features(load_feature_tables(storage))
+        storage.write(FEATURES_TABLE, data)
+    else:
+        data = storage.read('Transactions', columns=feature_columns)
 
-# Add a "fraud_label" column (if not already present) for demonstration purposes
-# Assuming a threshold on 'Anomaly_score' to classify fraud (1 = Fraud, 0 = Not Fraud)
-# Replace this with the actual ground truth if available.
-data['fraud_label'] = (data['Anomaly_score'] > 0.8).astype(int)
+    # Select features for training
+    features = data[feature_columns]
+    labels = fraud_label(data)
 
-# Select features for training
-features = data[['Transaction_amount', 'Anomaly_score']]  # Add other features as needed
-labels = data['fraud_label']
+    # Split data into train, validation, and test sets
+    X_train, X_temp, y_train, y_temp = train_test_split(features, labels, test_size=0.4, random_state=42)
+    X_val, X_test, y_val, y_test = train_test_split(X_temp, y_temp, test_size=0.5, random_state=42)
 
-# Split data into train, validation, and test sets
-X_train, X_temp, y_train, y_temp = train_test_split(features, labels, test_size=0.4, random_state=42)
-X_val, X_test, y_val, y_test = train_test_split(X_temp, y_temp, test_size=0.5, random_state=42)
+# Load the models fitted on this training data by an earlier run, if any
+training_fingerprint = data_fingerprint(X_train)
+saved_models = None
+if REUSE_SAVED_MODELS:
+    try:
+        saved_models, saved_metadata = load_models(
+            MODEL_DIR, names=["scaler", "pca", "dbscan", "isolation_forest", "compiled_isolation_forest"],
+            features=feature_columns
+        )
+        if saved_metadata.get("training_data") != training_fingerprint:
+            print("Saved models were fitted on other data, retraining.")
+            saved_models = None
+        else:
+            print(f"Reusing the models saved in {MODEL_DIR} on {saved_metadata['created']}")
+    except FileNotFoundError:
+        pass
+    except (ValueError, KeyError) as e:
+        print(f"Saved models cannot be reused ({e}), retraining.")
 
 # Scale the features
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
+if saved_models is not None:
+    scaler = saved_models["scaler"]
+    X_train_scaled = scaler.transform(X_train)
+elif OUT_OF_CORE:
+    # Already fitted on all the training rows while streaming the table
+    scaler = streamed_scaler
+    X_train_scaled = scaler.transform(X_train)
+else:
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
 X_val_scaled = scaler.transform(X_val)
 X_test_scaled = scaler.transform(X_test)
 
 # Convert scaled data back to DataFrame for easier handling
-X_train = pd.DataFrame(X_train_scaled, columns=features.columns)
-X_val = pd.DataFrame(X_val_scaled, columns=features.columns)
-X_test = pd.DataFrame(X_test_scaled, columns=features.columns)
+X_train = pd.DataFrame(X_train_scaled, columns=feature_columns)
+X_val = pd.DataFrame(X_val_scaled, columns=feature_columns)
+X_test = pd.DataFrame(X_test_scaled, columns=feature_columns)
 
 # Dimensionality reduction for visualization
-pca = PCA(n_components=2)
-features_2d = pca.fit_transform(X_train_scaled)
+if saved_models is not None:
+    pca = saved_models["pca"]
+    features_2d = pca.transform(X_train_scaled)
+else:
+    pca = PCA(n_components=2)
+    features_2d = pca.fit_transform(X_train_scaled)
 
 # Add 2D PCA results to a DataFrame for easier plotting
 plot_data = pd.DataFrame(features_2d, columns=['PCA1', 'PCA2'])
@@ -166,10 +282,15 @@ assert X_train.shape[0] == y_train.shape[0]
 assert X_val.shape[0] == y_val.shape[0]
 assert X_test.shape[0] == y_test.shape[0]
 
-# Train DBSCAN
-dbscan = DBSCAN(eps=0.5, min_samples=5)
-dbscan.fit(X_train)
-plot_data['DBSCAN_Cluster'] = dbscan.fit_predict(X_train_scaled)
+# Train DBSCAN on the PCA projection (once, with bounded memory, see clustering.py)
+if saved_models is not None:
+    dbscan = saved_models["dbscan"]
+else:
+    dbscan_eps = k_distance_eps(features_2d, DBSCAN_MIN_SAMPLES, DBSCAN_CORE_QUANTILE)
+    print(f"DBSCAN eps: {dbscan_eps:.4f}")
+    dbscan = GridDBSCAN(eps=dbscan_eps, min_samples=DBSCAN_MIN_SAMPLES)
+    dbscan.fit(features_2d)
+plot_data['DBSCAN_Cluster'] = dbscan.labels_
 
 plt.figure(figsize=(10, 6))
 sns.scatterplot(
@@ -187,13 +308,36 @@ plt.legend(title="Clusters")
 plt.savefig("DBSCAN_Visualization.png")
 plt.show()
 
-# DBSCAN Predictions
-dbscan_labels = dbscan.fit_predict(X_test)  # -1 = anomaly, 0+ = cluster
+# DBSCAN Predictions: test points join the cluster of their nearest core training point
+dbscan_labels = dbscan.predict(pca.transform(X_test_scaled))  # -1 = anomaly, 0+ = cluster
 dbscan_pred = (dbscan_labels == -1).astype(int)  # Convert -1 (anomalies) to 1 (fraud)
 
 # Train Isolation Forest
-isolation_forest = IsolationForest(n_estimators=100, contamination=0.05, random_state=42)
-isolation_forest.fit(X_train)
+if saved_models is not None:
+    isolation_forest = saved_models["isolation_forest"]
+else:
+    isolation_forest = IsolationForest(
+        n_estimators=100, contamination=0.05, max_samples=ISOLATION_FOREST_MAX_SAMPLES,
+        n_jobs=N_JOBS, random_state=42
+    )
+    isolation_forest.fit(X_train)
+
+    # Save the fitted models for later runs, and the scaler and forest compiled into flat arrays
+    # for the scoring service
+    save_models(
+        {
+            "scaler": scaler,
+            "pca": pca,
+            "dbscan": dbscan,
+            "isolation_forest": isolation_forest,
+            "compiled_isolation_forest": CompiledIsolationForest(isolation_forest, scaler)
+        },
+        feature_columns,
+        MODEL_DIR,
+        training_data=training_fingerprint,
+        training_rows=len(X_train)
+    )
+    print(f"Saved the models to {MODEL_DIR}")
 
 # Isolation Forest Predictions
 isolation_forest_pred = isolation_forest.predict(X_test)  # -1 = anomaly, 1 = normal
@@ -213,4 +357,6 @@ print("Confusion Matrix:")
 print(confusion_matrix(y_test, isolation_forest_pred))
 print("Classification Report:")
 print(classification_report(y_test, isolation_forest_pred, target_names=['Not Fraud', 'Fraud']))
-print(f"ROC-AUC Score: {roc_auc_score(y_test, isolation_forest_pred):.2f}")
\ No newline at end of file
+print(f"ROC-AUC Score: {roc_auc_score(y_test, isolation_forest_pred):.2f}")
+
+print(f"\nPeak memory: {peak_rss_mb():,.0f} MB")
\ No newline at end of file
@@ -0,0 +1,417 @@
+"""
+Bulk loading of DataFrames into the fraud_detection MySQL database.
+
+bulk_load streams a table in chunks to temporary tab-separated files and loads each of them
+with LOAD DATA LOCAL INFILE, with the table's keys and the unique/foreign key checks disabled
+for the duration of the load. When the server or the connection does not allow LOCAL INFILE,
+it falls back to multi-row INSERT statements. Both paths report their throughput in rows/s.
+
+The connection must be opened with allow_local_infile=True for LOAD DATA LOCAL INFILE, as
+connect() and create_pool() do, and the server must run with local_infile=ON.
+
+load_in_dependency_order loads several tables concurrently over a connection pool, starting a
+table only once the tables its foreign keys reference are loaded.
+
+upsert_load makes reloads idempotent and incremental: only the rows at or past a table's
+high-water mark (the latest timestamp loaded so far, kept in the load_watermarks table) are
+loaded into a temporary staging table, then merged with INSERT ... ON DUPLICATE KEY UPDATE.
+"""
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import mysql.connector
+from mysql.connector import pooling
+import numpy as np
+import pandas as pd
+from mysql.connector import Error
+
+
+MYSQL_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "",
+    "database": "fraud_detection"
+}
+
+DEFAULT_LOAD_CHUNK_SIZE = 100000
+DEFAULT_INSERT_ROWS = 1000
+MYSQL_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Characters with a meaning in LOAD DATA's default FIELDS/LINES format, and their escaped form
+TSV_ESCAPES = [("\\", "\\\\"), ("\t", "\\t"), ("\n", "\\n"), ("\r", "\\r")]
+TSV_SPECIAL_CHARS = r"[\\\t\n\r]"
+TSV_NULL = "\\N"
+
+
+WATERMARK_TABLE = "load_watermarks"
+
+DEFAULT_POOL_SIZE = 4
+MAX_ALLOWED_PACKET = 67108864  # 64MB
+
+
+def connect(**overrides):
+    """Open a connection to the fraud_detection database allowing LOAD DATA LOCAL INFILE."""
+    return mysql.connector.connect(**{**MYSQL_CONFIG, "allow_local_infile": True, **overrides})
+
+
+def create_pool(pool_size=DEFAULT_POOL_SIZE, **overrides):
+    """
+    Create a pool of connections to the fraud_detection database allowing LOAD DATA LOCAL INFILE.
+
+    max_allowed_packet is raised once beforehand, the global value only applying to connections
+    opened after it is set.
+
+    Args:
+        pool_size (int): Number of pooled connections (at most 32).
+        overrides: Connection settings replacing the ones of MYSQL_CONFIG.
+    """
+    connection = connect(**overrides)
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"SET GLOBAL max_allowed_packet={MAX_ALLOWED_PACKET}")
+        cursor.close()
+    except Error as config_error:
+        print(f"Warning: Could not set max_allowed_packet: {config_error}")
+    finally:
+        connection.close()
+    return pooling.MySQLConnectionPool(
+        pool_name="fraud_detection",
+        pool_size=pool_size,
+        **{**MYSQL_CONFIG, "allow_local_infile": True, **overrides}
+    )
+
+
+def table_dependencies(relationships, table_names=None):
+    """
+    Return the tables each table references through its foreign keys.
+
+    Args:
+        relationships (list): Dicts with primary_table and foreign_table entries.
+        table_names (list): Tables to return the dependencies of, matched case-insensitively
+            with the relationships (e.g. "time_dimension" and "Time_Dimension"). Defaults to the
+            tables of the relationships.
+
+    Returns:
+        dict: Table name -> set of the table names it depends on, restricted to table_names.
+    """
+    if table_names is None:
+        table_names = list(dict.fromkeys(
+            table for rel in relationships for table in (rel["primary_table"], rel["foreign_table"])
+        ))
+    names = {table.lower(): table for table in table_names}
+    dependencies = {table: set() for table in table_names}
+    for rel in relationships:
+        primary = names.get(rel["primary_table"].lower())
+        foreign = names.get(rel["foreign_table"].lower())
+        if primary and foreign and primary != foreign:
+            dependencies[foreign].add(primary)
+    return dependencies
+
+
+def load_in_dependency_order(tasks, dependencies, workers=DEFAULT_POOL_SIZE):
+    """
+    Run one load task per table on a thread pool, each once the tables it depends on are done.
+
+    Independent tables are loaded concurrently, so with the fraud_detection relationships
+    Time_Dimension is loaded first, then Accounts, Subscribers, Agents and the other tables only
+    referencing it, Transactions once its dimensions are in and CryptoLedgers last.
+
+    Args:
+        tasks (dict): Table name -> callable loading it. Exceptions are reported and do not stop
+            the other tables.
+        dependencies (dict): Table name -> set of the table names it depends on (see table_dependencies).
+        workers (int): Tables loaded at the same time, at most the size of the connection pool used.
+
+    Returns:
+        dict: Table name -> seconds spent loading it.
+    """
+    pending = {table: set(dependencies.get(table, ())) & set(tasks) for table in tasks}
+    timings = {}
+    start_time = time.perf_counter()
+
+    def timed(table):
+        task_start = time.perf_counter()
+        tasks[table]()
+        return time.perf_counter() - task_start
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = {}
+        while pending or running:
+            ready = [table for table, waiting in pending.items() if not waiting]
+            if not ready and not running:
+                # Circular dependencies, load the remaining tables regardless
+                print(f"Warning: circular dependencies between {sorted(pending)}, loading them in any order")
+                ready = list(pending)
+            for table in ready:
+                del pending[table]
+                running[executor.submit(timed, table)] = table
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                table = running.pop(future)
+                try:
+                    timings[table] = future.result()
+                except Exception as e:
+                    print(f"Error loading {table}: {e}")
+                for waiting in pending.values():
+                    waiting.discard(table)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Loaded {len(timings)}/{len(tasks)} tables in {elapsed:.2f}s "
+          f"({sum(timings.values()):.2f}s of table loads with {workers} workers)")
+    return timings
+
+
+def tsv_column(values):
+    """
+    Format one column in the text format LOAD DATA reads by default.
+
+    Args:
+        values (pd.Series): Column to format.
+
+    Returns:
+        list: The formatted values, NULLs written as \\N.
+    """
+    missing = values.isna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(values):
+        text = values.dt.strftime(MYSQL_DATETIME_FORMAT).tolist()
+    elif pd.api.types.is_bool_dtype(values):
+        text = values.astype(np.int8).astype(str).tolist()
+    elif pd.api.types.is_numeric_dtype(values):
+        text = list(map(str, values.tolist()))
+    else:
+        text = values.astype(str)
+        if text.str.contains(TSV_SPECIAL_CHARS, regex=True).any():
+            for char, escaped in TSV_ESCAPES:
+                text = text.str.replace(char, escaped, regex=False)
+        text = text.tolist()
+    if missing.any():
+        for i in np.flatnonzero(missing):
+            text[i] = TSV_NULL
+    return text
+
+
+def write_tsv(dataframe, path):
+    """Write a DataFrame to a tab-separated file LOAD DATA can read with its default options."""
+    columns = [tsv_column(dataframe[col]) for col in dataframe.columns]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.writelines(line + "\n" for line in map("\t".join, zip(*columns)))
+
+
+def load_data_infile(connection, table_name, dataframe, chunk_size=DEFAULT_LOAD_CHUNK_SIZE, tmp_dir=None):
+    """
+    Load a DataFrame with LOAD DATA LOCAL INFILE, one temporary TSV file per chunk.
+
+    Keys are disabled (ALTER TABLE ... DISABLE KEYS) and unique and foreign key checks turned
+    off for the session while loading, then restored.
+
+    Args:
+        connection: Connection opened with allow_local_infile=True.
+        table_name (str): Table to load into.
+        dataframe (pd.DataFrame): Rows to load, its columns named after the table's.
+        chunk_size (int): Rows written to each temporary file.
+        tmp_dir (str): Directory of the temporary files. Defaults to the system's.
+
+    Returns:
+        int: Number of rows loaded.
+    """
+    columns = ", ".join(f"`{col}`" for col in dataframe.columns)
+    cursor = connection.cursor()
+    cursor.execute("SET SESSION unique_checks = 0, foreign_key_checks = 0")
+    cursor.execute(f"ALTER TABLE `{table_name}` DISABLE KEYS")
+    rows = 0
+    try:
+        for start in range(0, len(dataframe), chunk_size):
+            chunk = dataframe.iloc[start:start + chunk_size]
+            fd, path = tempfile.mkstemp(prefix=f"{table_name}_", suffix=".tsv", dir=tmp_dir)
+            os.close(fd)
+            try:
+                write_tsv(chunk, path)
+                cursor.execute(
+                    f"LOAD DATA LOCAL INFILE '{path.replace(os.sep, '/')}' INTO TABLE `{table_name}` "
+                    f"CHARACTER SET utf8mb4 ({columns})"
+                )
+                rows += cursor.rowcount
+            finally:
+                os.remove(path)
+        connection.commit()
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.execute(f"ALTER TABLE `{table_name}` ENABLE KEYS")
+        cursor.execute("SET SESSION unique_checks = 1, foreign_key_checks = 1")
+        cursor.close()
+    return rows
+
+
+def insert_rows(connection, table_name, dataframe, rows_per_statement=DEFAULT_INSERT_ROWS):
+    """
+    Load a DataFrame with multi-row INSERT statements, committing once at the end.
+
+    Args:
+        connection: Open connection.
+        table_name (str): Table to load into.
+        dataframe (pd.DataFrame): Rows to load, its columns named after the table's.
+        rows_per_statement (int): Rows per INSERT statement.
+
+    Returns:
+        int: Number of rows inserted.
+    """
+    columns = ", ".join(f"`{col}`" for col in dataframe.columns)
+    row_placeholder = "(" + ", ".join(["%s"] * len(dataframe.columns)) + ")"
+    cursor = connection.cursor()
+    rows = 0
+    try:
+        for start in range(0, len(dataframe), rows_per_statement):
+            chunk = dataframe.iloc[start:start + rows_per_statement]
+            values = chunk.astype(object).where(chunk.notna(), None).to_numpy().ravel().tolist()
+            cursor.execute(
+                f"INSERT INTO `{table_name}` ({columns}) VALUES " + ", ".join([row_placeholder] * len(chunk)),
+                values
+            )
+            rows += len(chunk)
+        connection.commit()
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return rows
+
+
+def bulk_load(connection, table_name, dataframe, method="auto", chunk_size=DEFAULT_LOAD_CHUNK_SIZE):
+    """
+    Load a DataFrame into a table as fast as the server allows and report the throughput.
+
+    Args:
+        connection: Open connection, see connect().
+        table_name (str): Table to load into.
+        dataframe (pd.DataFrame): Rows to load, its columns named after the table's.
+        method (str): "load-data" for LOAD DATA LOCAL INFILE, "insert" for multi-row INSERTs,
+            "auto" to try LOAD DATA LOCAL INFILE and fall back to INSERTs if it is refused.
+        chunk_size (int): Rows per temporary file with LOAD DATA LOCAL INFILE.
+
+    Returns:
+        int: Number of rows loaded.
+    """
+    start_time = time.perf_counter()
+    used = method
+    if method in ("auto", "load-data"):
+        try:
+            rows = load_data_infile(connection, table_name, dataframe, chunk_size)
+            used = "load-data"
+        except Error as e:
+            if method == "load-data":
+                raise
+            print(f"Warning: LOAD DATA LOCAL INFILE failed for {table_name} ({e}), falling back to INSERT")
+            method = "insert"
+    if method == "insert":
+        rows = insert_rows(connection, table_name, dataframe)
+        used = "insert"
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Loaded {rows} rows into {table_name} with {used} in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+    return rows
+
+
+def ensure_watermark_table(cursor):
+    """Create the table keeping the high-water mark of every incrementally loaded table."""
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+            Table_Name VARCHAR(64) PRIMARY KEY,
+            Watermark_Column VARCHAR(64) NOT NULL,
+            High_Water DATETIME NOT NULL,
+            Updated_At TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def get_watermark(connection, table_name):
+    """Return the high-water mark of a table as a pd.Timestamp, or None if it was never loaded incrementally."""
+    cursor = connection.cursor()
+    try:
+        ensure_watermark_table(cursor)
+        cursor.execute(f"SELECT High_Water FROM {WATERMARK_TABLE} WHERE Table_Name = %s", (table_name,))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    return pd.Timestamp(row[0]) if row else None
+
+
+def upsert_load(connection, table_name, dataframe, watermark_column=None, method="auto"):
+    """
+    Load the new rows of a table, updating the rows whose primary key is already there.
+
+    Rows whose watermark_column is at or past the table's high-water mark, and rows where it is
+    missing or invalid (e.g. dummy rows), are bulk loaded into a temporary table with the table's
+    columns and merged into it with INSERT ... ON DUPLICATE KEY UPDATE. The high-water mark is moved forward
+    in the same transaction, so a failed load is retried in full by the next run, and loading
+    the same rows again changes nothing.
+
+    Args:
+        connection: Open connection, see connect().
+        table_name (str): Table to load into.
+        dataframe (pd.DataFrame): Rows of the table, its columns named after the table's.
+        watermark_column (str): Timestamp column tracking what was loaded. Every row is merged
+            when None.
+        method (str): How rows are loaded into the staging table, see bulk_load.
+
+    Returns:
+        int: Number of rows merged.
+    """
+    start_time = time.perf_counter()
+    high_water = new_high_water = None
+    if watermark_column is not None:
+        timestamps = dataframe[watermark_column]
+        if not pd.api.types.is_datetime64_any_dtype(timestamps):
+            timestamps = pd.to_datetime(timestamps, format=MYSQL_DATETIME_FORMAT, errors="coerce")
+        high_water = get_watermark(connection, table_name)
+        if high_water is not None:
+            keep = (timestamps >= high_water) | timestamps.isna()
+            dataframe, timestamps = dataframe[keep.to_numpy()], timestamps[keep]
+        new_high_water = timestamps.max()
+    if dataframe.empty:
+        print(f"{table_name} is up to date (high-water mark {high_water})")
+        return 0
+
+    staging_table = f"staging_{table_name}"
+    columns = ", ".join(f"`{col}`" for col in dataframe.columns)
+    updates = ", ".join(f"`{col}` = VALUES(`{col}`)" for col in dataframe.columns)
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS `{staging_table}`")
+        # Created from the table's columns rather than LIKE it: MySQL rejects temporary tables
+        # with partitions (ER_PARTITION_NO_TEMPORARY), and main1.py --partition-facts
+        # partitions the fact tables. The staging table needs no keys either.
+        cursor.execute(f"CREATE TEMPORARY TABLE `{staging_table}` SELECT * FROM `{table_name}` LIMIT 0")
+        bulk_load(connection, staging_table, dataframe, method)
+
+        cursor.execute(
+            f"INSERT INTO `{table_name}` ({columns}) SELECT {columns} FROM `{staging_table}` "
+            f"ON DUPLICATE KEY UPDATE {updates}"
+        )
+        # Affected rows count 1 per inserted row and 2 per updated row
+        affected = cursor.rowcount
+        if pd.notna(new_high_water):
+            cursor.execute(
+                f"INSERT INTO {WATERMARK_TABLE} (Table_Name, Watermark_Column, High_Water) VALUES (%s, %s, %s) "
+                f"ON DUPLICATE KEY UPDATE Watermark_Column = VALUES(Watermark_Column), "
+                f"High_Water = GREATEST(High_Water, VALUES(High_Water))",
+                (table_name, watermark_column, new_high_water.to_pydatetime())
+            )
+        connection.commit()
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS `{staging_table}`")
+        cursor.close()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Merged {len(dataframe)} rows into {table_name} ({affected} affected rows) in {elapsed:.2f}s, "
+          f"high-water mark {high_water} -> {new_high_water}")
+    return len(dataframe)
+
@@ -0,0 +1,163 @@
+"""
+Out-of-core training data for model_training.py: the scaler and samples of a table too large to load.
+
+model_training.py reads its whole training table and holds it several times over (the table,
+the training, validation and test DataFrames and their scaled arrays). With OUT_OF_CORE it calls
+stream_training_data instead, which reads the table one split at a time (byte ranges of the CSV
+file, files of the Parquet dataset, see storage.py):
+
+- Every row is assigned to the training, validation or test set at random (60/20/20, as
+  train_test_split does), from one generator seeded once, so that the sets of a table are the
+  same from run to run.
+- The StandardScaler is fitted on all the training rows with partial_fit, one split at a time,
+  which gives the means and variances fit() would give on the whole set.
+- Every set is sampled uniformly without replacement by a Reservoir of at most a given number of
+  rows. The Isolation Forest, PCA and DBSCAN are fitted on the training sample (with
+  max_samples="auto", every tree of the forest is fitted on 256 rows anyway) and the models are
+  evaluated on the test sample.
+
+Memory holds one split and the samples whatever the size of the table. peak_rss_mb reports the
+peak resident memory of the process. The behavioural features are read from the
+TransactionFeatures table, which features.py builds in memory from whole tables: it must exist
+before training out of core.
+
+The plots of model_training.py are drawn from the counts of the values plotted (count_values),
+and the tables it copies are copied one split at a time (copy_to_csv).
+"""
+import resource
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from storage import DEFAULT_SPLIT_BYTES
+
+
+SETS = ["train", "validation", "test"]
+SET_FRACTIONS = [0.6, 0.2, 0.2]
+DEFAULT_SAMPLE_ROWS = {"train": 100000, "validation": 50000, "test": 50000}
+
+
+def peak_rss_mb():
+    """Peak resident memory of the process so far, in MB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Reservoir:
+    """
+    Uniform sample without replacement of the rows of a stream of DataFrames.
+
+    Every row gets a random key and the rows with the `size` smallest keys are kept, in the order
+    they arrived: a sample of every row seen so far, whatever the number of rows.
+
+    Args:
+        size (int): Most rows kept.
+        rng (np.random.Generator): Generator of the keys.
+    """
+
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.rows = None
+        self.keys = np.empty(0)
+        self.seen = 0
+
+    def add(self, rows):
+        """Offer the rows of a DataFrame to the sample."""
+        keys = self.rng.random(len(rows))
+        self.seen += len(rows)
+        if self.rows is not None:
+            rows = pd.concat([self.rows, rows], ignore_index=True)
+            keys = np.concatenate([self.keys, keys])
+        if len(rows) > self.size:
+            kept = np.sort(np.argpartition(keys, self.size - 1)[:self.size]) if self.size else np.empty(0, dtype=np.int64)
+            rows, keys = rows.take(kept), keys[kept]
+        self.rows, self.keys = rows.reset_index(drop=True), keys
+
+    def sample(self):
+        return self.rows
+
+
+def stream_training_data(storage, table_name, feature_columns, label, sample_rows=None,
+                         split_bytes=DEFAULT_SPLIT_BYTES, random_state=42):
+    """
+    Fit a StandardScaler on the training rows of a table and sample its training, validation and
+    test sets, reading one split of the table at a time.
+
+    Args:
+        storage (CSVStorage | ParquetStorage): Storage of the table.
+        table_name (str): Table holding the features (and what the labels are computed from).
+        feature_columns (list): Columns the models are trained on.
+        label (callable): Called with the rows of a split, returns their labels (array-like).
+        sample_rows (dict): Set name (SETS) -> most rows of its sample, DEFAULT_SAMPLE_ROWS by default.
+        split_bytes (int): Approximate size of the CSV splits read at once.
+        random_state (int): Seed of the assignment of the rows to sets and of the samples.
+
+    Returns:
+        tuple: (scaler, samples, rows): the StandardScaler fitted on all the training rows, set
+        name -> (features, labels) of its sample as a DataFrame of the feature columns and a
+        Series, and set name -> number of rows of the table in the set.
+    """
+    sample_rows = {**DEFAULT_SAMPLE_ROWS, **(sample_rows or {})}
+    rng = np.random.default_rng(random_state)
+    reservoirs = {name: Reservoir(sample_rows[name], rng) for name in SETS}
+    scaler = StandardScaler()
+    bounds = np.cumsum(SET_FRACTIONS)[:-1]
+
+    start_time = time.time()
+    splits = storage.splits(table_name, split_bytes) if storage.format == "csv" else storage.splits(table_name)
+    for split in splits:
+        df = storage.read_split(table_name, split, columns=feature_columns)
+        df = df.assign(label=np.asarray(label(df)))
+        assigned = np.searchsorted(bounds, rng.random(len(df)), side="right")
+        for index, name in enumerate(SETS):
+            rows = df[assigned == index]
+            if len(rows) == 0:
+                continue
+            if name == "train":
+                scaler.partial_fit(rows[feature_columns])
+            reservoirs[name].add(rows)
+        del df
+
+    samples = {}
+    for name, reservoir in reservoirs.items():
+        sample = reservoir.sample()
+        if sample is None:
+            raise ValueError(f"Table '{table_name}' has no rows in the {name} set.")
+        samples[name] = (sample[feature_columns], sample["label"].rename(None))
+    rows = {name: reservoir.seen for name, reservoir in reservoirs.items()}
+    print(f"Streamed {sum(rows.values())} rows of {table_name} in {len(splits)} splits in "
+          f"{time.time() - start_time:.2f} s: scaler fitted on {rows['train']} training rows, samples of "
+          + ", ".join(f"{len(samples[name][0])} {name}" for name in SETS)
+          + f" rows; peak memory {peak_rss_mb():,.0f} MB")
+    return scaler, samples, rows
+
+
+def count_values(storage, table_name, columns, split_bytes=DEFAULT_SPLIT_BYTES):
+    """
+    Count the rows of every value of columns of a table, one split at a time.
+
+    Args:
+        columns (list): Columns, or lists of columns whose combinations of values are counted.
+
+    Returns:
+        dict: Column (tuple of the columns for a list) -> pd.Series of the number of rows of
+        every value, indexed (and sorted) by value like DataFrame.groupby(column).size().
+    """
+    groups = {tuple(column) if isinstance(column, list) else column: column for column in columns}
+    read = list(dict.fromkeys(name for column in columns for name in (column if isinstance(column, list) else [column])))
+    counts = {key: pd.DataFrame(columns=read).groupby(group).size() for key, group in groups.items()}
+    splits = storage.splits(table_name, split_bytes) if storage.format == "csv" else storage.splits(table_name)
+    for split in splits:
+        df = storage.read_split(table_name, split, columns=read)
+        for key, group in groups.items():
+            counts[key] = counts[key].add(df.groupby(group).size(), fill_value=0)
+    return {key: values.astype(np.int64).sort_index().rename(None) for key, values in counts.items()}
+
+
+def copy_to_csv(storage, table_name, path, split_bytes=DEFAULT_SPLIT_BYTES):
+    """Write a table to a CSV file, one split at a time."""
+    splits = storage.splits(table_name, split_bytes) if storage.format == "csv" else storage.splits(table_name)
+    for index, split in enumerate(splits):
+        storage.read_split(table_name, split).to_csv(path, mode="a" if index else "w", header=not index, index=False)
@@ -0,0 +1,465 @@
+"""
+Real-time scoring of transactions with the Isolation Forest saved by model_training.py.
+
+The service loads the scaler and forest once and listens on a TCP socket for newline-delimited
+JSON: every line is a transaction with the columns of the Transactions table, answered by one
+line {"Transaction_ID", "score", "is_anomaly"} in the order the transactions were sent on that
+connection. A line {"command": "stats"} returns the latency and batch size statistics instead.
+Transactions that cannot be scored are answered by {"error"}, without failing the others.
+
+Models fitted on columns of Transactions only read their features from the transactions. The
+behavioural features of features.py are built by TransactionFeaturizer from the entity profiles
+of the tables of --data-dir, loaded at start up, as streaming.py does.
+
+Transactions received at the same time, on any connection, are scored together: once the event
+loop has handed all the data it received to the connections (or after --max-delay-ms, or as soon
+as --max-batch are pending), the batcher scores them with one vectorized call of
+CompiledIsolationForest, which gives the same scores as IsolationForest.decision_function
+without its ~10 ms of overhead per call. Connections stop reading while their responses are not
+being read by the client.
+
+Usage:
+    python scoring_service.py [--model models/fraud_detection] [--port 8765] [--data-dir .]
+    python scoring_service.py --benchmark 10000 [--concurrency 32]
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from features import (FEATURE_COLUMNS, FEATURE_TABLE_COLUMNS, NO_PREVIOUS_TRANSACTION_SECONDS, NO_SIM_AGE_DAYS,
+                      SECONDS_PER_DAY, entity_profiles, load_feature_tables)
+from model_store import DEFAULT_MODEL_DIR, load_models
+from storage import open_storage
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH = 256
+DEFAULT_MAX_DELAY_MS = 0.0
+LISTEN_BACKLOG = 1024
+LATENCY_WINDOW = 100000  # Most recent latencies kept for the percentiles
+TRANSACTION_COLUMNS = FEATURE_TABLE_COLUMNS["Transactions"]
+SCALAR_TYPES = (str, int, float, bool, type(None))  # Values of JSON other than objects and arrays
+# Columns of the subscriber profiles features.transaction_features reads but does not return
+SUBSCRIBER_PROFILE_COLUMNS = ["Mean_amount", "Last_transaction", "Last_activation"]
+EPOCH = datetime(1970, 1, 1)
+
+
+def load_model(model_dir=DEFAULT_MODEL_DIR):
+    """
+    Load the scaler and Isolation Forest saved by model_training.py, compiled into flat arrays.
+
+    Returns:
+        tuple: (feature names, CompiledIsolationForest including the scaler).
+    """
+    models, metadata = load_models(model_dir, names=["compiled_isolation_forest"])
+    return metadata["features"], models["compiled_isolation_forest"]
+
+
+def number(value):
+    """A value as a float, NaN if it is not a number (features.numeric of one value)."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def timestamp_seconds(value):
+    """An ISO 8601 timestamp as float seconds, NaN if it is not a timestamp (features.seconds of one value)."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return math.nan
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return float((parsed - EPOCH) // timedelta(seconds=1))
+
+
+class TransactionFeaturizer:
+    """
+    Build the features of a model from transactions with the columns of the Transactions table.
+
+    The behavioural features of a transaction are built as it is submitted, with the same values
+    as features.transaction_features: the rows of every profile are a float64 matrix, and the
+    entity's row is found by a dict lookup of its key, which takes microseconds where building a
+    DataFrame of every batch takes milliseconds.
+
+    Args:
+        features (list): Names of the model's features, in order.
+        profiles (dict): Entity profiles of features.entity_profiles, needed when the features
+            are not all columns of Transactions.
+
+    Raises:
+        ValueError: If the model uses features neither in Transactions nor built by features.py,
+            or needs profiles that were not given.
+    """
+
+    def __init__(self, features, profiles=None):
+        self.features = list(features)
+        self.raw = all(feature in TRANSACTION_COLUMNS for feature in self.features)
+        if not self.raw:
+            unknown = [feature for feature in self.features if feature not in FEATURE_COLUMNS]
+            if unknown:
+                raise ValueError(f"The model uses features not built by features.py: {unknown}")
+            if profiles is None:
+                raise ValueError("The model uses the behavioural features, which need the entity profiles of the tables")
+        self.required = self.features if self.raw else TRANSACTION_COLUMNS
+        self.last_seen = {}  # Subscriber_ID -> time of their latest transaction, in seconds
+        if self.raw:
+            return
+        # row() fills the FEATURE_COLUMNS followed by the SUBSCRIBER_PROFILE_COLUMNS
+        self.position = {column: i for i, column in enumerate(FEATURE_COLUMNS + SUBSCRIBER_PROFILE_COLUMNS)}
+        self.feature_positions = np.array([self.position[feature] for feature in self.features])
+        self.profiles = []  # (key column, key -> row, rows with a last row of NaN for unknown keys, positions)
+        for key, profile in profiles.items():
+            values = np.vstack([profile.to_numpy(dtype=np.float64), np.full(len(profile.columns), np.nan)])
+            self.profiles.append((key, dict(zip(profile.index.tolist(), range(len(profile)))), values,
+                                  np.array([self.position[column] for column in profile.columns])))
+
+    def row(self, transaction):
+        """
+        Check a transaction and return what matrix() needs of it.
+
+        Raises:
+            KeyError: If the transaction lacks one of the required columns.
+            TypeError: If the value of one of the required columns is an object or an array.
+            ValueError: If one of the model's features read from it is not a number.
+        """
+        missing = [column for column in self.required if column not in transaction]
+        if missing:
+            raise KeyError(f"missing columns {missing}")
+        not_scalars = [column for column in self.required if not isinstance(transaction[column], SCALAR_TYPES)]
+        if not_scalars:
+            raise TypeError(f"values of columns {not_scalars} are not scalars")
+        if self.raw:
+            return [float(transaction[feature]) for feature in self.features]
+
+        position = self.position
+        values = np.full(len(position), np.nan)
+        for key, rows, profile, positions in self.profiles:
+            values[positions] = profile[rows.get(transaction[key], -1)]
+        amount = number(transaction["Transaction_amount"])
+        seconds = timestamp_seconds(transaction["Time"])
+        values[position["Transaction_amount"]] = amount
+        values[position["Anomaly_score"]] = number(transaction["Anomaly_score"])
+        values[position["Hour"]] = seconds % SECONDS_PER_DAY // 3600
+        values[position["Failed"]] = transaction["Transaction_status"] == "failed"
+
+        # Time since the subscriber's previous transaction, scored earlier or in the tables
+        since_previous = math.nan
+        subscriber = transaction["Subscriber_ID"]
+        if not pd.isna(subscriber):
+            previous = self.last_seen.get(subscriber, values[position["Last_transaction"]])
+            since_previous = seconds - previous
+            if not math.isnan(seconds):
+                self.last_seen[subscriber] = max(seconds, self.last_seen.get(subscriber, seconds))
+        if math.isnan(since_previous):
+            since_previous = NO_PREVIOUS_TRANSACTION_SECONDS
+        values[position["Subscriber_log_seconds_since_previous"]] = math.log1p(max(since_previous, 0))
+
+        mean_amount = values[position["Mean_amount"]]
+        values[position["Amount_to_subscriber_mean"]] = amount / mean_amount if mean_amount > 0 else 0
+        sim_age_days = (seconds - values[position["Last_activation"]]) / SECONDS_PER_DAY
+        values[position["SIM_age_days"]] = NO_SIM_AGE_DAYS if math.isnan(sim_age_days) else sim_age_days
+        # Missing values are 0 and the features rounded to float32, as those of the tables are
+        features = values[self.feature_positions]
+        features[np.isnan(features)] = 0
+        return features.astype(np.float32)
+
+    def matrix(self, rows):
+        """Return the features of the rows returned by row(), as a float64 matrix."""
+        return np.array(rows, dtype=np.float64)
+
+
+def load_featurizer(features, storage):
+    """Create the TransactionFeaturizer of a model, loading the entity profiles only if it needs them."""
+    if all(feature in TRANSACTION_COLUMNS for feature in features):
+        return TransactionFeaturizer(features)
+    start_time = time.time()
+    profiles = entity_profiles(load_feature_tables(storage))
+    print(f"Loaded {sum(len(profile) for profile in profiles.values())} entity profiles in "
+          f"{time.time() - start_time:.2f} s")
+    return TransactionFeaturizer(features, profiles)
+
+
+class LatencyStats:
+    """Latencies and batch sizes of the most recent requests."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+
+    def summary(self):
+        latencies = np.array(self.latencies) * 1000
+        batch_sizes = np.array(self.batch_sizes)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "batches": len(batch_sizes),
+            "mean_batch_size": round(float(batch_sizes.mean()), 2) if len(batch_sizes) else 0,
+            "max_batch_size": int(batch_sizes.max()) if len(batch_sizes) else 0,
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3) if len(latencies) else None,
+            "max_ms": round(float(latencies.max()), 3) if len(latencies) else None
+        }
+
+
+class MicroBatcher:
+    """
+    Collect the transactions submitted from all connections and score them in batches.
+
+    Args:
+        model (CompiledIsolationForest): Model scoring rows of features.
+        featurizer (TransactionFeaturizer): Builds the model's features of the transactions.
+        max_batch (int): Most transactions scored in one call.
+        max_delay_ms (float): Longest time the first transaction of a batch waits for others.
+            With 0, a batch holds what was received during one iteration of the event loop.
+        stats (LatencyStats): Where batch sizes and latencies are recorded.
+    """
+
+    def __init__(self, model, featurizer, max_batch=DEFAULT_MAX_BATCH, max_delay_ms=DEFAULT_MAX_DELAY_MS, stats=None):
+        self.model = model
+        self.featurizer = featurizer
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.stats = stats if stats is not None else LatencyStats()
+        self._rows = []
+        self._callbacks = []
+        self._submitted = []
+        self._scheduled = None
+
+    def submit(self, transaction, callback):
+        """
+        Queue a transaction for scoring.
+
+        Args:
+            transaction (dict): Transaction with the columns of the Transactions table.
+            callback (callable): Called with the decision function score of the transaction, or
+                with the exception raised building its features or scoring it.
+
+        Raises:
+            KeyError: If the transaction lacks one of the columns the features are built from.
+            TypeError: If the value of one of those columns is an object or an array.
+            ValueError: If one of the model's features read from it is not a number.
+        """
+        self._rows.append(self.featurizer.row(transaction))
+        self._callbacks.append(callback)
+        self._submitted.append(time.perf_counter())
+        if len(self._rows) >= self.max_batch:
+            self.flush()
+        elif self._scheduled is None:
+            loop = asyncio.get_running_loop()
+            self._scheduled = loop.call_later(self.max_delay, self.flush) if self.max_delay else loop.call_soon(self.flush)
+
+    def flush(self):
+        """Score the pending transactions."""
+        if self._scheduled is not None:
+            self._scheduled.cancel()
+            self._scheduled = None
+        if not self._rows:
+            return
+        rows, callbacks, submitted = self._rows, self._callbacks, self._submitted
+        self._rows, self._callbacks, self._submitted = [], [], []
+
+        scores = self.score(rows)
+        done = time.perf_counter()
+        self.stats.batch_sizes.append(len(rows))
+        self.stats.latencies.extend(done - start for start in submitted)
+        for callback, score in zip(callbacks, scores):
+            callback(score)
+
+    def score(self, rows):
+        """
+        Score rows returned by TransactionFeaturizer.row.
+
+        If the batch cannot be scored, its rows are scored one at a time so that only those at
+        fault fail and every connection gets its responses.
+
+        Returns:
+            list: Decision function score of every row, or the exception raised scoring it.
+        """
+        try:
+            return self.model.decision_function(self.featurizer.matrix(rows)).tolist()
+        except Exception as e:
+            if len(rows) == 1:
+                return [e]
+            return [self.score([row])[0] for row in rows]
+
+
+class ScoringProtocol(asyncio.Protocol):
+    """
+    One client connection. Responses wait in `pending` until those of the transactions sent
+    before them are ready, so they are written in the order of the requests.
+    """
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+        self.transport = None
+        self.buffer = b""
+        self.pending = deque()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        lines = (self.buffer + data).split(b"\n")
+        self.buffer = lines.pop()
+        for line in lines:
+            if line.strip():
+                self.handle_line(line)
+
+    def handle_line(self, line):
+        stats = self.batcher.stats
+        stats.requests += 1
+        slot = [None, None]  # Transaction_ID, response
+        self.pending.append(slot)
+        try:
+            transaction = json.loads(line)
+            if transaction.get("command") == "stats":
+                slot[1] = stats.summary()
+            else:
+                slot[0] = transaction.get("Transaction_ID")
+                self.batcher.submit(transaction, lambda score: self.respond(slot, score))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            stats.errors += 1
+            slot[1] = {"error": f"Invalid transaction: {e!r}"}
+        self.write_ready()
+
+    def respond(self, slot, score):
+        if isinstance(score, Exception):
+            self.batcher.stats.errors += 1
+            slot[1] = {"error": f"Could not score the transaction: {score!r}"}
+        else:
+            slot[1] = {"Transaction_ID": slot[0], "score": score, "is_anomaly": score < 0}
+        self.write_ready()
+
+    def write_ready(self):
+        """Write the responses that are ready and follow all the earlier ones."""
+        ready = []
+        while self.pending and self.pending[0][1] is not None:
+            ready.append(json.dumps(self.pending.popleft()[1]))
+        if ready and not self.transport.is_closing():
+            self.transport.write(("\n".join(ready) + "\n").encode())
+
+    # Stop reading requests while the client is not reading the responses
+    def pause_writing(self):
+        self.transport.pause_reading()
+
+    def resume_writing(self):
+        self.transport.resume_reading()
+
+
+async def start_server(batcher, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    loop = asyncio.get_running_loop()
+    return await loop.create_server(lambda: ScoringProtocol(batcher), host, port, backlog=LISTEN_BACKLOG)
+
+
+async def serve(storage, model_dir=DEFAULT_MODEL_DIR, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                max_batch=DEFAULT_MAX_BATCH, max_delay_ms=DEFAULT_MAX_DELAY_MS):
+    features, model = load_model(model_dir)
+    featurizer = load_featurizer(features, storage)
+    server = await start_server(MicroBatcher(model, featurizer, max_batch, max_delay_ms), host, port)
+    print(f"Scoring transactions on {host}:{port} with features {features}")
+    async with server:
+        await server.serve_forever()
+
+
+async def run_clients(port, lines, concurrency):
+    """Send lines from concurrent connections, one at a time each, and return their latencies."""
+    latencies = []
+
+    async def client(lines):
+        reader, writer = await asyncio.open_connection(DEFAULT_HOST, port)
+        for line in lines:
+            start = time.perf_counter()
+            writer.write(line)
+            await writer.drain()
+            await reader.readline()
+            latencies.append(time.perf_counter() - start)
+        writer.close()
+
+    await asyncio.gather(*(client(lines[i::concurrency]) for i in range(concurrency)))
+    return latencies
+
+
+def _run_clients(port, lines, concurrency):
+    return asyncio.run(run_clients(port, lines, concurrency))
+
+
+async def benchmark(transactions, storage, model_dir=DEFAULT_MODEL_DIR, concurrency=32,
+                    max_batch=DEFAULT_MAX_BATCH, max_delay_ms=DEFAULT_MAX_DELAY_MS):
+    """
+    Score transactions through a local server from concurrent clients, each sending one
+    transaction at a time, and print the end-to-end latencies seen by the clients. The clients
+    run in another process so that they do not slow the server down.
+    """
+    features, model = load_model(model_dir)
+    batcher = MicroBatcher(model, load_featurizer(features, storage), max_batch, max_delay_ms)
+    server = await start_server(batcher, DEFAULT_HOST, 0)
+    port = server.sockets[0].getsockname()[1]
+
+    lines = [(json.dumps(transaction) + "\n").encode() for transaction in transactions]
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        start = time.perf_counter()
+        async with server:
+            latencies = await asyncio.get_running_loop().run_in_executor(
+                executor, _run_clients, port, lines, concurrency
+            )
+        elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    errors = batcher.stats.errors
+    print(f"Sent {len(lines)} transactions from {concurrency} clients in {elapsed:.2f} s "
+          f"({len(lines) / elapsed:,.0f} transactions/s): {len(lines) - errors} scored, {errors} rejected")
+    print(f"Client latency: p50 {np.percentile(latencies, 50):.3f} ms, p99 {np.percentile(latencies, 99):.3f} ms, "
+          f"max {latencies.max():.3f} ms")
+    print(f"Server: {batcher.stats.summary()}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score transactions in real time with the saved Isolation Forest.")
+    parser.add_argument("--model", default=DEFAULT_MODEL_DIR,
+                        help="Directory of the models saved by model_training.py")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH,
+                        help="Most transactions scored together")
+    parser.add_argument("--max-delay-ms", type=float, default=DEFAULT_MAX_DELAY_MS,
+                        help="Longest a transaction waits for others to be scored with")
+    parser.add_argument("--benchmark", type=int, metavar="N", default=None,
+                        help="Instead of serving, score N transactions of --table through a local server")
+    parser.add_argument("--table", default="Transactions", help="Table of the transactions sent by the benchmark")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients of the benchmark")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                        help="Storage format of the tables")
+    parser.add_argument("--data-dir", default=".",
+                        help="Directory of the tables the behavioural features are built from, and read by the benchmark")
+    args = parser.parse_args(argv)
+    storage = open_storage(args.format, args.data_dir)
+
+    if args.benchmark is None:
+        try:
+            asyncio.run(serve(storage, args.model, args.host, args.port, args.max_batch, args.max_delay_ms))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    transactions = storage.read(args.table).head(args.benchmark)
+    transactions = json.loads(transactions.to_json(orient="records", date_format="iso"))
+    # Send the table's transactions again if it has fewer than N
+    transactions = [transactions[i % len(transactions)] for i in range(args.benchmark)]
+    asyncio.run(benchmark(transactions, storage, args.model, args.concurrency, args.max_batch, args.max_delay_ms))
+
+
+if __name__ == "__main__":
+    main()
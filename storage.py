@@ -0,0 +1,404 @@
+"""
+Storage backends for the fraud detection tables.
+
+CSVStorage keeps every table in a single <table>.csv file, as the pipeline always did.
+ParquetStorage keeps every table in a <table>/ directory of Parquet files, partitioned by
+Year (of the table's main timestamp) and Region for the fact tables. Parquet keeps the
+column dtypes, so loads skip parsing entirely, read only the requested columns and can skip
+whole partitions or row groups with filters.
+
+Both backends share the same interface: write (optionally appending), read (with optional
+column projection and pyarrow-style filters), columns, exists and clear. Use open_storage to pick one
+by name. Tables too large to read at once are processed split by split: splits lists
+independent parts of a table (byte ranges of a CSV file, files of a Parquet dataset) that
+read_split reads, so that worker processes can each read their own.
+"""
+import csv
+import io
+import os
+import shutil
+import uuid
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet support is optional
+    pa = None
+    pq = None
+
+
+# Timestamp column and partition columns of the Parquet datasets. Year and Month are derived
+# from the timestamp column, the rows are sorted by it and Month is stored in the files, so
+# filters on Month or on the timestamp skip row groups instead of directories. Month directories
+# would split every written chunk into ~120 files per region, since the generated rows are spread
+# over ten years. Derived columns are dropped again on read; tables without a timestamp column
+# (None) already have them. Small dimension tables are not partitioned, they are looked up by
+# key rather than scanned by time.
+PARQUET_PARTITIONING = {
+    "Transactions": ("Time", ["Year", "Region"]),
+    "CallLogs": ("Date_Time", ["Year", "Region"]),
+    "Messages": ("Time", ["Year", "Region"]),
+    "ISPTraffic": ("Time", ["Year", "Region"]),
+    "SocialMediaLogs": ("Time", ["Year", "Region"]),
+    "SupportLogs": ("Date_Issued", ["Year", "Region"]),
+    "CryptoLedgers": ("Timestamp", ["Year"]),
+    "SIMInfo": ("Activation_Date", ["Year"]),
+    "AppInfo": ("Date_Time", ["Year"]),
+    "AuditLogs": ("Action_Date", ["Year"]),
+    "Time_Dimension": (None, ["Year"])
+}
+DERIVED_COLUMNS = ("Year", "Month")
+DEFAULT_SPLIT_BYTES = 64 * 1024 * 1024
+SCAN_BLOCK_BYTES = 16 * 1024 * 1024  # Bytes of a CSV file scanned at once for row boundaries
+
+FILTER_OPERATORS = {
+    "=": lambda column, value: column == value,
+    "==": lambda column, value: column == value,
+    "!=": lambda column, value: column != value,
+    "<": lambda column, value: column < value,
+    "<=": lambda column, value: column <= value,
+    ">": lambda column, value: column > value,
+    ">=": lambda column, value: column >= value,
+    "in": lambda column, value: column.isin(value),
+    "not in": lambda column, value: ~column.isin(value)
+}
+
+
+def row_ends(data, in_quotes=False):
+    """
+    Find the line breaks of CSV data that end rows, leaving out those inside quoted values.
+
+    A line break ends a row when an even number of quotes precedes it (escaped quotes are
+    doubled, so they never change the parity): the parity of every byte is the running XOR of
+    the quote bytes, computed with NumPy one byte per byte of data.
+
+    Args:
+        data (bytes): CSV data starting at the beginning of a row, or inside a quoted value if
+            in_quotes.
+        in_quotes (bool): Whether data starts inside a quoted value (data following a block that
+            ended inside one).
+
+    Returns:
+        tuple: (ends, in_quotes): np.ndarray of the offsets just after the line breaks ending
+        rows, and whether data ends inside a quoted value.
+    """
+    chars = np.frombuffer(data, dtype=np.uint8)
+    quoted = np.bitwise_xor.accumulate((chars == ord('"')).view(np.uint8))
+    if in_quotes:
+        quoted ^= 1
+    ends = np.flatnonzero((chars == ord("\n")) & (quoted == 0)) + 1
+    return ends, bool(quoted[-1]) if len(quoted) else in_quotes
+
+
+def apply_filters(df, filters):
+    """
+    Keep the rows of a DataFrame matching pyarrow-style filters.
+
+    Args:
+        df (pd.DataFrame): Rows to filter.
+        filters (list): (column, operator, value) tuples, all of which must hold.
+
+    Returns:
+        pd.DataFrame: The matching rows.
+    """
+    if not filters:
+        return df
+    mask = pd.Series(True, index=df.index)
+    for column, operator, value in filters:
+        mask &= FILTER_OPERATORS[operator](df[column], value)
+    return df[mask]
+
+
+class CSVStorage:
+    """
+    Tables stored as <directory>/<table>.csv files.
+
+    Args:
+        directory (str): Directory holding the CSV files.
+    """
+
+    format = "csv"
+
+    def __init__(self, directory="."):
+        self.directory = directory
+
+    def path(self, table_name):
+        return os.path.join(self.directory, f"{table_name.lower().replace(' ', '_')}.csv")
+
+    def exists(self, table_name):
+        return os.path.exists(self.path(table_name))
+
+    def columns(self, table_name):
+        """Return the column names of a table, read from the header of its file."""
+        with open(self.path(table_name), newline="") as f:
+            return next(csv.reader(f))
+
+    def clear(self, table_name):
+        if self.exists(table_name):
+            os.remove(self.path(table_name))
+
+    def write(self, table_name, df, append=False, part=None):
+        """
+        Write a table, or append rows to it.
+
+        Args:
+            table_name (str): Name of the table.
+            df (pd.DataFrame): Rows to write.
+            append (bool): Append to the existing file instead of overwriting it.
+            part (int): Unused, accepted for compatibility with ParquetStorage.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        append = append and self.exists(table_name)
+        df.to_csv(self.path(table_name), mode="a" if append else "w", header=not append, index=False)
+
+    def read(self, table_name, columns=None, filters=None):
+        """
+        Read a table.
+
+        Args:
+            table_name (str): Name of the table.
+            columns (list): Columns to read. Defaults to all of them.
+            filters (list): (column, operator, value) tuples the rows must match. CSV files have
+                no statistics, so the filters are applied after parsing.
+
+        Returns:
+            pd.DataFrame: The table.
+        """
+        usecols = None
+        if columns is not None:
+            usecols = list(dict.fromkeys(list(columns) + [column for column, _, _ in filters or []]))
+        df = apply_filters(pd.read_csv(self.path(table_name), usecols=usecols), filters)
+        return df[list(columns)] if columns is not None else df
+
+    def splits(self, table_name, split_bytes=DEFAULT_SPLIT_BYTES):
+        """
+        Split a table into byte ranges of about split_bytes, ending at row boundaries.
+
+        Quoted values of some tables (addresses, message contents) hold line breaks, so the file
+        is scanned for the line breaks that end rows (see row_ends), SCAN_BLOCK_BYTES at a time.
+
+        Returns:
+            list: (start, end) byte offsets, the header excluded.
+        """
+        path = self.path(table_name)
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            start = position = len(f.readline())
+            in_quotes = False
+            splits = []
+            while True:
+                block = f.read(SCAN_BLOCK_BYTES)
+                if not block:
+                    break
+                ends, in_quotes = row_ends(block, in_quotes)
+                ends += position
+                position += len(block)
+                cut = np.searchsorted(ends, start + split_bytes)
+                while cut < len(ends):
+                    splits.append((start, int(ends[cut])))
+                    start = int(ends[cut])
+                    cut = np.searchsorted(ends, start + split_bytes)
+            if start < size:
+                splits.append((start, size))
+        return splits
+
+    def read_split(self, table_name, split, columns=None):
+        """
+        Read the rows of one of the table's splits.
+
+        Args:
+            table_name (str): Name of the table.
+            split (tuple): (start, end) byte offsets returned by splits().
+            columns (list): Columns to read. Defaults to all of them.
+
+        Returns:
+            pd.DataFrame: The rows.
+        """
+        start, end = split
+        with open(self.path(table_name), "rb") as f:
+            header = next(csv.reader([f.readline().decode()]))
+            f.seek(start)
+            data = f.read(end - start)
+        df = pd.read_csv(io.BytesIO(data), header=None, names=header, usecols=columns)
+        return df[list(columns)] if columns is not None else df
+
+
+class ParquetStorage:
+    """
+    Tables stored as <directory>/<table>/ Parquet datasets, partitioned as described in
+    PARQUET_PARTITIONING.
+
+    Args:
+        directory (str): Directory holding the datasets.
+        partitioning (dict): Table name -> (timestamp column, partition columns), defaults to
+            PARQUET_PARTITIONING.
+        max_partitions (int): Most partitions a single write may touch.
+    """
+
+    format = "parquet"
+
+    def __init__(self, directory=".", partitioning=None, max_partitions=10000):
+        if pq is None:
+            raise ImportError("ParquetStorage requires pyarrow (pip install pyarrow)")
+        self.directory = directory
+        self.partitioning = PARQUET_PARTITIONING if partitioning is None else partitioning
+        self.max_partitions = max_partitions
+
+    def path(self, table_name):
+        return os.path.join(self.directory, table_name.lower().replace(" ", "_"))
+
+    def exists(self, table_name):
+        return os.path.isdir(self.path(table_name))
+
+    def columns(self, table_name):
+        """Return the column names of a table, read from the schema of one of its files."""
+        derived = self._derived_columns(table_name)
+        return [col for col in self._written_types(self.splits(table_name)[0]) if col not in derived]
+
+    def clear(self, table_name):
+        if self.exists(table_name):
+            shutil.rmtree(self.path(table_name))
+
+    def _written_types(self, file):
+        """Return column name -> numpy type name of the DataFrame a Parquet file was written from."""
+        return {col["name"]: col["numpy_type"] for col in pq.read_schema(file).pandas_metadata["columns"]}
+
+    def _derived_columns(self, table_name):
+        """Columns derived from the table's timestamp column rather than stored in the table."""
+        time_col, _ = self.partitioning.get(table_name, (None, []))
+        return list(DERIVED_COLUMNS) if time_col is not None else []
+
+    def write(self, table_name, df, append=False, part=None):
+        """
+        Write a table, or add rows to it.
+
+        Args:
+            table_name (str): Name of the table.
+            df (pd.DataFrame): Rows to write.
+            append (bool): Add the rows to the existing dataset instead of replacing it.
+            part (int): Number used in the names of the files written, so that chunks written by
+                different processes never collide. A random one is used by default.
+        """
+        if not append:
+            self.clear(table_name)
+
+        time_col, partition_cols = self.partitioning.get(table_name, (None, []))
+        if time_col is not None:
+            timestamps = pd.to_datetime(df[time_col])
+            order = np.argsort(timestamps.to_numpy(), kind="stable")
+            df = df.iloc[order].assign(**{
+                col: getattr(timestamps.dt, col.lower()).to_numpy()[order]
+                for col in self._derived_columns(table_name)
+            })
+
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowTypeError, pa.ArrowInvalid):
+            # Columns mixing types (e.g. integer IDs next to the "dummy_..." keys added for
+            # referential integrity) are stored as strings, as they would be in a CSV file
+            mixed = [col for col in df.columns if df[col].dtype == object]
+            table = pa.Table.from_pandas(
+                df.assign(**{col: df[col].map(lambda value: value if pd.isna(value) else str(value)) for col in mixed}),
+                preserve_index=False
+            )
+
+        token = f"{part:06d}" if part is not None else uuid.uuid4().hex
+        pq.write_to_dataset(
+            table,
+            root_path=self.path(table_name),
+            partition_cols=partition_cols or None,
+            basename_template=f"part-{token}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            max_partitions=self.max_partitions
+        )
+
+    def read(self, table_name, columns=None, filters=None):
+        """
+        Read a table.
+
+        Args:
+            table_name (str): Name of the table.
+            columns (list): Columns to read. Defaults to all the columns of the table.
+            filters (list): (column, operator, value) tuples the rows must match. Filters on
+                partition columns (e.g. ("Year", ">=", 2024), ("Region", "=", "Littoral")) skip
+                whole directories, other filters (e.g. ("Month", "=", 3)) skip row groups using
+                their statistics.
+
+        Returns:
+            pd.DataFrame: The table, its rows grouped by partition and sorted by timestamp.
+        """
+        df = pd.read_parquet(self.path(table_name), columns=columns, filters=filters)
+
+        first_file = next(
+            os.path.join(root, name)
+            for root, _, files in sorted(os.walk(self.path(table_name)))
+            for name in sorted(files) if name.endswith(".parquet")
+        )
+        written = self._written_types(first_file)
+
+        # Partition values come back as the last columns with inferred dtypes, restore the dtype
+        # and position they were written with
+        _, partition_cols = self.partitioning.get(table_name, (None, []))
+        for col in partition_cols:
+            if col in df.columns:
+                values = df[col].astype(df[col].cat.categories.dtype)
+                df[col] = values.astype(str) if written[col] in ("object", "str") else values.astype(written[col])
+        if columns is None:
+            derived = self._derived_columns(table_name)
+            df = df[[col for col in written if col in df.columns and col not in derived]]
+        return df
+
+    def splits(self, table_name):
+        """Return the files of a table's dataset, each of which is read by read_split."""
+        return sorted(
+            os.path.join(root, name)
+            for root, _, files in os.walk(self.path(table_name))
+            for name in files if name.endswith(".parquet")
+        )
+
+    def read_split(self, table_name, split, columns=None):
+        """
+        Read the rows of one file of a table's dataset.
+
+        Args:
+            table_name (str): Name of the table.
+            split (str): Path of the file, one of those returned by splits().
+            columns (list): Columns to read. Defaults to all the columns of the table.
+
+        Returns:
+            pd.DataFrame: The rows, with the partition values of the file's directory.
+        """
+        _, partition_cols = self.partitioning.get(table_name, (None, []))
+        stored = None if columns is None else [col for col in columns if col not in partition_cols]
+        df = pd.read_parquet(split, columns=stored)
+
+        written = self._written_types(split)
+        directories = os.path.relpath(os.path.dirname(split), self.path(table_name)).split(os.sep)
+        values = dict(unquote(directory).split("=", 1) for directory in directories if "=" in directory)
+        for col in partition_cols:
+            if col in values and (columns is None or col in columns):
+                text = written[col] in ("object", "str")
+                df[col] = values[col] if text else np.dtype(written[col]).type(values[col])
+        if columns is not None:
+            return df[list(columns)]
+        derived = self._derived_columns(table_name)
+        return df[[col for col in written if col in df.columns and col not in derived]]
+
+
+def open_storage(data_format="csv", directory="."):
+    """
+    Return the storage backend for a format name.
+
+    Args:
+        data_format (str): "csv" or "parquet".
+        directory (str): Directory holding the tables.
+    """
+    if data_format == "csv":
+        return CSVStorage(directory)
+    if data_format == "parquet":
+        return ParquetStorage(directory)
+    raise ValueError(f"Unknown storage format '{data_format}'. Choose from 'csv' or 'parquet'.")
@@ -0,0 +1,399 @@
+"""
+Streaming ingestion and anomaly scoring of transactions.
+
+Transactions flow through asyncio stages connected by bounded queues:
+
+    source -> parse -> enrich -> score -> sink
+
+- source: tails an append-only CSV file of transactions (by default the Transactions table of
+  main1.py), or listens on a local socket for newline-delimited JSON transactions, standing in
+  for a message broker. Bytes are read as they arrive and cut into batches of whole lines.
+- parse: turns a batch of lines into a DataFrame.
+- enrich: joins attributes of the transactions' accounts, agents, subscribers and times from
+  the LRU caches of dimension_cache.py (preloaded from the tables or MySQL), and builds the model's features from the entity profiles of
+  features.py, keeping every subscriber's latest transaction time up to date.
+- score: scores the batch with the compiled Isolation Forest saved by model_training.py, in one
+  vectorized call.
+- sink: appends the scores and attributes to the StreamingScores table, SINK_ROWS at a time.
+
+Every queue holds at most --queue-size batches. When a stage falls behind, the stages before it
+wait to put their batches and the source stops reading, so the file is read (or the socket's
+TCP window filled) only as fast as transactions are scored. Every stage records its time per
+batch, and the sink records the latency of every transaction from being read to reaching it;
+the statistics are printed every --stats-interval seconds and when the stream ends.
+
+Usage:
+    python streaming.py [--file transactions.csv] [--follow] [--format csv] [--data-dir .]
+    python streaming.py --listen 8766
+"""
+import argparse
+import asyncio
+import csv
+import functools
+import io
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from dimension_cache import DEFAULT_MAX_BYTES, from_mysql, from_storage
+from features import FEATURE_COLUMNS, entity_profiles, load_feature_tables, transaction_features
+from model_store import DEFAULT_MODEL_DIR
+from mysql_loader import connect
+from scoring_service import DEFAULT_HOST, LISTEN_BACKLOG, SCALAR_TYPES, TRANSACTION_COLUMNS, LatencyStats, load_model
+from storage import open_storage
+
+
+STREAM_SCORES_TABLE = "StreamingScores"
+STAGES = ["parse", "enrich", "score", "sink"]
+DEFAULT_PORT = 8766
+DEFAULT_MAX_BATCH = 1000  # Lines per batch
+DEFAULT_QUEUE_SIZE = 8  # Batches waiting between two stages
+DEFAULT_POLL_INTERVAL = 0.05  # Seconds between two reads of a file with no new data
+DEFAULT_STATS_INTERVAL = 10.0
+SINK_ROWS = 10000
+READ_BYTES = 1024 * 1024
+
+# Dimension table -> (transaction column, key column of the table, {table column: output column})
+DIMENSIONS = {
+    "Accounts": ("Account_ID", "Account_ID", {"Account_type": "Account_type", "Account_status": "Account_status"}),
+    "Agents": ("Agent_ID", "Agent_ID", {"Region": "Agent_region"}),
+    "Subscribers": ("Subscriber_ID", "Subscriber_ID", {"Subscriber_type": "Subscriber_type"}),
+    "Time_Dimension": ("Time_Foreign_ID", "Time_ID", {"IsWeekend": "IsWeekend", "TimeOfDay": "TimeOfDay"})
+}
+
+
+def load_dimensions(storage, max_bytes=DEFAULT_MAX_BYTES, connection=None, ttl=None):
+    """
+    Create the dimension caches of the DIMENSIONS tables, skipping missing tables.
+
+    Args:
+        storage (CSVStorage | ParquetStorage): Storage the caches are preloaded from.
+        max_bytes (int): Bound of the memory of each cache.
+        connection: MySQL connection to load the caches from instead, misses included.
+        ttl (float): Seconds the rows loaded from MySQL are served before being fetched again.
+
+    Returns:
+        dict: Table name -> DimensionCache of the table's attributes.
+    """
+    dimensions = {}
+    for table_name, (_, key, attributes) in DIMENSIONS.items():
+        if connection is not None:
+            dimensions[table_name] = from_mysql(connection, table_name, list(attributes), key, max_bytes, ttl)
+        elif storage.exists(table_name):
+            dimensions[table_name] = from_storage(storage, table_name, list(attributes), key, max_bytes)
+        else:
+            print(f"Warning: Table '{table_name}' not found, its attributes will be empty.")
+    return dimensions
+
+
+def csv_header(path):
+    """Return the column names on the first line of a CSV file."""
+    with open(path, newline="") as f:
+        return next(csv.reader(f))
+
+
+def parse_csv_lines(lines, header):
+    """
+    Parse CSV lines (bytes) into a DataFrame, dropping lines with the wrong number of fields.
+
+    The columns get the dtypes pandas.read_csv gives them, as the storage's tables do, so that
+    numeric keys match the keys of the entity profiles and dimension caches.
+    """
+    lines = [line for line in lines if len(next(csv.reader([line.decode()]), [])) == len(header)]
+    if not lines:
+        return pd.DataFrame(columns=header)
+    return pd.read_csv(io.BytesIO(b"\n".join(lines)), header=None, names=header)
+
+
+def parse_json_lines(lines):
+    """
+    Parse JSON lines (bytes) into a DataFrame, dropping lines that are not JSON objects and
+    objects that lack one of the columns of Transactions the features are built from, or whose
+    value is an object or an array.
+    """
+    records = []
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict) and all(isinstance(record.get(column, ()), SCALAR_TYPES)
+                                            for column in TRANSACTION_COLUMNS):
+            records.append(record)
+    if not records:
+        return pd.DataFrame(columns=TRANSACTION_COLUMNS)
+    return pd.DataFrame.from_records(records)
+
+
+async def tail_file(path, queue, follow=False, from_end=False, max_batch=DEFAULT_MAX_BATCH,
+                    poll_interval=DEFAULT_POLL_INTERVAL):
+    """
+    Put the lines appended to a CSV file into the queue, in batches of at most max_batch.
+
+    Args:
+        path (str): CSV file, its first line being the header.
+        queue (asyncio.Queue): Queue of the parse stage, ended with None.
+        follow (bool): At the end of the file, wait for more lines instead of stopping.
+        from_end (bool): Skip the lines already in the file.
+        max_batch (int): Most lines put in the queue at once.
+        poll_interval (float): Seconds waited at the end of the file before reading again.
+    """
+    with open(path, "rb") as f:
+        f.readline()
+        if from_end:
+            f.seek(0, os.SEEK_END)
+        buffer = b""
+        while True:
+            data = f.read(READ_BYTES)
+            if not data:
+                if not follow:
+                    break
+                if os.stat(path).st_size < f.tell():
+                    # Truncated: start again after the header
+                    f.seek(0)
+                    f.readline()
+                    buffer = b""
+                await asyncio.sleep(poll_interval)
+                continue
+            received = time.perf_counter()
+            lines = (buffer + data).split(b"\n")
+            buffer = lines.pop()
+            await put_lines(queue, received, lines, max_batch)
+        if buffer.strip():
+            await put_lines(queue, time.perf_counter(), [buffer], max_batch)
+    await queue.put(None)
+
+
+async def listen(queue, host=DEFAULT_HOST, port=DEFAULT_PORT, max_batch=DEFAULT_MAX_BATCH):
+    """
+    Put the newline-delimited JSON transactions sent by clients of a local socket into the
+    queue. A connection is not read while the queue is full, so its client is slowed down.
+    """
+    async def handle(reader, writer):
+        buffer = b""
+        while data := await reader.read(READ_BYTES):
+            lines = (buffer + data).split(b"\n")
+            buffer = lines.pop()
+            await put_lines(queue, time.perf_counter(), lines, max_batch)
+        if buffer.strip():
+            await put_lines(queue, time.perf_counter(), [buffer], max_batch)
+        writer.close()
+
+    server = await asyncio.start_server(handle, host, port, backlog=LISTEN_BACKLOG)
+    print(f"Receiving transactions on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+async def put_lines(queue, received, lines, max_batch):
+    lines = [line for line in lines if line.strip()]
+    for start in range(0, len(lines), max_batch):
+        await queue.put((received, lines[start:start + max_batch]))
+
+
+class StreamingPipeline:
+    """
+    Parse, enrich, score and store batches of transaction lines put in its `source_queue`.
+
+    Args:
+        parse (callable): Turns a list of lines (bytes) into a DataFrame of transactions.
+        model (CompiledIsolationForest): Model scoring rows of features.
+        features (list): Names of the model's features, among FEATURE_COLUMNS.
+        profiles (dict): Entity profiles of features.entity_profiles.
+        dimensions (dict): Table name -> DimensionCache of its DIMENSIONS attributes.
+        storage (CSVStorage | ParquetStorage): Storage of the StreamingScores table.
+        queue_size (int): Batches waiting between two stages.
+        sink_rows (int): Rows written to StreamingScores at once.
+
+    Raises:
+        ValueError: If the model uses features the pipeline cannot build.
+    """
+
+    def __init__(self, parse, model, features, profiles, dimensions, storage,
+                 queue_size=DEFAULT_QUEUE_SIZE, sink_rows=SINK_ROWS):
+        unknown = [feature for feature in features if feature not in FEATURE_COLUMNS]
+        if unknown:
+            raise ValueError(f"The model uses features not built by features.py: {unknown}")
+        self.parse = parse
+        self.model = model
+        self.features = features
+        self.profiles = profiles
+        self.dimensions = dimensions
+        self.storage = storage
+        self.sink_rows = sink_rows
+        self.last_seen = {}  # Subscriber_ID -> time of their latest transaction, in seconds
+        self.queues = {stage: asyncio.Queue(maxsize=queue_size) for stage in STAGES}
+        self.source_queue = self.queues["parse"]
+        self.stats = {stage: LatencyStats() for stage in STAGES + ["end_to_end"]}
+        self.anomalies = 0
+        self._pending = []
+
+    def enrich(self, transactions):
+        features = transaction_features(transactions, self.profiles, last_seen=self.last_seen)
+        attributes = [
+            cache.lookup(transactions[DIMENSIONS[table_name][0]].tolist()).rename(columns=DIMENSIONS[table_name][2])
+            for table_name, cache in self.dimensions.items() if DIMENSIONS[table_name][0] in transactions
+        ]
+        return pd.concat([features] + attributes, axis=1)
+
+    def score(self, enriched):
+        scores = self.model.decision_function(enriched[self.features].to_numpy(dtype=np.float64))
+        result = enriched.drop(columns=FEATURE_COLUMNS)
+        result.insert(1, "Model_score", scores)
+        result.insert(2, "Is_anomaly", (scores < 0).astype(np.int8))
+        self.anomalies += int(result["Is_anomaly"].sum())
+        return result
+
+    def sink(self, scores):
+        self._pending.append(scores)
+        if sum(len(df) for df in self._pending) >= self.sink_rows:
+            self.flush()
+
+    def flush(self):
+        """Write the scores waiting in the sink."""
+        if self._pending:
+            self.storage.write(STREAM_SCORES_TABLE, pd.concat(self._pending, ignore_index=True), append=True)
+            self._pending = []
+
+    async def _stage(self, name, function, outbox):
+        """Apply a stage's function to the batches of its queue, until None."""
+        inbox, stats = self.queues[name], self.stats[name]
+        while (item := await inbox.get()) is not None:
+            received, batch = item
+            start = time.perf_counter()
+            result = function(batch)
+            done = time.perf_counter()
+            stats.requests += len(batch)
+            stats.batch_sizes.append(len(batch))
+            stats.latencies.append(done - start)
+            if outbox is None:
+                end_to_end = self.stats["end_to_end"]
+                end_to_end.requests += len(batch)
+                end_to_end.batch_sizes.append(len(batch))
+                end_to_end.latencies.extend([done - received] * len(batch))
+            else:
+                await outbox.put((received, result))
+            # Let the other stages run between two batches
+            await asyncio.sleep(0)
+        if outbox is not None:
+            await outbox.put(None)
+
+    def summary(self):
+        """One line per stage: transactions, batches, time per batch and queue length."""
+        lines = []
+        for name, stats in self.stats.items():
+            summary = stats.summary()
+            queue = f", queued {self.queues[name].qsize()}" if name in self.queues else ""
+            lines.append(f"  {name}: {summary['requests']} transactions in {summary['batches']} batches "
+                         f"(mean {summary['mean_batch_size']}), p50 {summary['p50_ms']} ms, "
+                         f"p99 {summary['p99_ms']} ms, max {summary['max_ms']} ms{queue}")
+        return "\n".join(lines)
+
+    async def _report(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            print(f"Streaming: {self.anomalies} anomalies\n{self.summary()}")
+
+    async def run(self, source, stats_interval=DEFAULT_STATS_INTERVAL):
+        """
+        Run the stages until the source (a coroutine putting batches in source_queue) is done.
+
+        The source runs alongside the stages: if any of them raises, the others are cancelled and
+        the exception is raised, rather than the source waiting forever on a queue no stage reads.
+
+        Returns:
+            int: Transactions written to StreamingScores.
+        """
+        tasks = [
+            asyncio.ensure_future(source),
+            asyncio.create_task(self._stage("parse", self.parse, self.queues["enrich"])),
+            asyncio.create_task(self._stage("enrich", self.enrich, self.queues["score"])),
+            asyncio.create_task(self._stage("score", self.score, self.queues["sink"])),
+            asyncio.create_task(self._stage("sink", self.sink, None))
+        ]
+        reporter = asyncio.create_task(self._report(stats_interval))
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks + [reporter]:
+                task.cancel()
+            await asyncio.gather(*tasks, reporter, return_exceptions=True)
+            self.flush()
+        return self.stats["sink"].requests
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score transactions as they are appended to a file or sent to a socket.")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                        help="Storage format of the dimension tables and StreamingScores")
+    parser.add_argument("--data-dir", default=".", help="Directory of the tables")
+    parser.add_argument("--file", default=None,
+                        help="Append-only CSV file of transactions (default: the Transactions CSV of --data-dir)")
+    parser.add_argument("--follow", action="store_true", help="Wait for new lines at the end of the file")
+    parser.add_argument("--from-end", action="store_true", help="Skip the lines already in the file")
+    parser.add_argument("--listen", type=int, metavar="PORT", default=None,
+                        help="Receive JSON lines on this port instead of reading a file")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address to listen on")
+    parser.add_argument("--model", default=DEFAULT_MODEL_DIR, help="Directory of the models saved by model_training.py")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="Most transactions per batch")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="Batches waiting between two stages")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Seconds between two reads of a file with no new lines")
+    parser.add_argument("--dimension-cache-mb", type=float, default=DEFAULT_MAX_BYTES / 1024 / 1024,
+                        help="Bound of the memory of each dimension cache, in MB")
+    parser.add_argument("--dimensions-from-mysql", action="store_true",
+                        help="Load the dimension caches from the fraud_detection database, misses included")
+    parser.add_argument("--dimension-ttl", type=float, default=None,
+                        help="Seconds the dimension rows loaded from MySQL are served before being fetched again")
+    parser.add_argument("--stats-interval", type=float, default=DEFAULT_STATS_INTERVAL,
+                        help="Seconds between two prints of the statistics")
+    args = parser.parse_args(argv)
+
+    storage = open_storage(args.format, args.data_dir)
+    start_time = time.time()
+    features, model = load_model(args.model)
+    profiles = entity_profiles(load_feature_tables(storage))
+    connection = None
+    if args.dimensions_from_mysql:
+        connection = connect()
+    dimensions = load_dimensions(storage, int(args.dimension_cache_mb * 1024 * 1024), connection, args.dimension_ttl)
+    print(f"Loaded the model, {sum(len(profile) for profile in profiles.values())} entity profiles and "
+          f"{len(dimensions)} dimension caches in {time.time() - start_time:.2f} s")
+
+    if args.listen is not None:
+        parse = parse_json_lines
+    else:
+        path = args.file or open_storage("csv", args.data_dir).path("Transactions")
+        parse = functools.partial(parse_csv_lines, header=csv_header(path))
+
+    async def run():
+        pipeline = StreamingPipeline(parse, model, features, profiles, dimensions, storage, args.queue_size)
+        if args.listen is not None:
+            source = listen(pipeline.source_queue, args.host, args.listen, args.max_batch)
+        else:
+            source = tail_file(path, pipeline.source_queue, args.follow, args.from_end, args.max_batch,
+                               args.poll_interval)
+        start = time.perf_counter()
+        try:
+            await pipeline.run(source, args.stats_interval)
+        finally:
+            elapsed = time.perf_counter() - start
+            rows = pipeline.stats["sink"].requests
+            print(f"Scored {rows} transactions in {elapsed:.2f} s ({rows / max(elapsed, 1e-9):,.0f} transactions/s), "
+                  f"{pipeline.anomalies} anomalies, written to {STREAM_SCORES_TABLE}\n{pipeline.summary()}")
+            for table_name, cache in dimensions.items():
+                print(f"  {table_name} cache: {cache.stats()}")
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Vectorized, seeded synthetic data engine used by the table generators in main1.py.
+
+Every column is produced as a NumPy batch from a single np.random.Generator, so a
+given seed always yields the same tables and the cost of generating a column is a
+handful of array operations instead of one Faker call per row. Free-text style
+values (names, addresses, sentences, URLs, ...) are sampled from pools that are
+built once with a seeded Faker instance the first time they are needed.
+"""
+import copy
+
+import numpy as np
+import pandas as pd
+from faker import Faker
+
+
+# Regions and cities in Cameroon
+REGIONS = ["Central", "Littoral", "Northwest", "Southwest", "Far North", "North", "Adamaoua", "West", "East", "South"]
+CITIES = {
+    "Central": ["Yaounde"],
+    "Littoral": ["Douala"],
+    "Northwest": ["Bamenda"],
+    "Southwest": ["Buea", "Limbe"],
+    "Far North": ["Maroua"],
+    "North": ["Garoua"],
+    "Adamaoua": ["Ngaoundere"],
+    "West": ["Bafoussam"],
+    "East": ["Bertoua"],
+    "South": ["Ebolowa"]
+}
+
+# Upper (inclusive) age bound of every age group but the last one
+AGE_GROUP_BOUNDS = [12, 19, 23, 26, 29, 33, 36, 39, 49, 59, 69, 79, 89]
+AGE_GROUP_LABELS = [
+    "Adolescent", "Teenager", "Early-20s", "Mid-20s", "Late-20s", "Early-30s", "Mid-30s Adult",
+    "Late-30s", "40s", "50s", "60s", "70s", "80s", "90s-100s"
+]
+
+_HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+_LETTERS = np.frombuffer(b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ", dtype=np.uint8)
+
+
+def age_groups(ages):
+    """
+    Map ages to their age group labels.
+
+    Args:
+        ages (array-like): Ages in years.
+
+    Returns:
+        np.ndarray: Age group label of every age.
+    """
+    index = np.searchsorted(AGE_GROUP_BOUNDS, np.asarray(ages), side="left")
+    return np.asarray(AGE_GROUP_LABELS, dtype=object)[index]
+
+
+def ascii_to_strings(buffer):
+    """Convert an (n, width) uint8 array of ASCII codes into an object array of n strings."""
+    width = buffer.shape[1]
+    return np.ascontiguousarray(buffer).view(f"S{width}").ravel().astype(f"U{width}").astype(object)
+
+
+def hex_digits(raw):
+    """Expand an (n, k) uint8 array into its (n, 2k) lowercase hex ASCII codes."""
+    out = np.empty((raw.shape[0], raw.shape[1] * 2), dtype=np.uint8)
+    out[:, 0::2] = _HEX_DIGITS[raw >> 4]
+    out[:, 1::2] = _HEX_DIGITS[raw & 0x0F]
+    return out
+
+
+def add_months(times, months):
+    """
+    Add a number of calendar months to each timestamp, clamping the day to the end of the
+    target month like dateutil's relativedelta does.
+
+    Args:
+        times (array-like): Timestamps.
+        months (array-like or int): Months to add to each timestamp.
+
+    Returns:
+        np.ndarray: Shifted timestamps (datetime64[ns]).
+    """
+    times = np.asarray(times, dtype="datetime64[s]")
+    days = times.astype("datetime64[D]")
+    time_of_day = times - days
+    month_start = days.astype("datetime64[M]")
+    day_index = (days - month_start.astype("datetime64[D]")).astype(np.int64)
+
+    target = month_start + np.asarray(months).astype("timedelta64[M]")
+    target_days = (target + 1).astype("datetime64[D]") - target.astype("datetime64[D]")
+    day_index = np.minimum(day_index, target_days.astype(np.int64) - 1)
+
+    shifted = target.astype("datetime64[D]") + day_index.astype("timedelta64[D]") + time_of_day
+    return shifted.astype("datetime64[ns]")
+
+
+class SyntheticDataEngine:
+    """
+    Columnar generator for the synthetic fraud detection tables.
+
+    Args:
+        seed (int): Seed for the random generator and the Faker instance used to build pools.
+        pool_size (int): Number of distinct values in each Faker-backed pool.
+        reference_time (str or datetime): "Now" for generated timestamps. Defaults to today at
+            midnight, pass a fixed value to make runs on different days identical.
+        compact_keys (bool): Have the generators emit their hashed *_Foreign_ID columns as 64-bit
+            integers instead of 64 character hex strings (see keys.derive_keys).
+    """
+
+    def __init__(self, seed=None, pool_size=1000, reference_time=None, compact_keys=False):
+        self.seed = seed
+        self.compact_keys = compact_keys
+        self.pool_size = pool_size
+        self.rng = np.random.default_rng(seed)
+        self.reference_time = pd.Timestamp(reference_time) if reference_time is not None else pd.Timestamp.today().normalize()
+        self.faker = Faker()
+        self.faker.seed_instance(seed)
+        self._pools = {}
+
+        city_lists = [CITIES[region] for region in REGIONS]
+        self._regions = np.asarray(REGIONS, dtype=object)
+        self._cities = np.asarray([city for cities in city_lists for city in cities], dtype=object)
+        self._city_counts = np.asarray([len(cities) for cities in city_lists])
+        self._city_offsets = np.concatenate(([0], np.cumsum(self._city_counts)[:-1]))
+
+    # ------------------------------------------------------------------
+    # Pools
+    # ------------------------------------------------------------------
+    def spawn(self, seed):
+        """
+        Return an engine drawing from its own random stream that shares this engine's pools
+        and reference time. Used to give every shard of a table an independent, reproducible
+        stream whatever process generates it.
+
+        Args:
+            seed (int or np.random.SeedSequence): Seed of the new random stream.
+        """
+        child = copy.copy(self)
+        child.rng = np.random.default_rng(seed)
+        return child
+
+    def pool(self, name, factory):
+        """Return the pool called `name`, building it with `factory(faker)` on first use."""
+        if name not in self._pools:
+            # Seed Faker per pool so a pool's content does not depend on the order pools are built in
+            if self.seed is not None:
+                self.faker.seed_instance(f"{self.seed}-{name}")
+            self._pools[name] = np.asarray([factory(self.faker) for _ in range(self.pool_size)], dtype=object)
+        return self._pools[name]
+
+    def sample(self, values, n):
+        """Sample `n` values (with replacement) from an array."""
+        return values[self.rng.integers(0, len(values), n)]
+
+    # ------------------------------------------------------------------
+    # Identifiers
+    # ------------------------------------------------------------------
+    def uuid4(self, n):
+        """Generate `n` random version 4 UUID strings."""
+        raw = np.frombuffer(self.rng.bytes(16 * n), dtype=np.uint8).reshape(n, 16).copy()
+        raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+        raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+        digits = hex_digits(raw)
+
+        out = np.full((n, 36), ord("-"), dtype=np.uint8)
+        out[:, 0:8] = digits[:, 0:8]
+        out[:, 9:13] = digits[:, 8:12]
+        out[:, 14:18] = digits[:, 12:16]
+        out[:, 19:23] = digits[:, 16:20]
+        out[:, 24:36] = digits[:, 20:32]
+        return ascii_to_strings(out)
+
+    def md5(self, n):
+        """Generate `n` random 32 character hex digests."""
+        raw = np.frombuffer(self.rng.bytes(16 * n), dtype=np.uint8).reshape(n, 16)
+        return ascii_to_strings(hex_digits(raw))
+
+    def numbers(self, n, digits=10):
+        """Generate `n` integers with exactly `digits` digits."""
+        return self.rng.integers(10 ** (digits - 1), 10 ** digits, n, dtype=np.int64)
+
+    def bothify(self, n, text):
+        """Vectorized Faker.bothify: '#' becomes a random digit and '?' a random letter."""
+        pattern = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+        out = np.tile(pattern, (n, 1))
+        digit_cols = np.flatnonzero(pattern == ord("#"))
+        letter_cols = np.flatnonzero(pattern == ord("?"))
+        out[:, digit_cols] = self.rng.integers(ord("0"), ord("9") + 1, (n, len(digit_cols)), dtype=np.uint8)
+        out[:, letter_cols] = _LETTERS[self.rng.integers(0, len(_LETTERS), (n, len(letter_cols)))]
+        return ascii_to_strings(out)
+
+    def imei(self, n):
+        """Generate `n` 15 digit IMEIs whose last digit is a valid Luhn check digit."""
+        digits = self.rng.integers(0, 10, (n, 14), dtype=np.uint8)
+        digits[:, 0] = self.rng.integers(1, 10, n, dtype=np.uint8)
+
+        doubled = digits[:, -1::-2].astype(np.int64) * 2
+        doubled -= 9 * (doubled > 9)
+        total = doubled.sum(axis=1) + digits[:, -2::-2].sum(axis=1, dtype=np.int64)
+        check = ((10 - total % 10) % 10).astype(np.uint8)
+
+        return ascii_to_strings(np.column_stack([digits, check]) + ord("0"))
+
+    # ------------------------------------------------------------------
+    # People and contact details
+    # ------------------------------------------------------------------
+    def names(self, n):
+        """Generate `n` full names from first and last name pools."""
+        first = self.sample(self.pool("first_name", lambda f: f.first_name()), n)
+        last = self.sample(self.pool("last_name", lambda f: f.last_name()), n)
+        return first + " " + last
+
+    def user_names(self, n):
+        """Generate `n` user names."""
+        return self.sample(self.pool("user_name", lambda f: f.user_name()), n)
+
+    def emails(self, n):
+        """Generate `n` e-mail addresses of the form first.last<NN>@domain."""
+        first = self.sample(self.pool("email_first_name", lambda f: f.first_name().lower()), n)
+        last = self.sample(self.pool("email_last_name", lambda f: f.last_name().lower()), n)
+        domain = self.sample(self.pool("email_domain", lambda f: f.free_email_domain()), n)
+        suffix = self.rng.integers(0, 100, n).astype(str).astype(object)
+        return first + "." + last + suffix + "@" + domain
+
+    def phone_numbers(self, n):
+        """Generate `n` Cameroonian mobile numbers."""
+        return self.bothify(n, "+237 6## ## ## ##")
+
+    def addresses(self, n):
+        """Generate `n` postal addresses."""
+        return self.sample(self.pool("address", lambda f: f.address()), n)
+
+    def ipv4(self, n):
+        """Generate `n` public-looking IPv4 addresses."""
+        octets = self.rng.integers(1, 255, (n, 4))
+        lengths = 1 + (octets >= 10) + (octets >= 100)
+
+        # Write the digits left-aligned into a null padded buffer, trailing nulls are dropped
+        # when the rows are viewed as fixed width byte strings
+        out = np.zeros((n, 15), dtype=np.uint8)
+        rows = np.arange(n)
+        position = np.zeros(n, dtype=np.int64)
+        for k in range(4):
+            if k:
+                out[rows, position] = ord(".")
+                position += 1
+            for d in range(3):
+                mask = d < lengths[:, k]
+                place = 10 ** (lengths[mask, k] - 1 - d)
+                out[rows[mask], position[mask] + d] = (octets[mask, k] // place) % 10 + ord("0")
+            position += lengths[:, k]
+        return ascii_to_strings(out)
+
+    def regions_and_cities(self, n):
+        """Generate `n` Cameroonian regions and a city located in each of them."""
+        region_index = self.rng.integers(0, len(self._regions), n)
+        city_index = self._city_offsets[region_index] + \
+            (self.rng.random(n) * self._city_counts[region_index]).astype(np.int64)
+        return self._regions[region_index], self._cities[city_index]
+
+    def coordinates(self, n, lat_range=(2, 13), lon_range=(8, 16)):
+        """Generate `n` "lat, lon" strings, by default within the bounds of Cameroon."""
+        lat = np.char.mod("%.6f", self.rng.uniform(*lat_range, n)).astype(object)
+        lon = np.char.mod("%.6f", self.rng.uniform(*lon_range, n)).astype(object)
+        return lat + ", " + lon
+
+    def ages(self, n, low=10, high=100):
+        """Generate `n` ages between `low` and `high` (inclusive)."""
+        return self.rng.integers(low, high + 1, n)
+
+    # ------------------------------------------------------------------
+    # Web and free text
+    # ------------------------------------------------------------------
+    def domain_names(self, n):
+        """Generate `n` domain names."""
+        return self.sample(self.pool("domain_name", lambda f: f.domain_name()), n)
+
+    def urls(self, n):
+        """Generate `n` URLs."""
+        return self.sample(self.pool("url", lambda f: f.url()), n)
+
+    def words(self, n):
+        """Generate `n` single words."""
+        return self.sample(self.pool("word", lambda f: f.word()), n)
+
+    def sentences(self, n, nb_words=10):
+        """Generate `n` sentences of about `nb_words` words."""
+        return self.sample(self.pool(f"sentence_{nb_words}", lambda f: f.sentence(nb_words=nb_words)), n)
+
+    def texts(self, n, max_nb_chars=200):
+        """Generate `n` paragraphs of at most `max_nb_chars` characters."""
+        return self.sample(self.pool(f"text_{max_nb_chars}", lambda f: f.text(max_nb_chars=max_nb_chars)), n)
+
+    # ------------------------------------------------------------------
+    # Time
+    # ------------------------------------------------------------------
+    def datetimes(self, n, years=10, end=None):
+        """
+        Generate `n` timestamps with second precision, uniformly distributed over the `years`
+        years before `end` (the engine's reference time by default).
+
+        Returns:
+            np.ndarray: Timestamps (datetime64[ns]).
+        """
+        end = pd.Timestamp(end) if end is not None else self.reference_time
+        start = end - pd.DateOffset(years=years)
+        span = int((end - start).total_seconds())
+        seconds = self.rng.integers(0, span + 1, n).astype("timedelta64[s]")
+        return (np.datetime64(start.to_pydatetime(), "s") + seconds).astype("datetime64[ns]")
@@ -0,0 +1,338 @@
+"""
+Sliding-window transaction velocity of subscribers, accounts, agents and source accounts.
+
+For every entity (a value of Subscriber_ID, Account_ID, Agent_ID or Source_account) the store
+keeps, for each window (1 minute, 1 hour and 24 hours), a ring buffer of DEFAULT_BUCKETS time
+buckets with the number and amount of the entity's transactions in each bucket and the bucket
+each slot currently holds. A transaction adds itself to the slot of its bucket, first resetting
+the slot if it still holds an older bucket, so an update costs the same whatever the entity's
+activity and stale slots never need to be cleared. A query sums the slots holding one of the
+window's last buckets: windows slide one bucket (a twelfth of their length) at a time.
+
+The buffers of all the entities are rows of three arrays of shape (entities, windows, buckets),
+so updating or querying all the entities of a transaction takes a few vectorized operations,
+and backfill() loads a whole history with sorts and bincounts instead of replaying it one
+transaction at a time. evict_idle() recycles the rows of entities without any transaction
+within the windows, which bounds memory by the number of active entities.
+
+Usage:
+    python velocity.py [--format parquet] [--data-dir .]
+"""
+import argparse
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from storage import open_storage
+
+
+VELOCITY_KEYS = ["Subscriber_ID", "Account_ID", "Agent_ID", "Source_account"]
+VELOCITY_WINDOWS = {"1m": 60, "1h": 3600, "24h": 86400}  # Label -> length in seconds
+DEFAULT_BUCKETS = 12
+DEFAULT_CAPACITY = 1024
+NO_BUCKET = -1  # Bucket held by the slots of new rows
+UNIX_EPOCH = datetime(1970, 1, 1)
+
+
+def event_seconds(value):
+    """Return a transaction time (string, datetime or seconds) as whole seconds since the Unix epoch."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return int((value - UNIX_EPOCH).total_seconds())
+    return int(value)
+
+
+class VelocityStore:
+    """
+    Transaction counts and amounts of entities over sliding windows.
+
+    Args:
+        keys (list): Transaction columns whose values are the tracked entities.
+        windows (dict): Window label -> length in seconds.
+        buckets (int): Buckets per window, the window sliding by its length / buckets.
+        capacity (int): Entities the arrays are allocated for at first, doubled as needed.
+
+    Attributes:
+        latest (int): Time of the latest transaction added, in seconds since the Unix epoch.
+    """
+
+    def __init__(self, keys=VELOCITY_KEYS, windows=VELOCITY_WINDOWS, buckets=DEFAULT_BUCKETS,
+                 capacity=DEFAULT_CAPACITY):
+        self.keys = list(keys)
+        self.windows = dict(windows)
+        self.buckets = buckets
+        self.widths = np.array([max(seconds // buckets, 1) for seconds in self.windows.values()], dtype=np.int64)
+        self._width_list = self.widths.tolist()
+        self.latest = None
+        self._rows = {key: {} for key in self.keys}  # Key -> entity -> row
+        self._free = []
+        self._size = 0
+        shape = (capacity, len(self.windows), buckets)
+        self._held = np.full(shape, NO_BUCKET, dtype=np.int64)
+        self._counts = np.zeros(shape, dtype=np.int32)
+        self._amounts = np.zeros(shape, dtype=np.float64)
+
+    def __len__(self):
+        return sum(len(rows) for rows in self._rows.values())
+
+    @property
+    def nbytes(self):
+        return self._held.nbytes + self._counts.nbytes + self._amounts.nbytes
+
+    def feature_names(self):
+        """Names of the values returned by features(), in order."""
+        return [f"{key}_{value}_{label}" for key in self.keys for label in self.windows for value in ("count", "amount")]
+
+    def _allocate(self, n):
+        """Return n free rows, recycling evicted rows first and growing the arrays if needed."""
+        reused = self._free[len(self._free) - min(n, len(self._free)):]
+        del self._free[len(self._free) - len(reused):]
+        new = n - len(reused)
+        if self._size + new > len(self._held):
+            capacity = max(self._size + new, 2 * len(self._held))
+            for name, fill in (("_held", NO_BUCKET), ("_counts", 0), ("_amounts", 0)):
+                old = getattr(self, name)
+                grown = np.full((capacity,) + old.shape[1:], fill, dtype=old.dtype)
+                grown[:len(old)] = old
+                setattr(self, name, grown)
+        rows = np.concatenate([np.array(reused, dtype=np.intp), np.arange(self._size, self._size + new, dtype=np.intp)])
+        self._size += new
+        return rows
+
+    def _row(self, key, entity):
+        rows = self._rows[key]
+        row = rows.get(entity)
+        if row is None:
+            row = rows[entity] = int(self._allocate(1)[0])
+        return row
+
+    def update(self, transaction):
+        """
+        Add a transaction to the windows of its entities.
+
+        Args:
+            transaction (dict): Transaction with Time, Transaction_amount and the keys. Keys that
+                are missing or None are skipped.
+        """
+        seconds = event_seconds(transaction["Time"])
+        amount = float(transaction["Transaction_amount"])
+        buckets = [seconds // width for width in self._width_list]
+        n_windows, n_buckets = len(buckets), self.buckets
+        # A dozen scalar updates are cheaper than the vectorized operations' call overhead
+        held, counts, amounts = self._held.ravel(), self._counts.ravel(), self._amounts.ravel()
+        for key in self.keys:
+            entity = transaction.get(key)
+            if entity is None:
+                continue
+            first = self._row(key, entity) * n_windows
+            for window, bucket in enumerate(buckets):
+                i = (first + window) * n_buckets + bucket % n_buckets
+                # A slot holding an older bucket is reset; a transaction older than the slot's
+                # bucket lies outside the windows of the entity's latest transaction and is dropped
+                if bucket > held[i]:
+                    held[i] = bucket
+                    counts[i] = 1
+                    amounts[i] = amount
+                elif bucket == held[i]:
+                    counts[i] += 1
+                    amounts[i] += amount
+        self.latest = seconds if self.latest is None else max(self.latest, seconds)
+
+    def _totals(self, rows, now):
+        """Counts and amounts of rows (-1 for unknown entities) over the windows ending at `now`."""
+        rows = np.asarray(rows, dtype=np.intp)
+        if now is None:
+            now = self.latest
+        if now is None:
+            return np.zeros((len(rows), len(self.windows))), np.zeros((len(rows), len(self.windows)))
+        current = event_seconds(now) // self.widths[:, None]
+        held = self._held[rows]
+        live = (held <= current) & (held > current - self.buckets)
+        live[rows < 0] = False
+        return np.einsum("ewb,ewb->ew", self._counts[rows], live), np.einsum("ewb,ewb->ew", self._amounts[rows], live)
+
+    def query(self, key, entity, now=None):
+        """
+        Velocity of one entity.
+
+        Args:
+            key (str): Column of the entity, e.g. "Subscriber_ID".
+            entity: Value of the column.
+            now: End of the windows (time string, datetime or seconds), by default the time of
+                the latest transaction added.
+
+        Returns:
+            dict: count_<window> and amount_<window> for every window, 0 for unknown entities.
+        """
+        counts, amounts = self._totals([self._rows[key].get(entity, -1)], now)
+        result = {}
+        for i, label in enumerate(self.windows):
+            result[f"count_{label}"] = int(counts[0, i])
+            result[f"amount_{label}"] = float(amounts[0, i])
+        return result
+
+    def features(self, transaction):
+        """
+        Velocity of all the entities of a transaction over the windows ending at its Time.
+
+        Returns:
+            np.ndarray: The values named by feature_names(), float32.
+        """
+        rows = [self._rows[key].get(transaction.get(key), -1) for key in self.keys]
+        counts, amounts = self._totals(rows, transaction["Time"])
+        return np.stack([counts, amounts], axis=2).astype(np.float32).ravel()
+
+    def backfill(self, transactions):
+        """
+        Add a batch of transactions, in any order, as update() would one at a time.
+
+        Args:
+            transactions (pd.DataFrame): Time, Transaction_amount and the keys. Rows whose Time
+                is not a timestamp are skipped.
+
+        Returns:
+            int: Transactions added.
+        """
+        times = pd.to_datetime(transactions["Time"], format="ISO8601", errors="coerce")
+        valid = times.notna().to_numpy()
+        transactions = transactions[valid]
+        seconds = times[valid].to_numpy(dtype="datetime64[s]").astype(np.int64)
+        amounts = np.nan_to_num(pd.to_numeric(transactions["Transaction_amount"], errors="coerce").to_numpy(dtype=np.float64))
+
+        # Row of every (transaction, key) pair, entities hashed once per distinct value
+        event_rows, event_seconds_, event_amounts = [], [], []
+        for key in self.keys:
+            codes, entities = pd.factorize(transactions[key])
+            entities = entities.tolist()
+            rows = self._rows[key]
+            entity_rows = np.array([rows.get(entity, -1) for entity in entities], dtype=np.intp)
+            new = np.flatnonzero(entity_rows < 0)
+            entity_rows[new] = self._allocate(len(new))
+            rows.update(zip([entities[i] for i in new.tolist()], entity_rows[new].tolist()))
+            known = codes >= 0
+            event_rows.append(entity_rows[codes[known]])
+            event_seconds_.append(seconds[known])
+            event_amounts.append(amounts[known])
+        rows, seconds, amounts = (np.concatenate(values) for values in (event_rows, event_seconds_, event_amounts))
+
+        for window, width in enumerate(self.widths):
+            self._backfill_window(window, rows, seconds // width, amounts)
+        if len(seconds):
+            self.latest = int(seconds.max()) if self.latest is None else max(self.latest, int(seconds.max()))
+        return int(valid.sum())
+
+    def _backfill_window(self, window, rows, buckets, amounts):
+        """Merge the counts and amounts of (row, bucket) events into the ring buffers of a window."""
+        if not len(rows):
+            return
+        # Events summed per (row, bucket), sorted by one integer key per pair
+        low = buckets.min()
+        span = int(buckets.max() - low) + 1
+        order = np.argsort(rows * span + (buckets - low))
+        rows, buckets = rows[order], buckets[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = (rows[1:] != rows[:-1]) | (buckets[1:] != buckets[:-1])
+        groups = np.cumsum(first) - 1
+        counts = np.bincount(groups)
+        sums = np.bincount(groups, weights=amounts[order])
+        rows, buckets = rows[first], buckets[first]
+
+        # Only the latest bucket of each (row, slot) stays in the ring buffer
+        slots = buckets % self.buckets
+        order = np.argsort((rows * self.buckets + slots) * span + (buckets - low))
+        last = np.ones(len(order), dtype=bool)
+        last[:-1] = (rows[order][1:] != rows[order][:-1]) | (slots[order][1:] != slots[order][:-1])
+        keep = order[last]
+        index = (rows[keep], window, slots[keep])
+        held = self._held[index]
+        newer = buckets[keep] > held
+        same = buckets[keep] == held
+        self._counts[index] = np.where(newer, counts[keep], self._counts[index] + np.where(same, counts[keep], 0))
+        self._amounts[index] = np.where(newer, sums[keep], self._amounts[index] + np.where(same, sums[keep], 0))
+        self._held[index] = np.maximum(held, buckets[keep])
+
+    def backfill_storage(self, storage, table_name="Transactions", evict=True):
+        """
+        Backfill the transactions of a stored table, one split at a time (see storage.py).
+
+        Args:
+            storage (CSVStorage | ParquetStorage): Storage of the table.
+            table_name (str): Table of transactions.
+            evict (bool): Evict the entities idle at the latest transaction time after every
+                split, keeping only what queries of the present need: memory then holds the
+                entities of one split and those active in the last window.
+
+        Returns:
+            int: Transactions added.
+        """
+        columns = ["Time", "Transaction_amount"] + self.keys
+        added = 0
+        for split in storage.splits(table_name):
+            added += self.backfill(storage.read_split(table_name, split, columns=columns))
+            if evict:
+                self.evict_idle()
+        return added
+
+    def evict_idle(self, now=None):
+        """
+        Forget the entities without any transaction within the windows ending at `now` (by
+        default the latest transaction time), and recycle their rows.
+
+        Returns:
+            int: Entities evicted.
+        """
+        now = self.latest if now is None else event_seconds(now)
+        if now is None:
+            return 0
+        # Rows holding no bucket of the windows ending at `now` (or later)
+        idle = np.ones(self._size, dtype=bool)
+        for window, width in enumerate(self._width_list):
+            idle &= ~(self._held[:self._size, window] > now // width - self.buckets).any(axis=1)
+        idle[self._free] = False
+        evicted = 0
+        for rows in self._rows.values():
+            gone = [entity for entity, row in rows.items() if idle[row]]
+            for entity in gone:
+                del rows[entity]
+            evicted += len(gone)
+        idle_rows = np.flatnonzero(idle)
+        self._held[idle_rows] = NO_BUCKET
+        self._counts[idle_rows] = 0
+        self._amounts[idle_rows] = 0
+        self._free.extend(idle_rows.tolist())
+        return evicted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill the velocity store from the Transactions table.")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Storage format of the tables")
+    parser.add_argument("--data-dir", default=".", help="Directory of the tables")
+    parser.add_argument("--buckets", type=int, default=DEFAULT_BUCKETS, help="Buckets per window")
+    args = parser.parse_args(argv)
+
+    storage = open_storage(args.format, args.data_dir)
+    store = VelocityStore(buckets=args.buckets)
+    start_time = time.time()
+    rows = store.backfill_storage(storage)
+    print(f"Backfilled {rows} transactions of {len(store)} entities in {time.time() - start_time:.2f} s "
+          f"({store.nbytes / 1e6:.1f} MB)")
+
+    # Latency of single-transaction updates and feature queries
+    columns = ["Time", "Transaction_amount"] + store.keys
+    sample = storage.read_split("Transactions", storage.splits("Transactions")[0], columns=columns).head(1000)
+    sample = sample[pd.to_datetime(sample["Time"], errors="coerce").notna()].astype({"Time": str})
+    sample = sample.astype(object).where(sample.notna(), None).to_dict("records")
+    for name, operation in (("update", store.update), ("features", store.features)):
+        start_time = time.perf_counter()
+        for transaction in sample:
+            operation(transaction)
+        print(f"{name}: {(time.perf_counter() - start_time) / max(len(sample), 1) * 1e6:.1f} us per transaction")
+
+
+if __name__ == "__main__":
+    main()